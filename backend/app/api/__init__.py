@@ -1,7 +1,8 @@
 from fastapi import APIRouter
-from app.api.endpoints import scans, printers, export
+from app.api.endpoints import scans, printers, scanner
 
 api_router = APIRouter()
 
 api_router.include_router(scans.router, prefix="/scans", tags=["scans"])
 api_router.include_router(printers.router, prefix="/printers", tags=["printers"])
+api_router.include_router(scanner.router, prefix="/scanner", tags=["scanner"])
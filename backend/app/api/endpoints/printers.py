@@ -1,39 +1,81 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
 import json
+import logging
 import uuid
 
-from app.database import get_db
+from app.database import get_db, get_async_db
+from app.crud import print_job as crud_print_job
+from app.crud import printer as crud_printer
 from app.models.printer import Printer
+from app.services.print_connection import PrintConnection
+from app.services.print_protocol import PrintProtocol
 from app.services.print_service import print_service
 from app.schemas.scan import PrintCommand
+from app.schemas.print_job import PrintJobResponse, PrintQueueStats, PrinterResponse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
 @router.websocket("/ws/print/{client_id}")
 async def websocket_print_endpoint(websocket: WebSocket, client_id: str):
-    """WebSocket endpoint для управления печатью"""
+    """WebSocket endpoint для управления печатью.
+
+    По умолчанию команды идут JSON по одной. С ?protocol=binary задания
+    приходят бинарными кадрами пачками до window штук (format: png,
+    matrix или data), см. app/services/print_protocol.py. С ?heartbeat=1
+    клиент получает JSON ping и обязан отвечать pong.
+    """
+    try:
+        protocol = PrintProtocol.from_query(websocket.query_params)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
     await websocket.accept()
 
-    # Регистрируем клиент
-    print_service.register_client(client_id, websocket)
+    # Все отправки клиенту идут через очередь соединения
+    connection = PrintConnection(client_id, websocket, protocol.heartbeat)
+    connection.start()
+    if protocol.binary:
+        await connection.send_text(json.dumps(protocol.to_dict()))
 
-    try:
+    # Регистрируем клиент (общий реестр в таблице printers)
+    await print_service.register_client(client_id, connection, protocol=protocol)
+
+    async def receive_messages():
         while True:
             data = await websocket.receive_text()
             message = json.loads(data)
+            connection.received(message)
 
             if message.get("type") == "register_printer":
                 # Регистрируем принтер
                 printer_name = message.get("printer_name", f"Printer_{client_id}")
-                # Здесь можно сохранить в базу данных
+                await print_service.register_client(client_id, connection, printer_name)
+
+            elif message.get("type") == "ack":
+                # Подтверждение задания: done, failed (повторить), rejected.
+                # Пачку подтверждают одним сообщением с job_ids
+                job_ids = message.get("job_ids") or [message.get("job_id")]
+                if not isinstance(job_ids, list):
+                    job_ids = [job_ids]
+                for job_id in job_ids:
+                    print_service.acknowledge(
+                        client_id,
+                        job_id,
+                        message.get("status", "done"),
+                        message.get("error"),
+                    )
 
             elif message.get("type") == "set_default":
                 # Устанавливаем как принтер по умолчанию
-                print_service.set_default_printer(client_id)
-                await websocket.send_text(
+                await print_service.set_default_printer(client_id)
+                await connection.send_text(
                     json.dumps(
                         {
                             "type": "status",
@@ -42,8 +84,30 @@ async def websocket_print_endpoint(websocket: WebSocket, client_id: str):
                     )
                 )
 
-    except WebSocketDisconnect:
-        print_service.unregister_client(client_id)
+    receiver = asyncio.create_task(receive_messages())
+    closed = asyncio.create_task(connection.closed.wait())
+    try:
+        # Полуоткрытый сокет не даст receive_text вернуться - соединение
+        # закрывает heartbeat или таймаут отправки
+        await asyncio.wait({receiver, closed}, return_when=asyncio.FIRST_COMPLETED)
+        if receiver.done() and not isinstance(
+            receiver.exception(), (WebSocketDisconnect, type(None))
+        ):
+            logger.error(
+                "Ошибка в соединении клиента печати %s: %s",
+                client_id,
+                receiver.exception(),
+            )
+    finally:
+        receiver.cancel()
+        closed.cancel()
+        # Отмена обработчика не должна прервать возврат заданий в очередь
+        await asyncio.shield(
+            asyncio.gather(
+                connection.close("клиент отключился", code=1000),
+                print_service.unregister_client(client_id, connection),
+            )
+        )
 
 
 @router.get("/printers/")
@@ -58,16 +122,48 @@ async def get_available_printers():
     }
 
 
+@router.get("/clients/", response_model=List[PrinterResponse])
+async def get_print_clients(
+    active_only: bool = True, db: AsyncSession = Depends(get_async_db)
+):
+    """Клиенты печати всех воркеров (сокет держит воркер worker_id)"""
+    return await crud_printer.get_printers(db, active_only=active_only)
+
+
 @router.post("/print/")
 async def send_print_command(print_cmd: PrintCommand):
-    """Отправляет команду на печать"""
+    """Ставит команду печати в очередь"""
     try:
-        success = await print_service.send_print_command(print_cmd)
-        if success:
-            return {"message": "Команда печати отправлена"}
-        else:
-            raise HTTPException(
-                status_code=400, detail="Не удалось отправить команду печати"
-            )
+        job = await print_service.send_print_command(print_cmd)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Команда печати поставлена в очередь", "job_id": job.id}
+
+
+@router.get("/jobs/", response_model=List[PrintJobResponse])
+async def get_print_jobs(
+    status: Optional[str] = None,
+    client_id: Optional[str] = None,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Задания печати, новые первыми (status=dead - мертвые задания)"""
+    return await crud_print_job.get_print_jobs(
+        db, status=status, client_id=client_id, limit=limit
+    )
+
+
+@router.get("/jobs/stats", response_model=PrintQueueStats)
+async def get_print_queue_stats():
+    """Количество заданий по статусам и отправка по клиентам"""
+    return await print_service.get_stats()
+
+
+@router.post("/jobs/{job_id}/retry", response_model=PrintJobResponse)
+async def retry_print_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Возвращает мертвое задание в очередь"""
+    job = await crud_print_job.retry_print_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Мертвое задание не найдено")
+    print_service.wake(job.client_id)
+    return job
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.device_registry import device_registry
+from app.services.scanner_service import ScannerService, scanner_manager
+
+router = APIRouter()
+
+
+@router.get("/check")
+async def check_scanner():
+    """Проверяет, что хотя бы один сканер подключен и читается"""
+    connected = [
+        reader.port for reader in scanner_manager.readers.values() if reader.connected
+    ]
+    if not connected:
+        raise HTTPException(status_code=404, detail="Сканер не подключен")
+    return {"connected": connected}
+
+
+@router.get("/ports")
+async def get_ports():
+    """Список доступных COM портов"""
+    return {"ports": ScannerService.get_available_ports()}
+
+
+@router.get("/devices")
+async def get_devices(refresh: bool = False):
+    """Устройства из реестра; refresh=true - перечитать список портов"""
+    if refresh:
+        await run_in_threadpool(device_registry.refresh)
+    return device_registry.get_stats()
+
+
+@router.get("/readers")
+async def get_readers():
+    """Состояние читателей портов и очереди сканов"""
+    return scanner_manager.get_stats()
+
+
+@router.post("/readers")
+async def start_reader(port: str):
+    """Начинает постоянное чтение порта"""
+    return scanner_manager.add_reader(port).get_stats()
+
+
+@router.delete("/readers")
+async def stop_reader(port: str):
+    """Останавливает чтение порта"""
+    if not await run_in_threadpool(scanner_manager.remove_reader, port):
+        raise HTTPException(status_code=404, detail="Порт не читается")
+    return {"message": "Чтение порта остановлено"}
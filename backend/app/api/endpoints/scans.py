@@ -1,105 +1,429 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, timedelta
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    UploadFile,
+    File,
+    Request,
+    Response,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile as FormFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Iterator, List, Literal, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
 import base64
+import json
+import logging
+import tempfile
 from io import BytesIO
 
-from app.database import get_db
-from app.schemas.scan import ScanCreate, ScanResponse, QRScanRequest, PrintCommand
-from app.crud import scan as crud_scan
+from app.database import get_async_db, SessionLocal
+from app.config import settings
+from app.schemas.scan import (
+    ScanCreate,
+    ScanResponse,
+    ImageScanResponse,
+    QRScanRequest,
+    RegionOfInterest,
+    PrintCommand,
+    QRBatchRequest,
+    BulkScanRequest,
+    BulkScanResponse,
+    ScanStatsResponse,
+)
+from app.crud import scan_async as crud_scan
+from app.crud import scan as crud_scan_sync
+from app.crud import scan_rollup as crud_scan_rollup
 from app.services.qr_service import QRService
+from app.services.scan_service import ScanService
+from app.services.scan_buffer import scan_buffer
+from app.services.scan_dedup import scan_dedup
+from app.services.broker import Subscription, broker
 from app.services.print_service import print_service
+from app.services.image_store import image_store
+from app.services.upload_storage import storage_key, upload_storage
+from app.services.qr_cache import qr_cache
+from app.services.qr_batch_service import QRBatchService
+from app.services.decode_service import (
+    decode_service,
+    DecodeQueueFull,
+    DecodeTimeout,
+)
 from app.utils.excel_export import ExcelExporter
+from app.utils.scan_export import CsvExporter, ParquetExporter
+from app.utils.cursor import encode_cursor, decode_cursor
 from app.models.scan import Scan
+from app.metrics import EXPORT_DURATION
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+EXPORT_CHUNK_SIZE = 256 * 1024
+# Размер интервала статистики и период по умолчанию
+STATS_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+STATS_DEFAULT_SPANS = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30),
+}
+# Ответ на подавленный повтор скана
+DUPLICATE_HEADER = "X-Scan-Duplicate"
+# Запас на границы и заголовки частей multipart сверх MAX_UPLOAD_SIZE
+MULTIPART_OVERHEAD = 64 * 1024
+
 
 @router.post("/scan/", response_model=ScanResponse)
 async def create_scan(
-    scan: ScanCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)
+    scan: ScanCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Создает новое сканирование"""
-    db_scan = crud_scan.create_scan(db=db, scan=scan)
-
-    # Отправляем на печать в фоновом режиме
-    if scan.printer_id:
-        background_tasks.add_task(
-            print_service.send_print_command,
-            PrintCommand(qr_data=scan.qr_data, printer_id=scan.printer_id),
-        )
+    """Создает новое сканирование.
+
+    Повтор в окне подавления возвращает ранее созданный скан с заголовком
+    X-Scan-Duplicate и повторно не печатается.
+    """
+    db_scan, created = await ScanService.create_scan(db=db, scan=scan)
+    if not created:
+        response.headers[DUPLICATE_HEADER] = "1"
+
+    # Ставим в очередь печати (задание переживает отключение клиента)
+    if created and scan.printer_id:
+        try:
+            await print_service.send_print_command(
+                PrintCommand(qr_data=scan.qr_data, printer_id=scan.printer_id),
+                scan_id=db_scan.id,
+            )
+        except ValueError as e:
+            logger.warning("Скан %s не поставлен в печать: %s", db_scan.id, e)
 
     return db_scan
 
 
-@router.post("/scan-from-image/", response_model=ScanResponse)
-async def scan_from_image(
-    request: QRScanRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+@router.post("/bulk/", response_model=BulkScanResponse)
+async def bulk_create_scans(
+    request: BulkScanRequest, db: AsyncSession = Depends(get_async_db)
 ):
-    """Сканирует QR код из изображения"""
+    """Пакетная загрузка сканов, накопленных сканером в офлайне.
+
+    Повторная отправка с теми же idempotency_key безопасна: такие сканы
+    возвращаются со статусом duplicate и id ранее созданной записи.
+    """
+    if len(request.scans) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не больше {settings.BULK_MAX_ITEMS} сканов за запрос",
+        )
+
+    results = await ScanService.bulk_create_scans(db, request.scans)
+    created = sum(1 for result in results if result.status == "created")
+    return BulkScanResponse(
+        created=created, duplicates=len(results) - created, results=results
+    )
+
+
+async def _scan_image(
+    image_data: bytes,
+    roi: Optional[Tuple[int, int, int, int]],
+    client_id: Optional[str],
+    db: AsyncSession,
+) -> ImageScanResponse:
+    """Декодирует кадр из памяти, сохраняет скан и ставит печать"""
     try:
-        # Сохраняем изображение
-        file_path = QRService.save_uploaded_image(request.image_data)
+        symbols = await decode_service.decode(image_data, roi)
+    except DecodeQueueFull as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
+    except DecodeTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        if image_store.should_store(decoded=False):
+            image_store.save_later(image_data)
+        raise HTTPException(
+            status_code=400, detail=f"Ошибка при обработке QR кода: {str(e)}"
+        )
 
-        # Декодируем QR код
-        with open(file_path, "rb") as f:
-            image_data = f.read()
+    qr_data = symbols[0]
+    try:
+        scan = ScanCreate(qr_data=qr_data, scan_type="camera", printer_id=client_id)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Ошибка при обработке QR кода: {e.errors()[0]['msg']}",
+        )
 
-        qr_data = QRService.decode_qr_from_image(image_data)
+    # Кадр пишется на диск в фоне, путь известен заранее
+    file_path = None
+    if image_store.should_store(decoded=True):
+        file_path = image_store.save_later(image_data)
 
-        # Создаем запись
-        db_scan = crud_scan.create_scan(
-            db=db,
-            scan=ScanCreate(
-                qr_data=qr_data, scan_type="camera", printer_id=request.client_id
-            ),
+    # Создаем запись одним INSERT
+    db_scan, created = await ScanService.create_scan(
+        db=db, scan=scan, file_path=file_path
+    )
+
+    # Ставим в очередь печати клиента; повтор уже напечатан
+    if created and client_id:
+        await print_service.send_print_command(
+            PrintCommand(qr_data=qr_data, printer_id="default", client_id=client_id),
+            scan_id=db_scan.id,
         )
 
-        # Обновляем путь к файлу
-        db_scan.file_path = file_path
-        db.commit()
-
-        # Отправляем на печать
-        if request.client_id:
-            background_tasks.add_task(
-                print_service.send_print_command,
-                PrintCommand(
-                    qr_data=qr_data, printer_id="default", client_id=request.client_id
-                ),
-            )
+    response = ImageScanResponse.model_validate(db_scan)
+    response.symbols = symbols
+    response.duplicate = not created
+    return response
 
-        return db_scan
 
-    except Exception as e:
+@router.post("/scan-from-image/", response_model=ImageScanResponse)
+async def scan_from_image(
+    request: QRScanRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Сканирует QR код из изображения"""
+    try:
+        image_data = QRService.decode_base64_image(request.image_data)
+    except ValueError as e:
         raise HTTPException(
             status_code=400, detail=f"Ошибка при обработке QR кода: {str(e)}"
         )
 
+    if len(image_data) > settings.MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="Изображение слишком большое")
+
+    roi = request.roi.as_tuple() if request.roi else None
+    return await _scan_image(image_data, roi, request.client_id, db)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Изображение больше {settings.MAX_UPLOAD_SIZE} байт",
+    )
+
+
+async def _read_frame(request: Request) -> bytes:
+    """Читает кадр из тела запроса (octet-stream или multipart) с лимитом размера"""
+    limit = settings.MAX_UPLOAD_SIZE
+
+    # Отказываем по заголовку, не читая тело
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise _too_large()
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        return await _read_multipart_frame(request, limit)
+
+    return bytes(await _read_limited(request.stream(), limit))
+
+
+async def _read_multipart_frame(request: Request, limit: int) -> bytes:
+    """Файл из multipart; тело считается при разборе, а не после него"""
+    # Тело без Content-Length прерывается, как только превысит лимит
+    # (с запасом на границы и заголовки частей)
+    stream = _limited_stream(request.stream(), limit + MULTIPART_OVERHEAD)
+    parser = MultiPartParser(request.headers, stream, max_files=1, max_fields=16)
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    try:
+        upload = next(
+            (value for value in form.values() if isinstance(value, FormFile)), None
+        )
+        if upload is None:
+            raise HTTPException(status_code=400, detail="Файл изображения не передан")
+        return bytes(await _read_limited(_iter_upload(upload), limit))
+    finally:
+        await form.close()
+
+
+async def _limited_stream(stream: AsyncIterator[bytes], limit: int):
+    """Пропускает поток, пока он не длиннее limit байт, иначе 413"""
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > limit:
+            raise _too_large()
+        yield chunk
+
+
+async def _read_limited(stream: AsyncIterator[bytes], limit: int) -> bytearray:
+    buffer = bytearray()
+    async for chunk in _limited_stream(stream, limit):
+        buffer.extend(chunk)
+    return buffer
+
+
+async def _iter_upload(upload: FormFile, chunk_size: int = 64 * 1024):
+    """Читает UploadFile по частям"""
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+
+@router.post("/scan-from-image/raw/", response_model=ImageScanResponse)
+async def scan_from_raw_image(
+    request: Request,
+    client_id: Optional[str] = None,
+    roi: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Сканирует QR код из кадра, переданного как бинарное тело.
+
+    Тело - сами байты изображения (application/octet-stream, image/*) или
+    multipart/form-data с файлом; roi передается как "x,y,width,height".
+    """
+    region = None
+    if roi:
+        try:
+            x, y, width, height = (int(value) for value in roi.split(","))
+            region = RegionOfInterest(x=x, y=y, width=width, height=height)
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail="roi должен быть в формате x,y,width,height"
+            )
+
+    image_data = await _read_frame(request)
+    return await _scan_image(
+        image_data,
+        region.as_tuple() if region else None,
+        client_id,
+        db,
+    )
+
+
+@router.get("/buffer-stats/")
+async def get_buffer_stats():
+    """Метрики буфера отложенной записи: глубина, размер пачки, время сброса"""
+    return scan_buffer.get_stats()
+
+
+@router.get("/dedup-stats/")
+async def get_dedup_stats():
+    """Метрики подавления повторов: ключи в окне, доля повторов, фильтр Блума"""
+    return scan_dedup.get_stats()
+
+
+@router.get("/decode-stats/")
+async def get_decode_stats():
+    """Метрики пула декодирования: очередь, время ожидания и декодирования"""
+    return decode_service.get_stats()
+
+
+async def _close_on_disconnect(websocket: WebSocket, subscription: Subscription):
+    # Клиент ленты ничего не присылает, чтение нужно, чтобы заметить отключение
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        subscription.close()
+
+
+@router.websocket("/ws/feed")
+async def scan_feed_websocket(
+    websocket: WebSocket,
+    scan_type: Optional[str] = None,
+    printer_id: Optional[str] = None,
+):
+    """Лента новых сканов по WebSocket с фильтром по типу и принтеру"""
+    await websocket.accept()
+    subscription = ScanService.subscribe(scan_type=scan_type, printer_id=printer_id)
+    watcher = asyncio.create_task(_close_on_disconnect(websocket, subscription))
+
+    try:
+        while (message := await subscription.get()) is not None:
+            await websocket.send_text(json.dumps(message))
+
+        if subscription.overflowed:
+            # Клиент не успевал читать: пусть переподключится и догрузит историю
+            await websocket.close(code=1013, reason="Клиент не успевает читать ленту")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        broker.unsubscribe(subscription)
+
+
+@router.get("/feed/")
+async def scan_feed_events(
+    scan_type: Optional[str] = None, printer_id: Optional[str] = None
+):
+    """Лента новых сканов как Server-Sent Events"""
+    subscription = ScanService.subscribe(scan_type=scan_type, printer_id=printer_id)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await subscription.get(settings.FEED_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Держит соединение через прокси и выявляет ушедших клиентов
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/feed-stats/")
+async def get_feed_stats():
+    """Подписчики ленты и отключенные медленные клиенты"""
+    return broker.get_stats()
+
 
 @router.post("/manual-scan/")
 async def manual_scan(
-    data: str, scan_type: str = "keyboard", db: Session = Depends(get_db)
+    data: str = Query(max_length=500),
+    scan_type: str = Query("keyboard", max_length=50),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Ручной ввод данных (для сканеров клавиатурного ввода)"""
-    db_scan = crud_scan.create_scan(
+    db_scan, created = await ScanService.create_scan(
         db=db, scan=ScanCreate(qr_data=data, scan_type=scan_type)
     )
 
-    return {"message": "Скан сохранен", "scan": db_scan}
+    message = "Скан сохранен" if created else "Повторный скан, запись не создана"
+    return {"message": message, "scan": db_scan, "duplicate": not created}
 
 
 @router.get("/scans/", response_model=List[ScanResponse])
 async def read_scans(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Получает список сканирований"""
+    """Получает список сканирований.
+
+    Следующая страница запрашивается по курсору из заголовка X-Next-Cursor;
+    skip оставлен для старых клиентов и медленнее на глубоких страницах.
+    """
     start_datetime = None
     end_datetime = None
 
@@ -108,28 +432,219 @@ async def read_scans(
     if end_date:
         end_datetime = datetime.fromisoformat(end_date.replace("Z", "+00:00"))
 
-    scans = crud_scan.get_scans(
-        db=db, skip=skip, limit=limit, start_date=start_datetime, end_date=end_datetime
+    if skip and not cursor:
+        return await crud_scan.get_scans(
+            db=db,
+            skip=skip,
+            limit=limit,
+            start_date=start_datetime,
+            end_date=end_datetime,
+        )
+
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    scans, next_position = await crud_scan.get_scans_page(
+        db=db,
+        limit=limit,
+        after=after,
+        start_date=start_datetime,
+        end_date=end_datetime,
     )
+    if next_position:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_position)
+    return scans
+
+
+@router.get("/search/", response_model=List[ScanResponse])
+async def search_scans(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500),
+    mode: Literal["exact", "prefix", "substring"] = "exact",
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Поиск сканов по qr_data: точное совпадение, префикс или подстрока.
+
+    Результаты от новых к старым, следующая страница - по курсору из
+    заголовка X-Next-Cursor. Для подстроки нужно не меньше 3 символов.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        scans, next_position = await crud_scan.search_scans(
+            db=db, query=q, mode=mode, limit=limit, after=after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_position:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_position)
     return scans
 
 
+@router.get("/stats/", response_model=ScanStatsResponse)
+async def get_scan_stats(
+    granularity: Literal["minute", "hour", "day"] = "hour",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    scan_type: Optional[str] = None,
+    printer_id: Optional[str] = None,
+    group_by: Optional[str] = Query(None, description="scan_type,printer_id"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Число сканов и напечатанных по минутам, часам или дням.
+
+    Считается по таблице scan_rollups, которую ведут триггеры, поэтому
+    время ответа зависит от числа интервалов, а не сканов. По умолчанию -
+    последний час, сутки или 30 дней; start_date округляется вниз до
+    начала интервала.
+    """
+    step = STATS_STEPS[granularity]
+    try:
+        end = _utc(
+            datetime.fromisoformat(end_date.replace("Z", "+00:00"))
+            if end_date
+            else datetime.now(timezone.utc)
+        )
+        start = _utc(
+            datetime.fromisoformat(start_date.replace("Z", "+00:00"))
+            if start_date
+            else end - STATS_DEFAULT_SPANS[granularity]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Неверная дата: {e}")
+
+    dimensions = [name.strip() for name in (group_by or "").split(",") if name.strip()]
+    unknown = set(dimensions) - {"scan_type", "printer_id"}
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Группировка возможна по scan_type и printer_id: {', '.join(unknown)}",
+        )
+
+    start = _floor(start, granularity)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end_date раньше start_date")
+    if (end - start) / step > settings.STATS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Больше {settings.STATS_MAX_BUCKETS} интервалов: "
+            "сократите период или укрупните интервал",
+        )
+
+    buckets = await crud_scan_rollup.get_scan_stats(
+        db,
+        granularity,
+        start,
+        end,
+        scan_type=scan_type,
+        printer_id=printer_id,
+        group_by=dimensions,
+    )
+    scans = sum(bucket.scans for bucket in buckets)
+    printed = sum(bucket.printed for bucket in buckets)
+    return ScanStatsResponse(
+        granularity=granularity,
+        start=start,
+        end=end,
+        scans=scans,
+        printed=printed,
+        print_rate=round(printed / scans, 4) if scans else 0.0,
+        buckets=buckets,
+    )
+
+
+def _utc(value: datetime) -> datetime:
+    # Время без зоны считаем UTC, как и scanned_at
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _floor(value: datetime, granularity: str) -> datetime:
+    value = value.replace(second=0, microsecond=0)
+    if granularity in ("hour", "day"):
+        value = value.replace(minute=0)
+    if granularity == "day":
+        value = value.replace(hour=0)
+    return value
+
+
 @router.get("/scans/{scan_id}", response_model=ScanResponse)
-async def read_scan(scan_id: int, db: Session = Depends(get_db)):
+async def read_scan(scan_id: int, db: AsyncSession = Depends(get_async_db)):
     """Получает скан по ID"""
-    db_scan = crud_scan.get_scan(db, scan_id=scan_id)
+    db_scan = await crud_scan.get_scan(db, scan_id=scan_id)
     if db_scan is None:
         raise HTTPException(status_code=404, detail="Скан не найден")
     return db_scan
 
 
-@router.get("/export-excel/")
-async def export_excel(
+async def _scan_image_key(db: AsyncSession, scan_id: int) -> str:
+    db_scan = await crud_scan.get_scan(db, scan_id=scan_id)
+    if db_scan is None or not db_scan.file_path:
+        raise HTTPException(status_code=404, detail="Изображение не найдено")
+    try:
+        return storage_key(db_scan.file_path)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/scans/{scan_id}/image/")
+async def read_scan_image(scan_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Исходный кадр скана. Файл отдает nginx (X-Accel-Redirect)"""
+    key = await _scan_image_key(db, scan_id)
+    return await run_in_threadpool(upload_storage.response, key)
+
+
+@router.get("/scans/{scan_id}/thumbnail/")
+async def read_scan_thumbnail(scan_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Миниатюра кадра для истории сканов"""
+    key = await _scan_image_key(db, scan_id)
+    thumb_key = await run_in_threadpool(upload_storage.ensure_thumbnail, key)
+    if thumb_key is None:
+        raise HTTPException(status_code=404, detail="Изображение не найдено")
+    return await run_in_threadpool(upload_storage.response, thumb_key)
+
+
+EXPORT_MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _export_stream(
+    format: str, start_date: Optional[datetime], end_date: Optional[datetime]
+) -> Iterator[bytes]:
+    """Выгружает сканы потоком; выполняется в пуле потоков"""
+    with EXPORT_DURATION.labels(format).time(), SessionLocal() as db:
+        scans = crud_scan_sync.iter_scans(db, start_date, end_date)
+
+        if format == "csv":
+            yield from CsvExporter.iter_scans(scans)
+            return
+
+        # xlsx и parquet собираются во временном файле на диске
+        with tempfile.TemporaryFile() as tmp:
+            if format == "parquet":
+                ParquetExporter.write_scans(scans, tmp)
+            else:
+                ExcelExporter.write_scans(scans, tmp)
+            tmp.seek(0)
+            while chunk := tmp.read(EXPORT_CHUNK_SIZE):
+                yield chunk
+
+
+@router.get("/export/")
+async def export_scans(
+    format: Literal["xlsx", "csv", "parquet"] = "xlsx",
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
 ):
-    """Экспортирует данные в Excel"""
+    """Экспортирует все сканы за период потоком (xlsx, csv или parquet)"""
     start_datetime = None
     end_datetime = None
 
@@ -138,22 +653,77 @@ async def export_excel(
     if end_date:
         end_datetime = datetime.fromisoformat(end_date.replace("Z", "+00:00"))
 
-    scans = crud_scan.get_scans(
-        db=db,
-        start_date=start_datetime,
-        end_date=end_datetime,
-        limit=10000,  # Максимальное количество записей
-    )
+    filename = f"qr_scans_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
 
-    excel_data = ExcelExporter.export_scans_to_excel(scans)
+    return StreamingResponse(
+        _export_stream(format, start_datetime, end_datetime),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-    filename = f"qr_scans_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
 
-    return {"filename": filename, "data": base64.b64encode(excel_data).decode("utf-8")}
+@router.get("/export-excel/")
+async def export_excel(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    """Экспортирует данные в Excel"""
+    return await export_scans("xlsx", start_date, end_date)
 
 
 @router.get("/generate-qr/{data}")
-async def generate_qr(data: str, size: int = 10):
+async def generate_qr(data: str, request: Request, size: int = 10):
     """Генерирует QR код для данных"""
-    qr_image = QRService.generate_qr_code(data, size)
-    return {"qr_image": base64.b64encode(qr_image).decode("utf-8"), "data": data}
+    # Рендер PIL и кэш в Redis - блокирующие вызовы
+    qr_code = await run_in_threadpool(QRService.get_qr_code, data, size)
+
+    # Картинка зависит только от параметров, клиент и nginx могут ее кэшировать
+    headers = {
+        "ETag": f'"{qr_code.etag}"',
+        "Cache-Control": f"public, max-age={settings.QR_HTTP_MAX_AGE}",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse({"qr_image": qr_code.base64, "data": data}, headers=headers)
+
+
+BATCH_MEDIA_TYPES = {
+    "zip": "application/zip",
+    "pdf": "application/pdf",
+    "png": "image/png",
+}
+
+
+def _build_qr_batch(batch: QRBatchRequest) -> bytes:
+    images = QRBatchService.render_many(batch.payloads, batch.size)
+    if batch.format == "pdf":
+        return QRBatchService.to_pdf(images)
+    if batch.format == "png":
+        return QRBatchService.to_sheet(images, batch.columns)
+    return QRBatchService.to_zip(batch.payloads, images)
+
+
+@router.post("/generate-qr/batch")
+async def generate_qr_batch(batch: QRBatchRequest):
+    """Генерирует пакет QR кодов: ZIP, многостраничный PDF или лист PNG"""
+    if len(batch.payloads) > settings.QR_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не больше {settings.QR_BATCH_MAX_ITEMS} кодов за запрос",
+        )
+
+    content = await run_in_threadpool(_build_qr_batch, batch)
+
+    filename = f"qr_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{batch.format}"
+    return Response(
+        content=content,
+        media_type=BATCH_MEDIA_TYPES[batch.format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/qr-cache-stats/")
+async def get_qr_cache_stats():
+    """Метрики кэша QR кодов: попадания, промахи, вытеснения"""
+    return qr_cache.get_stats()
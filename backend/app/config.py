@@ -11,24 +11,146 @@ class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv(
         "DATABASE_URL", "postgresql://user:password@db:5432/qr_scanner"
     )
+    # Асинхронный URL (если не задан, выводится из DATABASE_URL)
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Пул соединений
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # секунды ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800  # пересоздавать соединения старше N секунд
+    DB_POOL_PRE_PING: bool = True
+    DB_ECHO: bool = False  # логировать SQL (только для отладки)
 
     # Настройки приложения
     APP_TITLE: str = "QR Scanner System"
     APP_VERSION: str = "1.0.0"
     API_V1_PREFIX: str = "/api/v1"
 
+    # Логирование и метрики
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # text или json (по строке JSON на запись)
+    METRICS_ENABLED: bool = True  # /metrics для Prometheus
+
+    # Отложенная запись сканов (группой коммитов)
+    SCAN_WRITE_BEHIND: bool = False
+    SCAN_BUFFER_FLUSH_MS: int = 50
+    SCAN_BUFFER_MAX_ROWS: int = 500  # сброс раньше срока при накоплении
+    SCAN_BUFFER_MAX_DEPTH: int = 50000  # дальше ждут сброса, без базы - 503
+    SCAN_BUFFER_ID_BATCH: int = 1000  # сколько id резервировать за раз
+    SCAN_BUFFER_WAL_DIR: Optional[str] = "wal/scans"  # пусто - только в памяти
+    SCAN_BUFFER_WAL_FSYNC: bool = True
+    # Сканы, которые база отвергла (по строке JSON), чтобы не повторять сброс
+    SCAN_BUFFER_DEAD_LETTER: str = "wal/scans-rejected.jsonl"
+
+    # Подавление повторных сканов одного кода с одного источника
+    SCAN_DEDUP_WINDOW: float = 0.0  # секунды скользящего окна; 0 - выключено
+    SCAN_DEDUP_TYPES: str = "camera,scanner"  # типы сканов через запятую
+    SCAN_DEDUP_MAX_KEYS: int = 100000
+    # Длинное окно (например 3600) через фильтр Блума и проверку по базе
+    SCAN_DEDUP_BLOOM_WINDOW: float = 0.0
+    SCAN_DEDUP_BLOOM_CAPACITY: int = 1000000  # ключей за окно
+    SCAN_DEDUP_BLOOM_ERROR_RATE: float = 0.001
+
+    # Статистика сканов по таблице scan_rollups
+    STATS_MAX_BUCKETS: int = 5000  # интервалов за один запрос /scans/stats/
+
+    # Секции scans по месяцам (PostgreSQL) и хранение старых сканов
+    SCAN_PARTITION_MONTHS_AHEAD: int = 3  # секций создавать наперед
+    SCAN_RETENTION_MONTHS: int = 0  # полных месяцев в базе; 0 - хранить все
+    SCAN_ARCHIVE_DIR: str = "archive/scans"
+    SCAN_ARCHIVE_FORMAT: str = "parquet"  # parquet (zstd) или csv (gzip)
+    SCAN_MAINTENANCE_INTERVAL: float = 3600.0  # секунды между проверками
+
+    # Пакетная загрузка сканов
+    BULK_MAX_ITEMS: int = 5000
+
     # Пути
     UPLOAD_DIR: str = "static/uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    # Сохранение кадров: always/on_failure/sample/never
+    UPLOAD_STORE_POLICY: str = "always"
+    UPLOAD_SAMPLE_RATE: int = 10  # для sample: сохранять каждый N-й кадр
+    # Кадры хранятся по хешу содержимого: local (UPLOAD_DIR) или s3
+    UPLOAD_STORAGE: str = "local"
+    # internal location nginx для X-Accel-Redirect; пусто - отдает бэкенд
+    UPLOAD_ACCEL_PREFIX: str = ""
+    UPLOAD_THUMBNAIL_FORMAT: str = "webp"  # webp или jpeg
+    UPLOAD_THUMBNAIL_SIZE: int = 256  # по большей стороне, пикселей
+    UPLOAD_THUMBNAIL_QUALITY: int = 75
+    UPLOAD_S3_ENDPOINT_URL: Optional[str] = None  # MinIO и т.п.; None - AWS
+    UPLOAD_S3_REGION: str = "us-east-1"
+    UPLOAD_S3_BUCKET: str = "qr-uploads"
+    UPLOAD_S3_PREFIX: str = ""  # префикс ключей в бакете
+    UPLOAD_S3_ACCESS_KEY: Optional[str] = None
+    UPLOAD_S3_SECRET_KEY: Optional[str] = None
+    UPLOAD_S3_URL_TTL: int = 300  # секунды жизни подписанной ссылки для nginx
+    UPLOAD_S3_ACCEL_PREFIX: str = "/internal/s3/"
+    # Старые кадры: delete - удалять, compact - складывать в zip по дням
+    UPLOAD_RETENTION_DAYS: float = 0.0  # 0 - хранить все
+    UPLOAD_SWEEP_MODE: str = "delete"
+    UPLOAD_ARCHIVE_DIR: str = "archive/uploads"
+    UPLOAD_SWEEP_INTERVAL: float = 3600.0  # секунды между проходами
+
+    # Последовательные сканеры
+    SCANNER_PORTS: str = ""  # через запятую; "auto" - найти Bestson S20-B
+    SCANNER_BAUDRATE: int = 9600
+    SCANNER_RECONNECT_MIN: float = 0.5  # секунды
+    SCANNER_RECONNECT_MAX: float = 30.0
+    SCANNER_QUEUE_SIZE: int = 10000
+    SCANNER_AUTO_PRINT: bool = False  # печатать скан на принтере по умолчанию
+    # Распознавание сканеров: "vid:pid" в hex через запятую и подстроки описания
+    SCANNER_USB_IDS: str = ""
+    SCANNER_DESCRIPTIONS: str = "Bestson,S20"
+    SCANNER_DEV_DIR: str = "/dev"
+    SCANNER_WATCH_INTERVAL: float = 1.0  # проверка изменений в SCANNER_DEV_DIR
+    SCANNER_REFRESH_INTERVAL: float = 30.0  # полное перечисление портов
+
+    # Лента сканов (WebSocket/SSE)
+    FEED_BROKER: str = "local"  # local или postgres (LISTEN/NOTIFY между воркерами)
+    FEED_QUEUE_SIZE: int = 256  # сообщений на подписчика, дальше он отключается
+    FEED_BATCH_SIZE: int = 32  # сканов в одном сообщении при пакетной загрузке
+    FEED_KEEPALIVE: float = 15.0  # секунды между keepalive в SSE
+    FEED_PG_CHANNEL: str = "scan_feed"
+    FEED_PG_OUTGOING_SIZE: int = 10000
 
     # Печать
     DEFAULT_PRINTER: Optional[str] = None
+    PRINT_CLIENT_CONCURRENCY: int = 1  # неподтвержденных заданий на клиента
+    PRINT_ACK_TIMEOUT: float = 30.0  # секунды до повтора без подтверждения
+    PRINT_MAX_ATTEMPTS: int = 5  # после этого задание уходит в dead
+    PRINT_RETRY_BASE: float = 2.0  # задержка повтора: base * 2^(попытка-1)
+    PRINT_RETRY_MAX: float = 300.0
+    PRINT_POLL_INTERVAL: float = 5.0  # страховочный опрос очереди клиента
+    PRINT_HEARTBEAT_INTERVAL: float = 15.0  # обновление printers.last_seen
+    PRINT_BATCH_SIZE: int = 32  # заданий в одном бинарном кадре (и окно клиента)
+    # JSON ping клиентам с heartbeat=1; остальных проверяет ping WebSocket
+    PRINT_PING_INTERVAL: float = 10.0  # ответ pong дает RTT
+    PRINT_IDLE_TIMEOUT: float = 30.0  # без входящих сообщений - соединение мертво
+    PRINT_SEND_QUEUE_SIZE: int = 64  # исходящих сообщений в очереди клиента
+    PRINT_SEND_TIMEOUT: float = 10.0  # на отправку и на место в очереди
 
     # QR код
     QR_CODE_SIZE: int = 10
     QR_CODE_VERSION: int = 1
+    QR_CODE_BORDER: int = 4
+
+    # Кэш сгенерированных QR кодов
+    QR_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32MB
+    QR_CACHE_REDIS_URL: Optional[str] = None  # общий кэш для всех воркеров
+    QR_CACHE_TTL: int = 24 * 3600  # время жизни записи в Redis, секунды
+    QR_HTTP_MAX_AGE: int = 24 * 3600  # Cache-Control для /generate-qr
 
+    # Пакетная генерация QR
+    QR_BATCH_MAX_ITEMS: int = 2000
+    QR_BATCH_PARALLEL_MIN: int = 200  # с какого размера пакета рисовать на всех ядрах
 
+    # Декодирование QR из изображений
+    DECODE_EXECUTOR: str = "thread"  # thread/process
+    DECODE_WORKERS: Optional[int] = None  # по умолчанию - число ядер
+    DECODE_QUEUE_DEPTH: int = 32  # задач сверх числа воркеров до отказа с 503
+    DECODE_TIMEOUT: float = 5.0  # секунды на одно изображение
+    DECODE_FAST_MAX_SIDE: int = 800  # размер кадра для быстрого прохода
 
 
 settings = Settings()
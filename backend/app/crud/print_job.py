@@ -0,0 +1,168 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update
+from typing import Dict, List, Optional
+from datetime import datetime
+from app.models.print_job import PrintJob
+from app.models.scan import Scan
+
+# Очередь заданий печати. Переходы статусов делаются одним UPDATE по
+# списку id, чтобы подтверждения от принтеров не били базу по одному.
+
+NO_SYNC = {"synchronize_session": False}
+
+
+async def create_print_job(
+    db: AsyncSession,
+    qr_data: str,
+    printer_id: str,
+    client_id: str,
+    scan_id: Optional[int] = None,
+) -> PrintJob:
+    job = PrintJob(
+        qr_data=qr_data,
+        printer_id=printer_id,
+        client_id=client_id,
+        scan_id=scan_id,
+        status="pending",
+        attempts=0,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def claim_print_jobs(
+    db: AsyncSession, client_id: str, limit: int
+) -> List[PrintJob]:
+    """Забирает готовые к отправке задания клиента и помечает их sent"""
+    ready = (
+        select(PrintJob.id)
+        .where(
+            PrintJob.client_id == client_id,
+            PrintJob.status == "pending",
+            PrintJob.next_attempt_at <= func.now(),
+        )
+        .order_by(PrintJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = await db.scalars(
+        update(PrintJob)
+        .where(PrintJob.id.in_(ready))
+        .values(status="sent", attempts=PrintJob.attempts + 1, sent_at=func.now())
+        .returning(PrintJob)
+        .execution_options(**NO_SYNC)
+    )
+    jobs = sorted(jobs.all(), key=lambda job: job.id)
+    await db.commit()
+    return jobs
+
+
+async def complete_print_jobs(db: AsyncSession, client_id: str, job_ids: List[int]):
+    """Отмечает задания клиента выполненными, а их сканы - напечатанными.
+
+    Чужие задания (другого client_id) не трогаются.
+    """
+    await db.execute(
+        update(PrintJob)
+        .where(
+            PrintJob.id.in_(job_ids),
+            PrintJob.client_id == client_id,
+            PrintJob.status != "done",
+        )
+        .values(status="done", completed_at=func.now(), last_error=None)
+        .execution_options(**NO_SYNC)
+    )
+    await db.execute(
+        update(Scan)
+        .where(
+            Scan.id.in_(
+                select(PrintJob.scan_id).where(
+                    PrintJob.id.in_(job_ids), PrintJob.client_id == client_id
+                )
+            ),
+            Scan.printed.is_(False),
+        )
+        .values(printed=True, printed_at=func.now())
+        .execution_options(**NO_SYNC)
+    )
+    await db.commit()
+
+
+async def fail_print_job(
+    db: AsyncSession, job_id: int, error: str, next_attempt_at: Optional[datetime]
+):
+    """Повтор в next_attempt_at или, если он None, в очередь мертвых заданий"""
+    values = {"last_error": error[:1000]}
+    if next_attempt_at is None:
+        values.update(status="dead", completed_at=func.now())
+    else:
+        values.update(status="pending", next_attempt_at=next_attempt_at)
+
+    await db.execute(
+        update(PrintJob)
+        .where(PrintJob.id == job_id, PrintJob.status == "sent")
+        .values(**values)
+        .execution_options(**NO_SYNC)
+    )
+    await db.commit()
+
+
+async def release_print_jobs(db: AsyncSession, job_ids: List[int]):
+    """Возвращает отправленные задания в очередь (клиент отключился)"""
+    await db.execute(
+        update(PrintJob)
+        .where(PrintJob.id.in_(job_ids), PrintJob.status == "sent")
+        .values(status="pending", next_attempt_at=func.now())
+        .execution_options(**NO_SYNC)
+    )
+    await db.commit()
+
+
+async def requeue_stale_print_jobs(db: AsyncSession, sent_before: datetime) -> int:
+    """Задания, оставшиеся в sent после падения процесса, снова в очередь"""
+    result = await db.execute(
+        update(PrintJob)
+        .where(PrintJob.status == "sent", PrintJob.sent_at < sent_before)
+        .values(status="pending", next_attempt_at=func.now())
+        .execution_options(**NO_SYNC)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def retry_print_job(db: AsyncSession, job_id: int) -> Optional[PrintJob]:
+    """Возвращает мертвое задание в очередь с обнуленными попытками"""
+    job = await db.get(PrintJob, job_id)
+    if job is None or job.status != "dead":
+        return None
+    job.status = "pending"
+    job.attempts = 0
+    job.next_attempt_at = func.now()
+    job.completed_at = None
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_print_jobs(
+    db: AsyncSession,
+    status: Optional[str] = None,
+    client_id: Optional[str] = None,
+    limit: int = 100,
+) -> List[PrintJob]:
+    query = select(PrintJob).order_by(PrintJob.id.desc()).limit(limit)
+    if status:
+        query = query.where(PrintJob.status == status)
+    if client_id:
+        query = query.where(PrintJob.client_id == client_id)
+    result = await db.scalars(query)
+    return result.all()
+
+
+async def count_print_jobs(db: AsyncSession) -> Dict[str, int]:
+    result = await db.execute(
+        select(PrintJob.status, func.count()).group_by(PrintJob.status)
+    )
+    return dict(result.all())
@@ -0,0 +1,92 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import List, Optional
+from datetime import datetime
+from app.models.printer import Printer
+
+# Реестр клиентов печати, общий для всех воркеров uvicorn
+
+NO_SYNC = {"synchronize_session": False}
+
+
+async def upsert_printer(
+    db: AsyncSession, client_id: str, worker_id: str, printer_name: str = None
+):
+    """Клиент подключился к воркеру: строка создается или переходит к нему"""
+    dialect_insert = (
+        postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    )
+    values = {
+        "printer_id": client_id,
+        "client_id": client_id,
+        "printer_name": printer_name or f"Printer_{client_id}",
+        "worker_id": worker_id,
+        "is_default": False,
+        "is_active": True,
+    }
+    statement = dialect_insert(Printer).values(values)
+    updates = {"worker_id": worker_id, "is_active": True, "last_seen": func.now()}
+    if printer_name:
+        updates["printer_name"] = printer_name
+    await db.execute(
+        statement.on_conflict_do_update(index_elements=["printer_id"], set_=updates)
+    )
+    await db.commit()
+
+
+async def touch_printers(db: AsyncSession, client_ids: List[str], worker_id: str):
+    """Heartbeat: клиенты этого воркера еще подключены"""
+    await db.execute(
+        update(Printer)
+        .where(Printer.client_id.in_(client_ids), Printer.worker_id == worker_id)
+        .values(last_seen=func.now(), is_active=True)
+        .execution_options(**NO_SYNC)
+    )
+    await db.commit()
+
+
+async def deactivate_printer(db: AsyncSession, client_id: str, worker_id: str):
+    """Клиент отключился, если он не успел переподключиться к другому воркеру"""
+    await db.execute(
+        update(Printer)
+        .where(Printer.client_id == client_id, Printer.worker_id == worker_id)
+        .values(is_active=False, last_seen=func.now())
+        .execution_options(**NO_SYNC)
+    )
+    await db.commit()
+
+
+async def deactivate_stale_printers(db: AsyncSession, seen_before: datetime) -> int:
+    """Клиенты воркеров, переставших присылать heartbeat (упавший процесс)"""
+    result = await db.execute(
+        update(Printer)
+        .where(Printer.is_active.is_(True), Printer.last_seen < seen_before)
+        .values(is_active=False)
+        .execution_options(**NO_SYNC)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def set_default_printer(db: AsyncSession, client_id: str):
+    await db.execute(
+        update(Printer)
+        .values(is_default=Printer.client_id == client_id)
+        .execution_options(**NO_SYNC)
+    )
+    await db.commit()
+
+
+async def get_default_printer(db: AsyncSession) -> Optional[str]:
+    return await db.scalar(
+        select(Printer.client_id).where(Printer.is_default.is_(True)).limit(1)
+    )
+
+
+async def get_printers(db: AsyncSession, active_only: bool = True) -> List[Printer]:
+    query = select(Printer).order_by(Printer.printer_name)
+    if active_only:
+        query = query.where(Printer.is_active.is_(True))
+    result = await db.scalars(query)
+    return result.all()
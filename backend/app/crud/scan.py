@@ -1,14 +1,17 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from sqlalchemy import desc, select
+from typing import Iterator, List, Optional
 from datetime import datetime, timedelta
 from app.models.scan import Scan
 from app.schemas.scan import ScanCreate, ScanUpdate
 
 
-def create_scan(db: Session, scan: ScanCreate) -> Scan:
+def create_scan(db: Session, scan: ScanCreate, file_path: Optional[str] = None) -> Scan:
     db_scan = Scan(
-        qr_data=scan.qr_data, scan_type=scan.scan_type, printer_id=scan.printer_id
+        qr_data=scan.qr_data,
+        scan_type=scan.scan_type,
+        printer_id=scan.printer_id,
+        file_path=file_path,
     )
     db.add(db_scan)
     db.commit()
@@ -37,6 +40,29 @@ def get_scans(
     return query.order_by(desc(Scan.scanned_at)).offset(skip).limit(limit).all()
 
 
+def iter_scans(
+    db: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    batch_size: int = 1000,
+) -> Iterator[Scan]:
+    """Построчно отдает сканы через серверный курсор (для экспорта)"""
+    query = select(Scan)
+
+    if start_date:
+        query = query.where(Scan.scanned_at >= start_date)
+    if end_date:
+        query = query.where(Scan.scanned_at <= end_date)
+
+    query = query.order_by(desc(Scan.scanned_at)).execution_options(
+        yield_per=batch_size
+    )
+    for scan in db.execute(query).scalars():
+        yield scan
+        # Не держим уже выгруженные объекты в сессии
+        db.expunge(scan)
+
+
 def update_scan(db: Session, scan_id: int, scan_update: ScanUpdate) -> Optional[Scan]:
     db_scan = get_scan(db, scan_id)
     if db_scan:
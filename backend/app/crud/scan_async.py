@@ -0,0 +1,313 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    column,
+    desc,
+    insert,
+    literal_column,
+    select,
+    table,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+from app.models.scan import Scan
+from app.models.ingest_key import ScanIngestKey
+from app.schemas.scan import BulkScanItem, BulkScanResult, ScanCreate, ScanUpdate
+
+# Асинхронные версии функций из app.crud.scan для обработчиков запросов
+
+# Триграммам нужно хотя бы 3 символа, иначе поиск по подстроке - полный проход
+MIN_SUBSTRING_LENGTH = 3
+# Индекс FTS5 для поиска по подстроке в SQLite (см. app.models.scan)
+SCANS_FTS = table("scans_fts", column("rowid"))
+
+
+async def create_scan(
+    db: AsyncSession, scan: ScanCreate, file_path: Optional[str] = None
+) -> Scan:
+    db_scan = Scan(
+        qr_data=scan.qr_data,
+        scan_type=scan.scan_type,
+        printer_id=scan.printer_id,
+        file_path=file_path,
+    )
+    db.add(db_scan)
+    await db.commit()
+    await db.refresh(db_scan)
+    return db_scan
+
+
+async def bulk_create_scans(
+    db: AsyncSession, items: List[BulkScanItem]
+) -> List[BulkScanResult]:
+    """Пакетная вставка сканов одной транзакцией.
+
+    Повторно присланные ключи идемпотентности не создают новых сканов,
+    для них возвращается id ранее созданного.
+    """
+    dialect_insert = (
+        postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    )
+
+    # Первое вхождение каждого ключа в пакете
+    first_index: Dict[str, int] = {}
+    for index, item in enumerate(items):
+        if item.idempotency_key:
+            first_index.setdefault(item.idempotency_key, index)
+
+    # Занимаем ключи; занятые ранее (ретраи) не вернутся в RETURNING
+    new_keys = set()
+    if first_index:
+        result = await db.execute(
+            dialect_insert(ScanIngestKey)
+            .values([{"idempotency_key": key} for key in first_index])
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            .returning(ScanIngestKey.idempotency_key)
+        )
+        new_keys = set(result.scalars().all())
+
+    to_insert = [
+        index
+        for index, item in enumerate(items)
+        if not item.idempotency_key
+        or (
+            item.idempotency_key in new_keys
+            and first_index[item.idempotency_key] == index
+        )
+    ]
+
+    now = datetime.now(timezone.utc)
+    scan_ids: Dict[int, int] = {}
+    if to_insert:
+        result = await db.execute(
+            insert(Scan).returning(Scan.id, sort_by_parameter_order=True),
+            [
+                {
+                    "qr_data": items[index].qr_data,
+                    "scan_type": items[index].scan_type,
+                    "printer_id": items[index].printer_id,
+                    "scanned_at": items[index].scanned_at or now,
+                    "printed": False,
+                }
+                for index in to_insert
+            ],
+        )
+        scan_ids = dict(zip(to_insert, result.scalars().all()))
+
+    # Привязываем новые ключи к созданным сканам (bulk UPDATE по первичному ключу)
+    keyed = [
+        {"idempotency_key": items[index].idempotency_key, "scan_id": scan_id}
+        for index, scan_id in scan_ids.items()
+        if items[index].idempotency_key
+    ]
+    if keyed:
+        await db.execute(update(ScanIngestKey), keyed)
+
+    # id для повторов берем из таблицы ключей
+    existing: Dict[str, int] = {}
+    old_keys = set(first_index) - new_keys
+    if old_keys:
+        result = await db.execute(
+            select(ScanIngestKey.idempotency_key, ScanIngestKey.scan_id).where(
+                ScanIngestKey.idempotency_key.in_(old_keys)
+            )
+        )
+        existing = dict(result.all())
+
+    await db.commit()
+
+    results = []
+    for index, item in enumerate(items):
+        key = item.idempotency_key
+        if index in scan_ids:
+            results.append(
+                BulkScanResult(
+                    index=index,
+                    status="created",
+                    id=scan_ids[index],
+                    idempotency_key=key,
+                )
+            )
+        else:
+            scan_id = existing.get(key) or scan_ids.get(first_index[key])
+            results.append(
+                BulkScanResult(
+                    index=index, status="duplicate", id=scan_id, idempotency_key=key
+                )
+            )
+    return results
+
+
+async def get_scan(db: AsyncSession, scan_id: int) -> Optional[Scan]:
+    return await db.get(Scan, scan_id)
+
+
+async def get_latest_scan(
+    db: AsyncSession,
+    qr_data: str,
+    scan_type: str,
+    printer_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+) -> Optional[Scan]:
+    """Последний скан кода с того же источника (для подавления повторов)"""
+    query = select(Scan).where(
+        Scan.qr_data == qr_data,
+        Scan.scan_type == scan_type,
+        (
+            Scan.printer_id.is_(None)
+            if printer_id is None
+            else Scan.printer_id == printer_id
+        ),
+    )
+    if since:
+        query = query.where(Scan.scanned_at >= since)
+    result = await db.execute(
+        query.order_by(desc(Scan.scanned_at), desc(Scan.id)).limit(1)
+    )
+    return result.scalars().first()
+
+
+def after_position(after: Tuple[datetime, int]) -> tuple:
+    """Условия keyset-пагинации: строго после (scanned_at, id).
+
+    Отдельное scanned_at <= нужно PostgreSQL: по сравнению строк он не
+    отсекает секции scans, а по нему - отсекает более новые месяцы.
+    """
+    return (
+        Scan.scanned_at <= after[0],
+        tuple_(Scan.scanned_at, Scan.id) < tuple_(*after),
+    )
+
+
+async def get_scans(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> List[Scan]:
+    query = select(Scan)
+
+    if start_date:
+        query = query.where(Scan.scanned_at >= start_date)
+    if end_date:
+        query = query.where(Scan.scanned_at <= end_date)
+
+    query = query.order_by(desc(Scan.scanned_at)).offset(skip).limit(limit)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def get_scans_page(
+    db: AsyncSession,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Tuple[List[Scan], Optional[Tuple[datetime, int]]]:
+    """Keyset-пагинация по (scanned_at, id) от новых к старым.
+
+    Возвращает страницу и позицию для следующей страницы (None - конец).
+    Время запроса не зависит от глубины страницы.
+    """
+    query = select(Scan)
+
+    if start_date:
+        query = query.where(Scan.scanned_at >= start_date)
+    if end_date:
+        query = query.where(Scan.scanned_at <= end_date)
+    if after:
+        query = query.where(*after_position(after))
+
+    query = query.order_by(desc(Scan.scanned_at), desc(Scan.id)).limit(limit + 1)
+    result = await db.execute(query)
+    scans = list(result.scalars().all())
+
+    if len(scans) <= limit:
+        return scans, None
+
+    scans = scans[:limit]
+    return scans, (scans[-1].scanned_at, scans[-1].id)
+
+
+async def search_scans(
+    db: AsyncSession,
+    query: str,
+    mode: str = "exact",
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[List[Scan], Optional[Tuple[datetime, int]]]:
+    """Поиск по qr_data: exact, prefix или substring, от новых к старым.
+
+    Каждый режим идет по своему индексу: btree для точного совпадения,
+    varchar_pattern_ops для префикса и pg_trgm (в SQLite - FTS5 с
+    триграммами) для подстроки. Пагинация - как в get_scans_page.
+    """
+    dialect = db.bind.dialect.name
+    statement = select(Scan)
+
+    if mode == "exact":
+        statement = statement.where(Scan.qr_data == query)
+    elif mode == "prefix":
+        if dialect == "sqlite":
+            # LIKE в SQLite не учитывает регистр и не идет по индексу;
+            # диапазон по байтам UTF-8 равен префиксу и идет
+            statement = statement.where(
+                Scan.qr_data >= query, Scan.qr_data < query + "\U0010ffff"
+            )
+        else:
+            statement = statement.where(Scan.qr_data.startswith(query, autoescape=True))
+    elif mode == "substring":
+        if len(query) < MIN_SUBSTRING_LENGTH:
+            raise ValueError(
+                f"Для поиска по подстроке нужно не меньше {MIN_SUBSTRING_LENGTH} символов"
+            )
+        if dialect == "sqlite":
+            phrase = '"' + query.replace('"', '""') + '"'
+            statement = statement.join(SCANS_FTS, SCANS_FTS.c.rowid == Scan.id).where(
+                literal_column("scans_fts").op("MATCH")(phrase)
+            )
+        else:
+            statement = statement.where(Scan.qr_data.contains(query, autoescape=True))
+    else:
+        raise ValueError(f"Неизвестный режим поиска: {mode}")
+
+    if after:
+        statement = statement.where(*after_position(after))
+
+    statement = statement.order_by(desc(Scan.scanned_at), desc(Scan.id)).limit(
+        limit + 1
+    )
+    result = await db.execute(statement)
+    scans = list(result.scalars().all())
+
+    if len(scans) <= limit:
+        return scans, None
+
+    scans = scans[:limit]
+    return scans, (scans[-1].scanned_at, scans[-1].id)
+
+
+async def update_scan(
+    db: AsyncSession, scan_id: int, scan_update: ScanUpdate
+) -> Optional[Scan]:
+    db_scan = await get_scan(db, scan_id)
+    if db_scan:
+        for field, value in scan_update.dict(exclude_unset=True).items():
+            if field == "printed" and value:
+                setattr(db_scan, "printed_at", datetime.utcnow())
+            setattr(db_scan, field, value)
+        await db.commit()
+        await db.refresh(db_scan)
+    return db_scan
+
+
+async def delete_scan(db: AsyncSession, scan_id: int) -> bool:
+    db_scan = await get_scan(db, scan_id)
+    if db_scan:
+        await db.delete(db_scan)
+        await db.commit()
+        return True
+    return False
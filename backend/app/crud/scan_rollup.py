@@ -0,0 +1,66 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from typing import List, Optional, Sequence
+from datetime import datetime, timezone
+from app.models.scan_rollup import ScanRollup
+from app.schemas.scan import ScanStatsBucket
+
+# Агрегаты по таблице scan_rollups: время запроса зависит от числа
+# интервалов, а не от числа сканов
+
+
+async def get_scan_stats(
+    db: AsyncSession,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    scan_type: Optional[str] = None,
+    printer_id: Optional[str] = None,
+    group_by: Sequence[str] = (),
+) -> List[ScanStatsBucket]:
+    """Сканы и напечатанные по интервалам [start, end), от старых к новым.
+
+    group_by - scan_type и/или printer_id: без них интервал один на все
+    типы и принтеры. Интервалы без сканов не возвращаются.
+    """
+    dimensions = [getattr(ScanRollup, name) for name in group_by]
+    query = select(
+        ScanRollup.bucket,
+        *dimensions,
+        func.sum(ScanRollup.scans).label("scans"),
+        func.sum(ScanRollup.printed).label("printed"),
+    ).where(
+        ScanRollup.granularity == granularity,
+        ScanRollup.bucket >= start,
+        ScanRollup.bucket < end,
+    )
+    if scan_type is not None:
+        query = query.where(ScanRollup.scan_type == scan_type)
+    if printer_id is not None:
+        query = query.where(ScanRollup.printer_id == printer_id)
+
+    query = (
+        query.group_by(ScanRollup.bucket, *dimensions)
+        # Удаления оставляют нулевые счетчики
+        .having(func.sum(ScanRollup.scans) > 0).order_by(ScanRollup.bucket, *dimensions)
+    )
+    result = await db.execute(query)
+
+    buckets = []
+    for row in result.mappings():
+        bucket = row["bucket"]
+        if bucket.tzinfo is None:
+            # SQLite возвращает время без зоны, хранится UTC
+            bucket = bucket.replace(tzinfo=timezone.utc)
+        values = {name: row[name] for name in group_by}
+        if "printer_id" in values:
+            values["printer_id"] = values["printer_id"] or None
+        buckets.append(
+            ScanStatsBucket(
+                bucket=bucket,
+                scans=int(row["scans"]),
+                printed=int(row["printed"]),
+                **values,
+            )
+        )
+    return buckets
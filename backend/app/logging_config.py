@@ -0,0 +1,55 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+from app.config import settings
+
+# Стандартные поля LogRecord; все остальное пришло через extra=
+RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON, поля extra= - отдельными ключами"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Обычная строка, поля extra= дописываются как key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        extra = [
+            f"{key}={value}"
+            for key, value in vars(record).items()
+            if key not in RECORD_FIELDS
+        ]
+        return f"{line} {' '.join(extra)}" if extra else line
+
+
+def setup_logging():
+    """Настраивает корневой логгер по LOG_LEVEL и LOG_FORMAT"""
+    handler = logging.StreamHandler()
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
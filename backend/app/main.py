@@ -1,12 +1,26 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import os
 
 from app.config import settings
-from app.database import engine, Base
+from app.logging_config import setup_logging
+from app.metrics import MetricsMiddleware, render_metrics
+from app.database import engine, async_engine, Base
 from app.api import api_router
+from app.services.decode_service import decode_service
+from app.services.image_store import image_store
+from app.services.qr_batch_service import QRBatchService
+from app.services.scan_buffer import ScanBufferFull, scan_buffer
+from app.services.scan_retention import scan_retention
+from app.services.upload_sweeper import upload_sweeper
+from app.services.broker import broker
+from app.services.print_service import print_service
+from app.services.device_registry import device_registry
+from app.services.scanner_service import scanner_manager
+
+setup_logging()
 
 
 # Создаем таблицы при запуске
@@ -18,10 +32,41 @@ async def lifespan(app: FastAPI):
     # Создаем директорию для загрузок
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
+    # Запускаем пул декодирования QR
+    decode_service.start()
+
+    # Буфер отложенной записи сканов (с восстановлением из WAL)
+    if settings.SCAN_WRITE_BEHIND:
+        await scan_buffer.start()
+
+    # Брокер ленты сканов
+    await broker.start()
+
+    # Очередь печати: вернуть задания, зависшие до перезапуска
+    await print_service.start()
+
+    # Реестр устройств и постоянное чтение последовательных сканеров
+    await device_registry.start()
+    await scanner_manager.start()
+
+    # Секции scans наперед, архив старых и очистка старых кадров
+    await scan_retention.start()
+    await upload_sweeper.start()
+
     yield
 
     # Очистка при завершении
-    pass
+    await upload_sweeper.stop()
+    await scan_retention.stop()
+    await scanner_manager.stop()
+    await print_service.stop()
+    await device_registry.stop()
+    await broker.stop()
+    await scan_buffer.stop()
+    decode_service.shutdown()
+    QRBatchService.shutdown()
+    await image_store.drain()
+    await async_engine.dispose()
 
 
 app = FastAPI(title=settings.APP_TITLE, version=settings.APP_VERSION, lifespan=lifespan)
@@ -33,15 +78,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Время запросов по маршрутам для /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Кадры не раздаются как статика (/static): только через
+# /scans/scans/{id}/image/ и /thumbnail/, файл отдает nginx
 
 # Include routers
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
 
+@app.exception_handler(ScanBufferFull)
+async def scan_buffer_full(request: Request, exc: ScanBufferFull):
+    """Скан не принят: буфер отложенной записи полон, база недоступна"""
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
+
 @app.get("/")
 async def root():
     return {
@@ -54,3 +112,12 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus"""
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    data, content_type = render_metrics()
+    return Response(data, media_type=content_type)
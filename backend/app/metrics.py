@@ -0,0 +1,152 @@
+import os
+import time
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Метрики Prometheus. При нескольких воркерах uvicorn задайте
+# PROMETHEUS_MULTIPROC_DIR - /metrics соберет значения всех процессов.
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса до начала ответа",
+    ["method", "route", "status"],
+)
+QR_DECODE_DURATION = Histogram(
+    "qr_decode_duration_seconds", "Декодирование QR в пуле воркеров"
+)
+QR_DECODE_QUEUE_WAIT = Histogram(
+    "qr_decode_queue_wait_seconds", "Ожидание свободного воркера декодирования"
+)
+QR_GENERATE_DURATION = Histogram(
+    "qr_generate_duration_seconds",
+    "Генерация PNG QR кода (без кэша)",
+    buckets=FAST_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Выполнение SQL запроса",
+    ["engine", "operation"],
+    buckets=FAST_BUCKETS,
+)
+EXPORT_DURATION = Histogram(
+    "export_duration_seconds", "Выгрузка сканов", ["format"], buckets=SLOW_BUCKETS
+)
+PRINT_DISPATCH_LATENCY = Histogram(
+    "print_dispatch_latency_seconds",
+    "От постановки задания печати до отправки клиенту (первая попытка)",
+    buckets=SLOW_BUCKETS,
+)
+SCAN_DEDUP_LOOKUPS = Counter(
+    "scan_dedup_lookups_total",
+    "Проверки сканов на повтор: hit, bloom_hit (найден в базе) или miss",
+    ["result"],
+)
+SCAN_ARCHIVED_ROWS = Counter(
+    "scan_archived_rows_total", "Сканы, перенесенные из старых секций в архив"
+)
+UPLOADS_SWEPT = Counter(
+    "uploads_swept_total",
+    "Старые загруженные кадры: deleted или compacted (в zip)",
+    ["action"],
+)
+UPLOAD_STORE_WRITES = Counter(
+    "upload_store_writes_total",
+    "Сохранение кадров: stored или duplicate (уже был в хранилище)",
+    ["result"],
+)
+PRINT_CLIENTS = Gauge(
+    "print_clients_connected",
+    "Подключенные клиенты печати",
+    multiprocess_mode="livesum",
+)
+
+DB_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Замеряет время каждого запроса движка через события SQLAlchemy"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        operation = statement.lstrip()[:6].upper()
+        if operation not in DB_OPERATIONS:
+            operation = "OTHER"
+        DB_QUERY_DURATION.labels(name, operation).observe(elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = (
+            context.connection.info.get("query_started") if context.connection else None
+        )
+        if started:
+            started.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время HTTP запросов по шаблону маршрута"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        responded = False
+
+        def observe(status: int):
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], route_name(scope), status
+            ).observe(time.perf_counter() - started)
+
+        async def send_wrapper(message):
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not responded:
+                observe(500)
+            raise
+
+
+def route_name(scope) -> str:
+    # Шаблон пути, а не сам путь: иначе по метке на каждый id
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Текст метрик для /metrics"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,21 @@
+from sqlalchemy import Integer, String, DateTime
+from sqlalchemy.orm import mapped_column, Mapped
+from sqlalchemy.sql import func
+from datetime import datetime
+from typing import Optional
+from app.database import Base
+
+
+class ScanIngestKey(Base):
+    """Ключ идемпотентности пакетной загрузки -> созданный скан"""
+
+    __tablename__ = "scan_ingest_keys"
+
+    idempotency_key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    scan_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    def __repr__(self):
+        return f"<ScanIngestKey(key={self.idempotency_key}, scan_id={self.scan_id})>"
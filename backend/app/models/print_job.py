@@ -0,0 +1,45 @@
+from sqlalchemy import Integer, String, DateTime, Text, Index
+from sqlalchemy.orm import mapped_column, Mapped
+from sqlalchemy.sql import func
+from datetime import datetime
+from typing import Optional
+from app.database import Base
+
+
+class PrintJob(Base):
+    """Задание печати: pending -> sent -> done, при ошибках - повтор или dead"""
+
+    __tablename__ = "print_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Без внешнего ключа: скан может быть еще в буфере отложенной записи
+    scan_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    qr_data: Mapped[str] = mapped_column(String(500), nullable=False)
+    printer_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    client_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    sent_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    completed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        # Выборка очереди клиента: WHERE client_id AND status ORDER BY id
+        Index("ix_print_jobs_client_id_status_id", "client_id", "status", "id"),
+        Index("ix_print_jobs_status", "status"),
+    )
+
+    def __repr__(self):
+        return (
+            f"<PrintJob(id={self.id}, client={self.client_id}, status={self.status})>"
+        )
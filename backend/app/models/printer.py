@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
 from sqlalchemy.orm import mapped_column, Mapped
 from sqlalchemy.sql import func
 from datetime import datetime
+from typing import Optional
 from app.database import Base
 
 
@@ -14,6 +15,8 @@ class Printer(Base):
     client_id: Mapped[str] = mapped_column(
         String(100), nullable=False
     )  # WebSocket client ID
+    # Воркер uvicorn, держащий сокет клиента (host:pid)
+    worker_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     is_default: Mapped[bool] = mapped_column(Boolean, default=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     last_seen: Mapped[datetime] = mapped_column(
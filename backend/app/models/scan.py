@@ -1,9 +1,55 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import (
+    Column,
+    Integer,
+    PrimaryKeyConstraint,
+    String,
+    DateTime,
+    Text,
+    Boolean,
+    Index,
+    event,
+    inspect,
+    text,
+)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql import func
 from sqlalchemy.orm import mapped_column, Mapped
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import List, Tuple
+from app.config import settings
 from app.database import Base
 
+# В PostgreSQL scans секционирована по месяцам scanned_at (UTC):
+# scans_p2026_10 и т.д., строки вне созданных секций попадают в
+# scans_default. Секции вперед создает и старые архивирует
+# app.services.scan_retention
+SCANS_DEFAULT_PARTITION = "scans_default"
+PARTITION_NAME_PATTERN = r"^scans_p[0-9]{4}_[0-9]{2}$"
+
+# Полнотекстовый индекс для поиска по подстроке в SQLite (локальный
+# запуск): FTS5 с триграммами поверх scans, обновляется триггерами
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS scans_fts USING fts5("
+    "qr_data, content='scans', content_rowid='id', "
+    "tokenize='trigram case_sensitive 1')",
+    "CREATE TRIGGER IF NOT EXISTS scans_fts_insert AFTER INSERT ON scans BEGIN "
+    "INSERT INTO scans_fts(rowid, qr_data) VALUES (new.id, new.qr_data); END",
+    "CREATE TRIGGER IF NOT EXISTS scans_fts_delete AFTER DELETE ON scans BEGIN "
+    "INSERT INTO scans_fts(scans_fts, rowid, qr_data) "
+    "VALUES ('delete', old.id, old.qr_data); END",
+    "CREATE TRIGGER IF NOT EXISTS scans_fts_update AFTER UPDATE OF qr_data "
+    "ON scans BEGIN "
+    "INSERT INTO scans_fts(scans_fts, rowid, qr_data) "
+    "VALUES ('delete', old.id, old.qr_data); "
+    "INSERT INTO scans_fts(rowid, qr_data) VALUES (new.id, new.qr_data); END",
+]
+
+
+def pg_trgm_installed(ddl, target, bind, **kw) -> bool:
+    return bind is not None and bool(
+        bind.scalar(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+    )
+
 
 class Scan(Base):
     __tablename__ = "scans"
@@ -21,5 +67,192 @@ class Scan(Base):
     printed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
     printer_id: Mapped[str] = mapped_column(String(100), nullable=True)
 
+    __table_args__ = (
+        # Keyset-пагинация истории: ORDER BY scanned_at DESC, id DESC
+        Index("ix_scans_scanned_at_id", "scanned_at", "id"),
+        # Фильтры истории по принтеру и статусу печати
+        Index("ix_scans_printer_id_scanned_at", "printer_id", "scanned_at"),
+        Index("ix_scans_printed_scanned_at", "printed", "scanned_at"),
+        Index("ix_scans_qr_data", "qr_data"),
+        # Поиск по префиксу (LIKE 'abc%') при любой collation базы
+        Index(
+            "ix_scans_qr_data_pattern",
+            "qr_data",
+            postgresql_ops={"qr_data": "varchar_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+        # Поиск по подстроке (LIKE '%abc%'), если доступно расширение pg_trgm
+        Index(
+            "ix_scans_qr_data_trgm",
+            "qr_data",
+            postgresql_using="gin",
+            postgresql_ops={"qr_data": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql", callable_=pg_trgm_installed),
+        {
+            "postgresql_partition_by": "RANGE (scanned_at)",
+            "info": {"partition_key": "scanned_at"},
+        },
+    )
+
     def __repr__(self):
         return f"<Scan(id={self.id}, data={self.qr_data[:50]})>"
+
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _partitioned_primary_key(constraint, compiler, **kw):
+    # Ключ секционированной таблицы обязан включать ключ секционирования.
+    # ORM по-прежнему находит скан по id: его выдает одна последовательность
+    key = constraint.table.info.get("partition_key")
+    if key is None or key in constraint.columns:
+        return compiler.visit_primary_key_constraint(constraint, **kw)
+    columns = [column.name for column in constraint.columns] + [key]
+    quote = compiler.preparer.quote
+    return "PRIMARY KEY (%s)" % ", ".join(quote(name) for name in columns)
+
+
+def month_start(value: datetime) -> datetime:
+    """Начало месяца (UTC), в который попадает момент"""
+    value = value.astimezone(timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"scans_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> datetime:
+    """scans_p2026_10 -> 2026-10-01 00:00 UTC"""
+    year, month = name.removeprefix("scans_p").split("_")
+    return datetime(int(year), int(month), 1, tzinfo=timezone.utc)
+
+
+def scans_partitioned(connection) -> bool:
+    """Секционирована ли scans (создана моделью или миграцией 0008)"""
+    return connection.dialect.name == "postgresql" and bool(
+        connection.scalar(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.oid = to_regclass('scans')"
+            )
+        )
+    )
+
+
+def get_scan_partitions(
+    connection, attached: bool = True
+) -> List[Tuple[str, datetime]]:
+    """Месячные секции (имя, начало месяца) по возрастанию.
+
+    attached=False - таблицы секций, уже отсоединенные от scans, но еще
+    не удаленные (архивирование прервалось).
+    """
+    if attached:
+        query = (
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass('scans') AND c.relname ~ :pattern"
+        )
+    else:
+        query = (
+            "SELECT c.relname FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = current_schema() AND c.relkind = 'r' "
+            "AND NOT c.relispartition AND c.relname ~ :pattern"
+        )
+    names = connection.scalars(text(query), {"pattern": PARTITION_NAME_PATTERN}).all()
+    return sorted((name, partition_month(name)) for name in names)
+
+
+def create_scan_partitions(connection, first: datetime, last: datetime) -> List[str]:
+    """Создает недостающие месячные секции с first по last включительно.
+
+    Если в scans_default уже есть строки за этот месяц (скан с часами,
+    ушедшими вперед), они переносятся в новую секцию: иначе PostgreSQL
+    не даст ее подключить.
+    """
+    existing = {name for name, _ in get_scan_partitions(connection)}
+    created = []
+    month = month_start(first)
+    while month <= last:
+        name = partition_name(month)
+        bounds = {"start": month, "end": add_months(month, 1)}
+        if name not in existing:
+            stray = connection.scalar(
+                text(
+                    f"SELECT 1 FROM {SCANS_DEFAULT_PARTITION} "
+                    "WHERE scanned_at >= :start AND scanned_at < :end LIMIT 1"
+                ),
+                bounds,
+            )
+            start, end = (f"'{value.isoformat()}'" for value in bounds.values())
+            if stray:
+                connection.execute(
+                    text(f"CREATE TABLE {name} (LIKE scans INCLUDING DEFAULTS)")
+                )
+                # Напрямую из секции: триггеры счетчиков на scans не срабатывают
+                connection.execute(
+                    text(
+                        f"WITH moved AS (DELETE FROM {SCANS_DEFAULT_PARTITION} "
+                        "WHERE scanned_at >= :start AND scanned_at < :end "
+                        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+                    ),
+                    bounds,
+                )
+                connection.execute(
+                    text(
+                        f"ALTER TABLE scans ATTACH PARTITION {name} "
+                        f"FOR VALUES FROM ({start}) TO ({end})"
+                    )
+                )
+            else:
+                connection.execute(
+                    text(
+                        f"CREATE TABLE {name} PARTITION OF scans "
+                        f"FOR VALUES FROM ({start}) TO ({end})"
+                    )
+                )
+            created.append(name)
+        month = bounds["end"]
+    return created
+
+
+@event.listens_for(Scan.__table__, "after_create")
+def _create_scan_partitions(target, connection, **kw):
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(
+        text(f"CREATE TABLE {SCANS_DEFAULT_PARTITION} PARTITION OF scans DEFAULT")
+    )
+    month = month_start(datetime.now(timezone.utc))
+    create_scan_partitions(
+        connection, month, add_months(month, settings.SCAN_PARTITION_MONTHS_AHEAD)
+    )
+
+
+@event.listens_for(Base.metadata, "before_create")
+def _create_pg_trgm(target, connection, **kw):
+    if connection.dialect.name != "postgresql":
+        return
+    available = connection.scalar(
+        text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    )
+    if available:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_sqlite_search(target, connection, **kw):
+    # create_all вызывается при каждом запуске: для уже существующей базы
+    # индекс создается и заполняется один раз
+    if connection.dialect.name != "sqlite":
+        return
+    exists = inspect(connection).has_table("scans_fts")
+    for statement in SQLITE_SEARCH_DDL:
+        connection.execute(text(statement))
+    if not exists:
+        connection.execute(text("INSERT INTO scans_fts(scans_fts) VALUES ('rebuild')"))
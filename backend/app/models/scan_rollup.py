@@ -0,0 +1,184 @@
+from sqlalchemy import BigInteger, DateTime, String, event, text
+from sqlalchemy.orm import mapped_column, Mapped
+from datetime import datetime
+from app.database import Base
+
+GRANULARITIES = ("minute", "hour", "day")
+
+# Счетчики ведут триггеры на scans, поэтому их видят все пути записи:
+# одиночные сканы, пакетная загрузка, буфер отложенной записи, отметка
+# печати и удаление. В PostgreSQL триггеры уровня оператора с таблицами
+# переходов: пачка из тысячи строк - один INSERT ... ON CONFLICT.
+POSTGRES_ROLLUP_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION scan_rollups_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO scan_rollups
+                (granularity, bucket, scan_type, printer_id, scans, printed)
+            SELECT g.granularity, date_trunc(g.granularity, n.scanned_at, 'UTC'),
+                   coalesce(n.scan_type, ''), coalesce(n.printer_id, ''),
+                   count(*), count(*) FILTER (WHERE n.printed)
+            FROM new_rows n
+            CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+            GROUP BY 1, 2, 3, 4
+            ORDER BY 1, 2, 3, 4
+            ON CONFLICT (granularity, bucket, scan_type, printer_id) DO UPDATE
+            SET scans = scan_rollups.scans + excluded.scans,
+                printed = scan_rollups.printed + excluded.printed;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            INSERT INTO scan_rollups
+                (granularity, bucket, scan_type, printer_id, scans, printed)
+            SELECT g.granularity, date_trunc(g.granularity, o.scanned_at, 'UTC'),
+                   coalesce(o.scan_type, ''), coalesce(o.printer_id, ''),
+                   -count(*), -count(*) FILTER (WHERE o.printed)
+            FROM old_rows o
+            CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+            GROUP BY 1, 2, 3, 4
+            ORDER BY 1, 2, 3, 4
+            ON CONFLICT (granularity, bucket, scan_type, printer_id) DO UPDATE
+            SET scans = scan_rollups.scans + excluded.scans,
+                printed = scan_rollups.printed + excluded.printed;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "CREATE TRIGGER scan_rollups_insert AFTER INSERT ON scans "
+    "REFERENCING NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION scan_rollups_apply()",
+    "CREATE TRIGGER scan_rollups_update AFTER UPDATE ON scans "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION scan_rollups_apply()",
+    "CREATE TRIGGER scan_rollups_delete AFTER DELETE ON scans "
+    "REFERENCING OLD TABLE AS old_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION scan_rollups_apply()",
+]
+
+POSTGRES_ROLLUP_BACKFILL = """
+    INSERT INTO scan_rollups (granularity, bucket, scan_type, printer_id, scans, printed)
+    SELECT g.granularity, date_trunc(g.granularity, s.scanned_at, 'UTC'),
+           coalesce(s.scan_type, ''), coalesce(s.printer_id, ''),
+           count(*), count(*) FILTER (WHERE s.printed)
+    FROM scans s
+    CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+    GROUP BY 1, 2, 3, 4
+    """
+
+# В SQLite scanned_at - строка 'YYYY-MM-DD HH:MM:SS.ffffff' (UTC),
+# начало интервала - ее префикс
+SQLITE_BUCKETS = {
+    "minute": "substr({row}.scanned_at, 1, 16) || ':00.000000'",
+    "hour": "substr({row}.scanned_at, 1, 13) || ':00:00.000000'",
+    "day": "substr({row}.scanned_at, 1, 10) || ' 00:00:00.000000'",
+}
+
+
+def _sqlite_rows(row: str, sign: str) -> str:
+    return ", ".join(
+        f"('{granularity}', {bucket.format(row=row)}, coalesce({row}.scan_type, ''), "
+        f"coalesce({row}.printer_id, ''), {sign}1, {sign}coalesce({row}.printed, 0))"
+        for granularity, bucket in SQLITE_BUCKETS.items()
+    )
+
+
+def _sqlite_upsert(row: str, sign: str) -> str:
+    return (
+        "INSERT INTO scan_rollups "
+        "(granularity, bucket, scan_type, printer_id, scans, printed) "
+        f"VALUES {_sqlite_rows(row, sign)} "
+        "ON CONFLICT (granularity, bucket, scan_type, printer_id) DO UPDATE "
+        "SET scans = scans + excluded.scans, printed = printed + excluded.printed;"
+    )
+
+
+SQLITE_ROLLUP_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS scan_rollups_insert AFTER INSERT ON scans BEGIN "
+    f"{_sqlite_upsert('new', '')} END",
+    "CREATE TRIGGER IF NOT EXISTS scan_rollups_update AFTER UPDATE OF "
+    "scanned_at, scan_type, printer_id, printed ON scans BEGIN "
+    f"{_sqlite_upsert('old', '-')} {_sqlite_upsert('new', '')} END",
+    "CREATE TRIGGER IF NOT EXISTS scan_rollups_delete AFTER DELETE ON scans BEGIN "
+    f"{_sqlite_upsert('old', '-')} END",
+]
+
+SQLITE_ROLLUP_BACKFILL = (
+    "INSERT INTO scan_rollups "
+    "(granularity, bucket, scan_type, printer_id, scans, printed) "
+    "SELECT g.granularity, CASE g.granularity "
+    + " ".join(
+        f"WHEN '{granularity}' THEN {bucket.format(row='s')}"
+        for granularity, bucket in SQLITE_BUCKETS.items()
+    )
+    + " END, coalesce(s.scan_type, ''), coalesce(s.printer_id, ''), "
+    "count(*), coalesce(sum(s.printed), 0) FROM scans s CROSS JOIN ("
+    "SELECT 'minute' AS granularity UNION ALL SELECT 'hour' UNION ALL SELECT 'day'"
+    ") AS g "
+    "GROUP BY 1, 2, 3, 4"
+)
+
+
+class ScanRollup(Base):
+    """Число сканов и напечатанных за минуту/час/день по типу и принтеру.
+
+    Пустой printer_id - скан без принтера (NULL не может входить в ключ).
+    """
+
+    __tablename__ = "scan_rollups"
+
+    granularity: Mapped[str] = mapped_column(String(10), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    scan_type: Mapped[str] = mapped_column(String(50), primary_key=True)
+    printer_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    scans: Mapped[int] = mapped_column(BigInteger, default=0)
+    printed: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    def __repr__(self):
+        return (
+            f"<ScanRollup({self.granularity} {self.bucket}, "
+            f"{self.scan_type}/{self.printer_id}: {self.scans})>"
+        )
+
+
+def install_rollup_triggers(connection):
+    """Создает триггеры и заполняет счетчики по уже записанным сканам.
+
+    Вызывается при каждом create_all; повторно ничего не делает. В
+    PostgreSQL воркеры, стартующие одновременно, ждут друг друга на
+    advisory-блокировке, чтобы не заполнить счетчики дважды.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext('scan_rollups'))")
+        )
+        installed = connection.scalar(
+            text("SELECT 1 FROM pg_trigger WHERE tgname = 'scan_rollups_insert'")
+        )
+        ddl, backfill = POSTGRES_ROLLUP_DDL, POSTGRES_ROLLUP_BACKFILL
+    elif dialect == "sqlite":
+        installed = connection.scalar(
+            text(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'trigger' AND name = 'scan_rollups_insert'"
+            )
+        )
+        ddl, backfill = SQLITE_ROLLUP_DDL, SQLITE_ROLLUP_BACKFILL
+    else:
+        return
+
+    if installed:
+        return
+    # Сначала триггеры: CREATE TRIGGER блокирует запись в scans до конца
+    # транзакции, и ни один скан не пройдет мимо заполнения
+    # Без text(): ':00' в SQL не должно читаться как параметр
+    for statement in ddl:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("DELETE FROM scan_rollups")
+    connection.exec_driver_sql(backfill)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_rollup_triggers(target, connection, **kw):
+    install_rollup_triggers(connection)
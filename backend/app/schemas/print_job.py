@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class PrintJobResponse(BaseModel):
+    id: int
+    scan_id: Optional[int] = None
+    qr_data: str
+    printer_id: str
+    client_id: str
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    next_attempt_at: datetime
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class PrintQueueStats(BaseModel):
+    jobs: Dict[str, int]
+    worker_id: str
+    clients: List[dict]
+
+
+class PrinterResponse(BaseModel):
+    printer_id: str
+    printer_name: str
+    client_id: str
+    worker_id: Optional[str] = None
+    is_default: bool
+    is_active: bool
+    last_seen: datetime
+
+    class Config:
+        from_attributes = True
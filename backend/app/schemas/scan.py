@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 
 class ScanBase(BaseModel):
@@ -10,12 +10,37 @@ class ScanBase(BaseModel):
 
 
 class ScanCreate(ScanBase):
-    pass
+    # Длины - как у колонок scans: длиннее база не примет
+    qr_data: str = Field(max_length=500)
+    scan_type: str = Field(default="camera", max_length=50)
+    printer_id: Optional[str] = Field(default=None, max_length=100)
+
+
+class BulkScanItem(ScanCreate):
+    scanned_at: Optional[datetime] = None  # время скана на устройстве
+    idempotency_key: Optional[str] = Field(default=None, max_length=100)
+
+
+class BulkScanRequest(BaseModel):
+    scans: List[BulkScanItem] = Field(min_length=1)
+
+
+class BulkScanResult(BaseModel):
+    index: int
+    status: Literal["created", "duplicate"]
+    id: Optional[int] = None
+    idempotency_key: Optional[str] = None
+
+
+class BulkScanResponse(BaseModel):
+    created: int
+    duplicates: int
+    results: List[BulkScanResult]
 
 
 class ScanUpdate(BaseModel):
     printed: Optional[bool] = None
-    printer_id: Optional[str] = None
+    printer_id: Optional[str] = Field(default=None, max_length=100)
 
 
 class ScanInDB(ScanBase):
@@ -29,7 +54,36 @@ class ScanInDB(ScanBase):
 
 
 class ScanResponse(ScanInDB):
-    pass
+    file_path: Optional[str] = Field(default=None, exclude=True)
+
+    @computed_field
+    @property
+    def has_image(self) -> bool:
+        """Есть сохраненный кадр: /scans/{id}/image/ и /thumbnail/"""
+        return bool(self.file_path)
+
+
+class ImageScanResponse(ScanResponse):
+    symbols: List[str] = []  # все QR коды, найденные на изображении
+    duplicate: bool = False  # повтор в окне подавления, скан не создан
+
+
+class ScanStatsBucket(BaseModel):
+    bucket: datetime  # начало интервала, UTC
+    scan_type: Optional[str] = None  # при group_by=scan_type
+    printer_id: Optional[str] = None  # при group_by=printer_id
+    scans: int
+    printed: int
+
+
+class ScanStatsResponse(BaseModel):
+    granularity: Literal["minute", "hour", "day"]
+    start: datetime
+    end: datetime
+    scans: int
+    printed: int
+    print_rate: float  # доля напечатанных за весь период
+    buckets: List[ScanStatsBucket]
 
 
 class PrintCommand(BaseModel):
@@ -38,6 +92,24 @@ class PrintCommand(BaseModel):
     client_id: Optional[str] = None
 
 
+class RegionOfInterest(BaseModel):
+    x: int = Field(ge=0)
+    y: int = Field(ge=0)
+    width: int = Field(gt=0)
+    height: int = Field(gt=0)
+
+    def as_tuple(self):
+        return (self.x, self.y, self.width, self.height)
+
+
 class QRScanRequest(BaseModel):
     image_data: str  # base64 encoded image
     client_id: Optional[str] = None
+    roi: Optional[RegionOfInterest] = None  # область кадра, где ожидается QR
+
+
+class QRBatchRequest(BaseModel):
+    payloads: List[str] = Field(min_length=1)
+    format: Literal["zip", "pdf", "png"] = "zip"  # png - один лист этикеток
+    size: int = Field(default=10, ge=1, le=50)
+    columns: Optional[int] = Field(default=None, ge=1)  # для листа этикеток
@@ -0,0 +1,401 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Set
+
+from app.config import settings
+from app.database import get_async_database_url
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Подписка на тему с ограниченной очередью.
+
+    Если подписчик не успевает забирать сообщения и очередь заполнена,
+    он отключается (closed, overflowed) - медленный клиент не держит
+    память и не тормозит остальных. None в очереди - конец подписки.
+
+    select получает сообщение и возвращает то, что нужно доставить
+    (например, отфильтрованное), или None, чтобы пропустить его.
+    """
+
+    def __init__(
+        self,
+        topic: str,
+        maxsize: int,
+        select: Optional[Callable[[dict], Optional[dict]]] = None,
+    ):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.select = select
+        self.closed = False
+        self.overflowed = False
+        self.delivered = 0
+
+    def deliver(self, message: dict):
+        if self.closed:
+            return
+        if self.select:
+            message = self.select(message)
+            if message is None:
+                return
+        try:
+            self.queue.put_nowait(message)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Освобождаем место под маркер конца, непрочитанное уже не нужно
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Следующее сообщение; None - подписка закрыта.
+
+        По истечении timeout бросает asyncio.TimeoutError.
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LocalBroker:
+    """Публикация и подписка внутри одного процесса"""
+
+    MAX_PAYLOAD: Optional[int] = None  # лимит сообщения в байтах JSON
+
+    def __init__(self):
+        self.subscriptions: Dict[str, Set[Subscription]] = {}
+        self.handlers: Dict[str, List[Callable[[dict], None]]] = {}
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+        self.subscriptions.clear()
+
+    def subscribe(
+        self,
+        topic: str,
+        select: Optional[Callable[[dict], Optional[dict]]] = None,
+        maxsize: int = None,
+    ) -> Subscription:
+        subscription = Subscription(
+            topic, maxsize or settings.FEED_QUEUE_SIZE, select=select
+        )
+        self.subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self.subscriptions.get(subscription.topic)
+        if subscriptions:
+            subscriptions.discard(subscription)
+        subscription.close()
+
+    def add_handler(self, topic: str, handler: Callable[[dict], None]):
+        """Служебный обработчик: вызывается для каждого сообщения темы
+        без очереди (маршрутизация между воркерами и т.п.)"""
+        self.handlers.setdefault(topic, []).append(handler)
+
+    def remove_handler(self, topic: str, handler: Callable[[dict], None]):
+        handlers = self.handlers.get(topic, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def has_subscribers(self, topic: str) -> bool:
+        """Есть ли кому доставлять (чтобы не готовить сообщение зря)"""
+        return bool(self.subscriptions.get(topic) or self.handlers.get(topic))
+
+    def publish(self, topic: str, message: dict):
+        """Рассылает сообщение подписчикам темы (не блокирует)"""
+        self.published += 1
+        self._deliver(topic, message)
+
+    def publish_batch(
+        self,
+        topic: str,
+        items: list,
+        build: Callable[[list], dict],
+        batch_size: int,
+    ):
+        """Публикует items несколькими сообщениями build(часть).
+
+        В сообщении не больше batch_size элементов и, если у брокера есть
+        лимит, не больше MAX_PAYLOAD байт.
+        """
+        if self.MAX_PAYLOAD is None:
+            for start in range(0, len(items), batch_size):
+                self.publish(topic, build(items[start : start + batch_size]))
+            return
+
+        # Размер пустого сообщения плюс элементы с разделителем ", "
+        limit = self.MAX_PAYLOAD - len(self._payload(topic, build([])))
+        chunk, size = [], 0
+        for item in items:
+            item_size = len(json.dumps(item, default=str).encode()) + 2
+            if chunk and (len(chunk) >= batch_size or size + item_size >= limit):
+                self.publish(topic, build(chunk))
+                chunk, size = [], 0
+            chunk.append(item)
+            size += item_size
+        if chunk:
+            self.publish(topic, build(chunk))
+
+    @staticmethod
+    def _payload(topic: str, message: dict) -> bytes:
+        return json.dumps({"topic": topic, "message": message}, default=str).encode()
+
+    def _deliver(self, topic: str, message: dict):
+        for handler in list(self.handlers.get(topic, ())):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.exception("Ошибка обработчика темы %s: %s", topic, e)
+
+        for subscription in list(self.subscriptions.get(topic, ())):
+            subscription.deliver(message)
+            if subscription.overflowed:
+                self.dropped_subscribers += 1
+                self.subscriptions[topic].discard(subscription)
+
+    def get_stats(self) -> dict:
+        return {
+            "broker": type(self).__name__,
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+            "subscribers": {
+                topic: len(subscriptions)
+                for topic, subscriptions in self.subscriptions.items()
+            },
+        }
+
+
+class PostgresBroker(LocalBroker):
+    """Рассылка между воркерами uvicorn через LISTEN/NOTIFY PostgreSQL.
+
+    Сообщение уходит в канал NOTIFY и доставляется локальным подписчикам
+    каждого воркера (включая отправителя), когда приходит уведомление.
+    Отправка не ждет базу: сообщения копятся и уходят пачкой одним
+    запросом pg_notify.
+
+    Воркеры сообщают друг другу темы, на которые у них есть подписчики
+    (при изменении и раз в PRESENCE_INTERVAL), чтобы has_subscribers
+    не готовил сообщения, которые некому доставить.
+    """
+
+    RECONNECT_MIN = 0.5  # секунды
+    RECONNECT_MAX = 30.0
+    SEND_BATCH = 500
+    MAX_PAYLOAD = 8000  # лимит полезной нагрузки NOTIFY по умолчанию
+    PRESENCE_TOPIC = "_presence"
+    PRESENCE_INTERVAL = 10.0  # секунды между повторами списка тем
+    PRESENCE_TTL = 30.0  # темы молчащего воркера забываются
+
+    def __init__(self, channel: str = None):
+        super().__init__()
+        self.channel = channel or settings.FEED_PG_CHANNEL
+        self.outgoing: asyncio.Queue = None
+        self.connection = None
+        self.tasks: List[asyncio.Task] = []
+        self.connected = asyncio.Event()
+        self.worker_id = uuid.uuid4().hex
+        self.announced: Set[str] = set()
+        # тема -> {воркер: когда забыть}
+        self.remote: Dict[str, Dict[str, float]] = {}
+
+    async def start(self):
+        self.outgoing = asyncio.Queue(maxsize=settings.FEED_PG_OUTGOING_SIZE)
+        self.tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._send()),
+            asyncio.create_task(self._presence()),
+        ]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.connection:
+            await self.connection.close()
+            self.connection = None
+        await super().stop()
+
+    def subscribe(
+        self,
+        topic: str,
+        select: Optional[Callable[[dict], Optional[dict]]] = None,
+        maxsize: int = None,
+    ) -> Subscription:
+        subscription = super().subscribe(topic, select=select, maxsize=maxsize)
+        self._announce()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        super().unsubscribe(subscription)
+        self._announce()
+
+    def add_handler(self, topic: str, handler: Callable[[dict], None]):
+        super().add_handler(topic, handler)
+        self._announce()
+
+    def remove_handler(self, topic: str, handler: Callable[[dict], None]):
+        super().remove_handler(topic, handler)
+        self._announce()
+
+    def has_subscribers(self, topic: str) -> bool:
+        if super().has_subscribers(topic):
+            return True
+        # Подписчики в других воркерах
+        now = time.monotonic()
+        return any(expires > now for expires in self.remote.get(topic, {}).values())
+
+    def publish(self, topic: str, message: dict):
+        self.published += 1
+        payload = self._payload(topic, message)
+        if len(payload) >= self.MAX_PAYLOAD:
+            logger.warning("Сообщение больше лимита NOTIFY, доставлено только локально")
+            self._deliver(topic, message)
+            return
+        if not self._enqueue(payload.decode()):
+            logger.warning(
+                "Очередь NOTIFY переполнена, сообщение доставлено только локально"
+            )
+            self._deliver(topic, message)
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            **super().get_stats(),
+            "remote_workers": {
+                topic: sum(1 for expires in workers.values() if expires > now)
+                for topic, workers in self.remote.items()
+            },
+        }
+
+    def _enqueue(self, payload: str) -> bool:
+        if self.outgoing is None:
+            return False
+        try:
+            self.outgoing.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _topics(self) -> Set[str]:
+        """Темы, которые нужны этому воркеру"""
+        return {topic for topic, subs in self.subscriptions.items() if subs} | {
+            topic for topic, handlers in self.handlers.items() if handlers
+        }
+
+    def _announce(self, force: bool = False, sync: bool = False):
+        """Рассылает темы этого воркера, если они изменились"""
+        topics = self._topics()
+        if topics == self.announced and not force:
+            return
+        message = {"worker": self.worker_id, "topics": sorted(topics), "sync": sync}
+        if self._enqueue(self._payload(self.PRESENCE_TOPIC, message).decode()):
+            self.announced = topics
+
+    def _on_presence(self, message: dict):
+        worker = message["worker"]
+        if worker == self.worker_id:
+            return
+        expires = time.monotonic() + self.PRESENCE_TTL
+        topics = set(message["topics"])
+        for topic in topics | set(self.remote):
+            workers = self.remote.setdefault(topic, {})
+            if topic in topics:
+                workers[worker] = expires
+            else:
+                workers.pop(worker, None)
+        if message["sync"]:
+            # Новый воркер: сообщаем ему свои темы сразу, без ожидания повтора
+            self._announce(force=True)
+
+    async def _presence(self):
+        while True:
+            await asyncio.sleep(self.PRESENCE_INTERVAL)
+            # Повтор продлевает темы у других воркеров и учитывает
+            # подписчиков, отключенных за переполнение
+            self._announce(force=True)
+
+    async def _connect(self):
+        import asyncpg
+        from sqlalchemy.engine import make_url
+
+        url = make_url(get_async_database_url()).set(drivername="postgresql")
+        return await asyncpg.connect(url.render_as_string(hide_password=False))
+
+    async def _listen(self):
+        delay = self.RECONNECT_MIN
+        while True:
+            try:
+                self.connection = await self._connect()
+                lost = asyncio.Event()
+                self.connection.add_termination_listener(lambda _: lost.set())
+                await self.connection.add_listener(self.channel, self._on_notify)
+                self.connected.set()
+                # Уведомления за время без соединения потеряны: запрашиваем темы заново
+                self._announce(force=True, sync=True)
+                delay = self.RECONNECT_MIN
+                await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка подключения LISTEN %s: %s", self.channel, e)
+            self.connected.clear()
+            self.connection = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_MAX)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        data = json.loads(payload)
+        if data["topic"] == self.PRESENCE_TOPIC:
+            self._on_presence(data["message"])
+            return
+        self._deliver(data["topic"], data["message"])
+
+    async def _send(self):
+        while True:
+            batch = [await self.outgoing.get()]
+            while not self.outgoing.empty() and len(batch) < self.SEND_BATCH:
+                batch.append(self.outgoing.get_nowait())
+
+            await self.connected.wait()
+            try:
+                await self.connection.execute(
+                    "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                    self.channel,
+                    batch,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка NOTIFY %s: %s", self.channel, e)
+                for payload in batch:
+                    data = json.loads(payload)
+                    if data["topic"] != self.PRESENCE_TOPIC:
+                        self._deliver(data["topic"], data["message"])
+
+
+def create_broker():
+    if settings.FEED_BROKER == "postgres":
+        return PostgresBroker()
+    return LocalBroker()
+
+
+# Глобальный брокер сообщений (лента сканов и т.п.)
+broker = create_broker()
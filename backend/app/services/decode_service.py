@@ -0,0 +1,141 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from app.config import settings
+from app.metrics import QR_DECODE_DURATION, QR_DECODE_QUEUE_WAIT
+from app.services.qr_service import QRService
+
+
+class DecodeQueueFull(Exception):
+    """Очередь декодирования переполнена"""
+
+
+class DecodeTimeout(Exception):
+    """Декодирование не уложилось в отведенное время"""
+
+
+def _decode_job(
+    image_data: bytes, roi: Optional[Tuple[int, int, int, int]], submitted_at: float
+) -> Tuple[List[str], float, float]:
+    """Выполняется в воркере: декодирует изображение и замеряет время"""
+    started_at = time.time()
+    symbols = QRService.decode_qr_codes(image_data, roi)
+    return symbols, started_at - submitted_at, time.time() - started_at
+
+
+class DecodeStats:
+    """Счетчики пула декодирования"""
+
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.decode_time_total = 0.0
+        self.decode_time_max = 0.0
+
+    def observe(self, queue_wait: float, decode_time: float):
+        self.completed += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.decode_time_total += decode_time
+        self.decode_time_max = max(self.decode_time_max, decode_time)
+
+    def as_dict(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait_avg_ms": round(self.queue_wait_total / completed * 1000, 2),
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 2),
+            "decode_time_avg_ms": round(self.decode_time_total / completed * 1000, 2),
+            "decode_time_max_ms": round(self.decode_time_max * 1000, 2),
+        }
+
+
+class DecodeService:
+    """Пул воркеров для декодирования QR кодов вне event loop"""
+
+    def __init__(self):
+        self.executor: Optional[Executor] = None
+        self.workers = 0
+        self.capacity = 0
+        self.in_flight = 0
+        self.stats = DecodeStats()
+
+    def start(self):
+        """Запускает пул воркеров"""
+        self.workers = settings.DECODE_WORKERS or os.cpu_count() or 1
+        self.capacity = self.workers + settings.DECODE_QUEUE_DEPTH
+
+        # pyzbar и cv2 отпускают GIL, поэтому потоков обычно достаточно
+        if settings.DECODE_EXECUTOR == "process":
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="qr-decode"
+            )
+
+    def shutdown(self):
+        """Останавливает пул воркеров"""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _release(self, _future=None):
+        self.in_flight -= 1
+
+    async def decode(
+        self, image_data: bytes, roi: Optional[Tuple[int, int, int, int]] = None
+    ) -> List[str]:
+        """Декодирует все QR коды изображения в пуле воркеров"""
+        if self.executor is None:
+            self.start()
+
+        if self.in_flight >= self.capacity:
+            self.stats.rejected += 1
+            raise DecodeQueueFull("Очередь декодирования переполнена")
+
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        future = loop.run_in_executor(
+            self.executor, _decode_job, image_data, roi, time.time()
+        )
+        # Слот освобождается, только когда воркер действительно закончил
+        future.add_done_callback(self._release)
+
+        try:
+            symbols, queue_wait, decode_time = await asyncio.wait_for(
+                asyncio.shield(future), timeout=settings.DECODE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            self.stats.timed_out += 1
+            raise DecodeTimeout("Превышено время декодирования изображения")
+        except Exception:
+            self.stats.failed += 1
+            raise
+
+        self.stats.observe(queue_wait, decode_time)
+        QR_DECODE_DURATION.observe(decode_time)
+        QR_DECODE_QUEUE_WAIT.observe(queue_wait)
+        return symbols
+
+    def get_stats(self) -> dict:
+        """Возвращает метрики пула"""
+        return {
+            "executor": settings.DECODE_EXECUTOR,
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            **self.stats.as_dict(),
+        }
+
+
+# Глобальный экземпляр пула декодирования
+decode_service = DecodeService()
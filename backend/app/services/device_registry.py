@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceInfo(NamedTuple):
+    """Последовательное устройство из списка портов"""
+
+    device: str
+    vid: Optional[int] = None
+    pid: Optional[int] = None
+    serial_number: Optional[str] = None
+    description: str = ""
+    manufacturer: Optional[str] = None
+
+    @classmethod
+    def from_port(cls, port) -> "DeviceInfo":
+        return cls(
+            device=port.device,
+            vid=port.vid,
+            pid=port.pid,
+            serial_number=port.serial_number,
+            description=port.description or "",
+            manufacturer=port.manufacturer,
+        )
+
+    def to_dict(self) -> dict:
+        data = self._asdict()
+        data["vid"] = f"{self.vid:04x}" if self.vid is not None else None
+        data["pid"] = f"{self.pid:04x}" if self.pid is not None else None
+        return data
+
+
+# added, removed
+DeviceListener = Callable[[List[DeviceInfo], List[DeviceInfo]], None]
+
+
+def list_comports() -> List[DeviceInfo]:
+    """Перечисляет порты через pyserial (sysfs на Linux)"""
+    import serial.tools.list_ports
+
+    return [DeviceInfo.from_port(port) for port in serial.tools.list_ports.comports()]
+
+
+def parse_usb_ids(value: str) -> Set[Tuple[int, int]]:
+    """ "1eab:1a03,0c2e:0b61" -> {(0x1eab, 0x1a03), (0x0c2e, 0x0b61)}"""
+    ids = set()
+    for item in value.split(","):
+        item = item.strip()
+        if item:
+            vid, pid = item.split(":")
+            ids.add((int(vid, 16), int(pid, 16)))
+    return ids
+
+
+class DeviceRegistry:
+    """Кэш списка последовательных портов с отслеживанием подключений.
+
+    Перечисление портов выполняется только при изменении каталога
+    устройств (проверяется mtime, как это видит inotify) или раз в
+    SCANNER_REFRESH_INTERVAL, а не на каждый запрос. Подписчики получают
+    списки появившихся и пропавших устройств.
+    """
+
+    def __init__(
+        self,
+        dev_dir: str = None,
+        enumerate: Callable[[], List[DeviceInfo]] = None,
+        usb_ids: str = None,
+        descriptions: str = None,
+    ):
+        self.dev_dir = dev_dir or settings.SCANNER_DEV_DIR
+        self.enumerate = enumerate or list_comports
+        self.usb_ids = parse_usb_ids(
+            settings.SCANNER_USB_IDS if usb_ids is None else usb_ids
+        )
+        self.descriptions = [
+            text.strip()
+            for text in (
+                settings.SCANNER_DESCRIPTIONS if descriptions is None else descriptions
+            ).split(",")
+            if text.strip()
+        ]
+        self.devices: Dict[str, DeviceInfo] = {}
+        self.listeners: List[DeviceListener] = []
+        self.lock = threading.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.dev_mtime: Optional[int] = None
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+
+    def is_scanner(self, device: DeviceInfo) -> bool:
+        """Сканер определяется по VID/PID или по описанию"""
+        if (device.vid, device.pid) in self.usb_ids:
+            return True
+        text = f"{device.description} {device.manufacturer or ''}"
+        return any(pattern in text for pattern in self.descriptions)
+
+    def ports(self) -> List[str]:
+        self.ensure_loaded()
+        return sorted(self.devices)
+
+    def scanners(self) -> List[DeviceInfo]:
+        self.ensure_loaded()
+        return [
+            device
+            for _, device in sorted(self.devices.items())
+            if self.is_scanner(device)
+        ]
+
+    def find_scanner(self) -> Optional[str]:
+        scanners = self.scanners()
+        return scanners[0].device if scanners else None
+
+    def subscribe(self, listener: DeviceListener):
+        """listener вызывается из потока, выполнившего обновление"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: DeviceListener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def ensure_loaded(self):
+        if self.refreshed_at is None:
+            self.refresh()
+
+    def refresh(self) -> Tuple[List[DeviceInfo], List[DeviceInfo]]:
+        """Перечитывает список портов и оповещает подписчиков об изменениях"""
+        with self.lock:
+            self.dev_mtime = self._read_dev_mtime()
+            current = {device.device: device for device in self.enumerate()}
+            added = [
+                device
+                for name, device in current.items()
+                if self.devices.get(name) != device
+            ]
+            removed = [
+                device for name, device in self.devices.items() if name not in current
+            ]
+            self.devices = current
+            self.refreshed_at = time.monotonic()
+            self.refreshes += 1
+
+        if added or removed:
+            for listener in list(self.listeners):
+                try:
+                    listener(added, removed)
+                except Exception as e:
+                    logger.exception("Ошибка в обработчике изменения устройств: %s", e)
+        return added, removed
+
+    async def start(self):
+        """Первое перечисление и фоновое отслеживание каталога устройств"""
+        await asyncio.to_thread(self.refresh)
+        self.task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(settings.SCANNER_WATCH_INTERVAL)
+            stale = (
+                time.monotonic() - self.refreshed_at
+                >= settings.SCANNER_REFRESH_INTERVAL
+            )
+            if stale or self._read_dev_mtime() != self.dev_mtime:
+                await asyncio.to_thread(self.refresh)
+
+    def _read_dev_mtime(self) -> Optional[int]:
+        # Создание и удаление узла в /dev меняет mtime каталога
+        try:
+            return os.stat(self.dev_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def get_stats(self) -> dict:
+        return {
+            "dev_dir": self.dev_dir,
+            "refreshes": self.refreshes,
+            "devices": [
+                {**device.to_dict(), "scanner": self.is_scanner(device)}
+                for _, device in sorted(self.devices.items())
+            ],
+        }
+
+
+# Глобальный реестр устройств
+device_registry = DeviceRegistry()
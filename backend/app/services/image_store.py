@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from typing import Set
+from app.config import settings
+from app.services.upload_storage import content_key, upload_storage
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """Фоновое сохранение загруженных кадров согласно UPLOAD_STORE_POLICY"""
+
+    def __init__(self):
+        self.frames = 0
+        self.pending: Set[asyncio.Task] = set()
+        self.pending_keys: Set[str] = set()
+
+    def should_store(self, decoded: bool) -> bool:
+        """Решает, нужно ли сохранять кадр"""
+        policy = settings.UPLOAD_STORE_POLICY
+
+        if policy == "always":
+            return True
+        if policy == "on_failure":
+            return not decoded
+        if policy == "sample":
+            self.frames += 1
+            return self.frames % max(settings.UPLOAD_SAMPLE_RATE, 1) == 0
+        return False
+
+    def save_later(self, image_data: bytes) -> str:
+        """Ставит запись кадра в фон и сразу возвращает его ключ в хранилище.
+
+        Ключ - хеш содержимого: одинаковые кадры пишутся один раз.
+        """
+        key = content_key(image_data)
+        if key in self.pending_keys:
+            return key
+        self.pending_keys.add(key)
+        task = asyncio.create_task(
+            asyncio.to_thread(upload_storage.save, image_data, key)
+        )
+        self.pending.add(task)
+        task.add_done_callback(lambda task: self._on_written(task, key))
+        return key
+
+    def _on_written(self, task: asyncio.Task, key: str):
+        self.pending.discard(task)
+        self.pending_keys.discard(key)
+        if not task.cancelled() and task.exception():
+            logger.error("Ошибка при сохранении изображения: %s", task.exception())
+
+    async def drain(self):
+        """Дожидается записи всех кадров (при остановке приложения)"""
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+
+
+# Глобальный экземпляр хранилища кадров
+image_store = ImageStore()
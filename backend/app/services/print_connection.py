@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional, Union
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PrintConnection:
+    """Сокет клиента печати с очередью отправки и heartbeat.
+
+    Все сообщения клиенту идут через ограниченную очередь и одну задачу
+    отправки: медленный клиент задерживает только свою очередь, а
+    отправка дольше PRINT_SEND_TIMEOUT закрывает соединение.
+
+    Клиенту, подключенному с heartbeat=1, сервер шлет JSON ping каждые
+    PRINT_PING_INTERVAL, ответ pong дает RTT; если от него ничего не
+    приходит дольше PRINT_IDLE_TIMEOUT, соединение считается полуоткрытым
+    и закрывается. Остальных клиентов проверяют ping/pong фреймы
+    WebSocket (uvicorn --ws-ping-interval/--ws-ping-timeout), на них
+    отвечает любой клиент. После закрытия (closed) обработчик сокета
+    снимает клиента с регистрации.
+    """
+
+    def __init__(self, client_id: str, websocket, heartbeat: bool = False):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.heartbeat = heartbeat
+        self.queue: asyncio.Queue = asyncio.Queue(settings.PRINT_SEND_QUEUE_SIZE)
+        self.closed = asyncio.Event()
+        self.close_reason: Optional[str] = None
+        self.tasks = []
+        self.last_received = time.monotonic()
+        self.queued_bytes = 0
+        self.sent = 0
+        self.rtt: Optional[float] = None
+        self.send_latency: Optional[float] = None
+        self.send_latency_max = 0.0
+        self.send_latency_total = 0.0
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._writer())]
+        if self.heartbeat:
+            self.tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def send_text(self, text: str):
+        await self._put(text)
+
+    async def send_bytes(self, data: bytes):
+        await self._put(data)
+
+    async def _put(self, message: Union[str, bytes]):
+        """Ставит сообщение в очередь, ожидая места не дольше PRINT_SEND_TIMEOUT"""
+        if self.closed.is_set():
+            raise ConnectionError(f"Соединение закрыто: {self.close_reason}")
+        self.queued_bytes += len(message)
+        try:
+            await asyncio.wait_for(self.queue.put(message), settings.PRINT_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.queued_bytes -= len(message)
+            await self.close("очередь отправки переполнена")
+            raise ConnectionError("Клиент не забирает сообщения")
+
+    def received(self, message: dict):
+        """Любое входящее сообщение подтверждает, что клиент жив"""
+        self.last_received = time.monotonic()
+        if message.get("type") == "pong" and message.get("ts"):
+            self.rtt = max(0.0, time.monotonic() - message["ts"])
+
+    async def _writer(self):
+        while True:
+            message = await self.queue.get()
+            self.queued_bytes -= len(message)
+            started = time.monotonic()
+            try:
+                if isinstance(message, bytes):
+                    send = self.websocket.send_bytes(message)
+                else:
+                    send = self.websocket.send_text(message)
+                await asyncio.wait_for(send, settings.PRINT_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                await self.close("таймаут отправки")
+                return
+            except Exception as e:
+                await self.close(f"ошибка отправки: {e}")
+                return
+
+            latency = time.monotonic() - started
+            self.sent += 1
+            self.send_latency = latency
+            self.send_latency_total += latency
+            self.send_latency_max = max(self.send_latency_max, latency)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(settings.PRINT_PING_INTERVAL)
+            if time.monotonic() - self.last_received > settings.PRINT_IDLE_TIMEOUT:
+                await self.close("нет ответа на ping")
+                return
+            if self.queue.full():
+                # Очередь забита - ping не нужен, таймаут отправки сработает сам
+                continue
+            ping = json.dumps({"type": "ping", "ts": time.monotonic()})
+            self.queued_bytes += len(ping)
+            self.queue.put_nowait(ping)
+
+    async def close(self, reason: str, code: int = 1011):
+        """Закрывает соединение; повторные вызовы ничего не делают"""
+        if self.closed.is_set():
+            return
+        self.close_reason = reason
+        self.closed.set()
+        current = asyncio.current_task()
+        for task in self.tasks:
+            if task is not current:
+                task.cancel()
+        logger.log(
+            logging.INFO if code == 1000 else logging.WARNING,
+            "Соединение клиента печати %s закрыто: %s",
+            self.client_id,
+            reason,
+            extra={"client_id": self.client_id},
+        )
+        try:
+            # Полуоткрытый сокет не ответит на close, долго не ждем
+            await asyncio.wait_for(self.websocket.close(code=code), 1.0)
+        except Exception:
+            pass
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "queued": self.queue.qsize(),
+            "queued_bytes": self.queued_bytes,
+            "sent": self.sent,
+            "rtt_ms": self.rtt * 1000 if self.rtt is not None else None,
+            "send_latency_ms": (
+                self.send_latency * 1000 if self.send_latency is not None else None
+            ),
+            "send_latency_avg_ms": (
+                self.send_latency_total / self.sent * 1000 if self.sent else None
+            ),
+            "send_latency_max_ms": self.send_latency_max * 1000,
+            "idle": now - self.last_received,
+            "closed": self.close_reason,
+        }
@@ -0,0 +1,141 @@
+import struct
+from typing import List, Mapping, NamedTuple, Sequence
+
+from app.config import settings
+from app.services.qr_service import QRService
+
+# Бинарный кадр печати (все числа big-endian):
+#
+#   заголовок: b"QP", версия (1 байт), формат (1 байт), число заданий (2 байта)
+#   задание:   job_id (8), длина printer_id (2), длина qr_data (2),
+#              длина payload (4), затем printer_id, qr_data, payload
+#
+# payload зависит от формата:
+#   png    - PNG этикетки, как qr_image в JSON, но без base64
+#   matrix - сторона матрицы (1 байт) и модули без рамки, по биту на модуль
+#            построчно от старшего бита, 1 - черный
+#   data   - пустой, клиент сам строит QR код по qr_data
+#
+# Длины - в байтах UTF-8: printer_id до 100 символов бывает длиннее 255
+# байт, поэтому с версии 2 его длина занимает 2 байта, как у qr_data.
+MAGIC = b"QP"
+VERSION = 2
+FORMATS = ("png", "matrix", "data")
+PROTOCOLS = ("json", "binary")
+
+HEADER = struct.Struct("!2sBBH")
+ENTRY = struct.Struct("!QHHI")
+
+
+class PrintProtocol(NamedTuple):
+    """Протокол, выбранный клиентом печати при подключении"""
+
+    protocol: str = "json"
+    format: str = "png"
+    window: int = 1  # заданий без подтверждения
+    heartbeat: bool = False  # клиент отвечает pong на JSON ping
+
+    @property
+    def binary(self) -> bool:
+        return self.protocol == "binary"
+
+    @classmethod
+    def from_query(cls, params: Mapping[str, str]) -> "PrintProtocol":
+        """Разбирает ?protocol=binary&format=matrix&window=16&heartbeat=1.
+
+        Без параметров - прежний JSON по одному заданию. Окно бинарного
+        клиента по умолчанию и максимум - PRINT_BATCH_SIZE. heartbeat=1 -
+        клиент умеет отвечать на JSON ping, без него живость проверяют
+        только ping/pong самого WebSocket.
+        """
+        protocol = params.get("protocol", "json")
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Неизвестный протокол печати: {protocol}")
+        heartbeat = params.get("heartbeat", "").lower() in ("1", "true")
+        if protocol == "json":
+            return cls(window=settings.PRINT_CLIENT_CONCURRENCY, heartbeat=heartbeat)
+
+        fmt = params.get("format", "png")
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат печати: {fmt}")
+        try:
+            window = int(params.get("window", settings.PRINT_BATCH_SIZE))
+        except ValueError:
+            raise ValueError("Окно печати должно быть числом")
+        window = max(1, min(window, settings.PRINT_BATCH_SIZE))
+        return cls(protocol, fmt, window, heartbeat)
+
+    def to_dict(self) -> dict:
+        return {
+            "type": "protocol",
+            "protocol": self.protocol,
+            "format": self.format,
+            "window": self.window,
+            "heartbeat": self.heartbeat,
+        }
+
+
+def payload(qr_data: str, fmt: str) -> bytes:
+    if fmt == "png":
+        return QRService.get_qr_code(qr_data).png
+    if fmt == "matrix":
+        side, bits = QRService.get_qr_matrix(qr_data)
+        return bytes([side]) + bits
+    return b""
+
+
+def encode_frame(jobs: Sequence, fmt: str) -> bytes:
+    """Кадр с несколькими заданиями (job: id, qr_data, printer_id)"""
+    parts = []
+    for job in jobs:
+        printer_id = (job.printer_id or "").encode("utf-8")
+        qr_data = job.qr_data.encode("utf-8")
+        body = payload(job.qr_data, fmt)
+        parts.append(ENTRY.pack(job.id, len(printer_id), len(qr_data), len(body)))
+        parts.extend((printer_id, qr_data, body))
+    header = HEADER.pack(MAGIC, VERSION, FORMATS.index(fmt), len(jobs))
+    return header + b"".join(parts)
+
+
+def decode_frame(frame: bytes) -> List[dict]:
+    """Обратное к encode_frame - для клиентов на Python и проверок"""
+    magic, version, fmt, count = HEADER.unpack_from(frame)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Неверный кадр печати")
+
+    jobs = []
+    offset = HEADER.size
+    for _ in range(count):
+        job_id, printer_len, data_len, body_len = ENTRY.unpack_from(frame, offset)
+        offset += ENTRY.size
+        printer_id = frame[offset : offset + printer_len].decode("utf-8")
+        offset += printer_len
+        qr_data = frame[offset : offset + data_len].decode("utf-8")
+        offset += data_len
+        body = frame[offset : offset + body_len]
+        offset += body_len
+
+        job = {
+            "job_id": job_id,
+            "printer_id": printer_id or None,
+            "qr_data": qr_data,
+            "format": FORMATS[fmt],
+        }
+        if FORMATS[fmt] == "png":
+            job["png"] = body
+        elif FORMATS[fmt] == "matrix":
+            job["size"] = body[0]
+            job["matrix"] = body[1:]
+        jobs.append(job)
+    return jobs
+
+
+def unpack_matrix(side: int, bits: bytes) -> List[List[bool]]:
+    """Матрица модулей из упакованных битов"""
+    return [
+        [
+            bool(bits[(row * side + col) >> 3] & (0x80 >> ((row * side + col) & 7)))
+            for col in range(side)
+        ]
+        for row in range(side)
+    ]
@@ -1,63 +1,437 @@
 import asyncio
-from typing import Dict, Optional
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 import json
+from app.config import settings
+from app.crud import print_job as crud_print_job
+from app.crud import printer as crud_printer
+from app.database import AsyncSessionLocal
+from app.metrics import PRINT_CLIENTS, PRINT_DISPATCH_LATENCY
+from app.models.print_job import PrintJob
 from app.schemas.scan import PrintCommand
+from app.services.broker import broker
+from app.services.print_connection import PrintConnection
+from app.services.print_protocol import PrintProtocol, encode_frame
 from app.services.qr_service import QRService
 
+logger = logging.getLogger(__name__)
+
+# Служебная тема брокера: новые задания и смена принтера по умолчанию
+PRINTERS_TOPIC = "printers"
+MAX_JOB_ID = 2**31 - 1  # print_jobs.id - INTEGER
+
+
+def parse_job_id(value) -> Optional[int]:
+    """job_id из подтверждения клиента: положительное целое до MAX_JOB_ID или None.
+
+    Иначе одно неверное значение ломало бы UPDATE подтверждений, и очередь
+    клиента вставала бы навсегда.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if not isinstance(value, int) or not 0 < value <= MAX_JOB_ID:
+        return None
+    return value
+
+
+class PrintDispatcher:
+    """Отправка заданий из очереди одному клиенту печати.
+
+    Одновременно у клиента не больше protocol.window заданий без
+    подтверждения. JSON-клиент получает по сообщению на задание, бинарный -
+    все выбранные за раз задания одним кадром. Подтверждения копятся и
+    применяются одним UPDATE перед следующей выборкой; задание без
+    подтверждения дольше PRINT_ACK_TIMEOUT считается неудачным.
+    """
+
+    def __init__(
+        self, client_id: str, connection: PrintConnection, protocol: PrintProtocol
+    ):
+        self.client_id = client_id
+        self.connection = connection
+        self.protocol = protocol
+        # job_id -> (срок подтверждения, номер попытки)
+        self.in_flight: Dict[int, Tuple[float, int]] = {}
+        self.done: List[int] = []
+        # job_id, номер попытки, ошибка, повторять ли
+        self.failed: List[Tuple[int, int, str, bool]] = []
+        self.wakeup = asyncio.Event()
+        self.retry_at: Optional[float] = None  # ближайший отложенный повтор
+        self.stopping = False
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.completed = 0
+        self.frames = 0
+        self.bytes_sent = 0  # до сжатия permessage-deflate
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+
+    def acknowledge(self, job_id: int, status: str, error: Optional[str] = None):
+        """status: done, failed (повторить) или rejected (сразу в dead)"""
+        sent = self.in_flight.pop(job_id, None)
+        if status == "done":
+            # Позднее подтверждение после таймаута тоже засчитывается:
+            # complete_print_jobs отмечает только задания этого клиента
+            if job_id not in self.done:
+                self.done.append(job_id)
+        elif sent:
+            self.failed.append((job_id, sent[1], error or status, status == "failed"))
+        self.wakeup.set()
+
+    async def _run(self):
+        try:
+            while not self.stopping:
+                try:
+                    await self._apply_acks()
+                    await self._dispatch()
+                except Exception as e:
+                    # База недоступна или занята: подтверждения остаются в
+                    # памяти и применяются на следующем круге
+                    logger.warning(
+                        "Ошибка очереди печати клиента %s: %s",
+                        self.client_id,
+                        e,
+                        extra={"client_id": self.client_id},
+                    )
+                    await asyncio.sleep(settings.PRINT_POLL_INTERVAL)
+                    continue
+
+                # Просыпаемся по новому заданию, подтверждению, сроку
+                # подтверждения или отложенному повтору
+                deadlines = [deadline for deadline, _ in self.in_flight.values()]
+                if self.retry_at:
+                    deadlines.append(self.retry_at)
+                timeout = settings.PRINT_POLL_INTERVAL
+                if deadlines:
+                    timeout = max(0.0, min(timeout, min(deadlines) - time.monotonic()))
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+        finally:
+            try:
+                await self._apply_acks()
+                if self.in_flight:
+                    async with AsyncSessionLocal() as db:
+                        await crud_print_job.release_print_jobs(
+                            db, list(self.in_flight)
+                        )
+                    self.in_flight.clear()
+            except Exception as e:
+                # Зависшие в sent задания вернет requeue при следующем запуске
+                logger.error(
+                    "Ошибка при остановке очереди печати %s: %s", self.client_id, e
+                )
+
+    async def _apply_acks(self):
+        now = time.monotonic()
+        for job_id, (deadline, attempts) in list(self.in_flight.items()):
+            if deadline <= now:
+                del self.in_flight[job_id]
+                self.failed.append((job_id, attempts, "Нет подтверждения печати", True))
+
+        if not self.done and not self.failed:
+            return
+
+        done, failed = list(self.done), list(self.failed)
+        async with AsyncSessionLocal() as db:
+            if done:
+                await crud_print_job.complete_print_jobs(db, self.client_id, done)
+            for job_id, attempts, error, retry in failed:
+                next_attempt_at = print_service.next_attempt_at(attempts, retry)
+                await crud_print_job.fail_print_job(db, job_id, error, next_attempt_at)
+                if next_attempt_at:
+                    delay = (
+                        next_attempt_at - datetime.now(timezone.utc)
+                    ).total_seconds()
+                    retry_at = time.monotonic() + max(0.0, delay)
+                    self.retry_at = min(self.retry_at or retry_at, retry_at)
+        # Подтверждения, пришедшие во время записи, остаются до следующего круга
+        del self.done[: len(done)]
+        del self.failed[: len(failed)]
+        self.completed += len(done)
+
+    async def _dispatch(self):
+        free = self.protocol.window - len(self.in_flight)
+        if free <= 0 or self.stopping:
+            return
+        if self.retry_at and self.retry_at <= time.monotonic():
+            self.retry_at = None
+
+        async with AsyncSessionLocal() as db:
+            jobs = await crud_print_job.claim_print_jobs(db, self.client_id, free)
+
+        if not jobs:
+            return
+        deadline = time.monotonic() + settings.PRINT_ACK_TIMEOUT
+        for job in jobs:
+            self.in_flight[job.id] = (deadline, job.attempts)
+            if job.attempts == 1:
+                # Оба времени из базы: ожидание в очереди без сдвига часов
+                PRINT_DISPATCH_LATENCY.observe(
+                    (job.sent_at - job.created_at).total_seconds()
+                )
+
+        try:
+            if self.protocol.binary:
+                # Картинки и матрицы строятся вне цикла событий
+                frame = await asyncio.to_thread(
+                    encode_frame, jobs, self.protocol.format
+                )
+                await self.connection.send_bytes(frame)
+                self.frames += 1
+                self.bytes_sent += len(frame)
+            else:
+                # Картинки кодируются вне цикла событий, одним вызовом на выборку
+                texts = await asyncio.to_thread(print_service.encode_messages, jobs)
+                for text in texts:
+                    await self.connection.send_text(text)
+                    self.frames += 1
+                    self.bytes_sent += len(text)
+            self.sent += len(jobs)
+        except Exception as e:
+            # Соединение закрыто: задания вернутся в очередь при остановке
+            logger.warning("Ошибка при отправке команды печати: %s", e)
+            self.stopping = True
+
+    def get_stats(self) -> dict:
+        return {
+            "client_id": self.client_id,
+            "protocol": self.protocol.protocol,
+            "format": self.protocol.format,
+            "window": self.protocol.window,
+            "in_flight": len(self.in_flight),
+            "sent": self.sent,
+            "completed": self.completed,
+            "frames": self.frames,
+            "bytes_sent": self.bytes_sent,
+            "connection": self.connection.get_stats(),
+        }
+
 
 class PrintService:
-    """Сервис управления печатью"""
+    """Сервис управления печатью.
+
+    Сокет клиента живет в одном воркере uvicorn, поэтому реестр клиентов
+    хранится в таблице printers (с воркером-владельцем и heartbeat), а
+    о новых заданиях и смене принтера по умолчанию воркеры узнают через
+    брокер: задание будит отправку у того воркера, где подключен клиент.
+    """
 
     def __init__(self):
-        self.print_clients: Dict[str, any] = {}  # client_id -> websocket
+        self.print_clients: Dict[str, PrintConnection] = {}
+        self.dispatchers: Dict[str, PrintDispatcher] = {}
         self.default_printer: Optional[str] = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat: Optional[asyncio.Task] = None
+
+    async def register_client(
+        self,
+        client_id: str,
+        connection: PrintConnection,
+        printer_name: Optional[str] = None,
+        protocol: Optional[PrintProtocol] = None,
+    ):
+        """Регистрирует клиент для печати и начинает отправку его очереди.
 
-    def register_client(self, client_id: str, websocket):
-        """Регистрирует клиент для печати"""
-        self.print_clients[client_id] = websocket
-        print(f"Клиент зарегистрирован: {client_id}")
+        Повторный вызов для того же соединения только обновляет имя
+        принтера.
+        """
+        if self.print_clients.get(client_id) is not connection:
+            old = self.dispatchers.pop(client_id, None)
+            if old:
+                old.stop()
+            else:
+                PRINT_CLIENTS.inc()
+            self.print_clients[client_id] = connection
+            dispatcher = PrintDispatcher(
+                client_id, connection, protocol or PrintProtocol.from_query({})
+            )
+            self.dispatchers[client_id] = dispatcher
+            dispatcher.start()
 
-    def unregister_client(self, client_id: str):
-        """Удаляет клиент"""
+        async with AsyncSessionLocal() as db:
+            await crud_printer.upsert_printer(
+                db, client_id, self.worker_id, printer_name
+            )
+        logger.info(
+            "Клиент зарегистрирован: %s", client_id, extra={"client_id": client_id}
+        )
+
+    async def unregister_client(
+        self, client_id: str, connection: Optional[PrintConnection] = None
+    ):
+        """Удаляет клиент, неподтвержденные задания возвращаются в очередь.
+
+        Если передано соединение, клиент удаляется, только пока оно его:
+        переподключившийся клиент старым обработчиком не удаляется.
+        """
+        if (
+            connection is not None
+            and self.print_clients.get(client_id) is not connection
+        ):
+            return
+        dispatcher = self.dispatchers.pop(client_id, None)
+        if dispatcher:
+            dispatcher.stop()
         if client_id in self.print_clients:
             del self.print_clients[client_id]
-            print(f"Клиент удален: {client_id}")
+            PRINT_CLIENTS.dec()
+            async with AsyncSessionLocal() as db:
+                await crud_printer.deactivate_printer(db, client_id, self.worker_id)
+            logger.info("Клиент удален: %s", client_id, extra={"client_id": client_id})
 
-    def set_default_printer(self, client_id: str):
-        """Устанавливает клиент как принтер по умолчанию"""
+    async def set_default_printer(self, client_id: str):
+        """Устанавливает клиент как принтер по умолчанию для всех воркеров"""
+        async with AsyncSessionLocal() as db:
+            await crud_printer.set_default_printer(db, client_id)
         self.default_printer = client_id
-        print(f"Принтер по умолчанию установлен: {client_id}")
+        broker.publish(PRINTERS_TOPIC, {"type": "default", "client_id": client_id})
+        logger.info("Принтер по умолчанию установлен: %s", client_id)
+
+    async def send_print_command(
+        self, print_cmd: PrintCommand, scan_id: Optional[int] = None
+    ) -> PrintJob:
+        """Ставит задание печати в очередь указанного клиента.
 
-    async def send_print_command(self, print_cmd: PrintCommand):
-        """Отправляет команду на печать указанному клиенту"""
+        Задание сохраняется в базе и ждет клиента, если тот не подключен.
+        """
         client_id = print_cmd.client_id or self.default_printer
 
         if not client_id:
             raise ValueError("Не указан клиент для печати и нет принтера по умолчанию")
 
-        if client_id not in self.print_clients:
-            raise ValueError(f"Клиент {client_id} не подключен")
+        async with AsyncSessionLocal() as db:
+            job = await crud_print_job.create_print_job(
+                db,
+                qr_data=print_cmd.qr_data,
+                printer_id=print_cmd.printer_id,
+                client_id=client_id,
+                scan_id=scan_id,
+            )
+
+        self.wake(client_id)
+        return job
+
+    def wake(self, client_id: str):
+        """Будит отправку очереди клиента в том воркере, где он подключен"""
+        dispatcher = self.dispatchers.get(client_id)
+        if dispatcher:
+            dispatcher.wakeup.set()
+        else:
+            broker.publish(PRINTERS_TOPIC, {"type": "job", "client_id": client_id})
 
-        websocket = self.print_clients[client_id]
+    def _on_printers_message(self, message: dict):
+        if message["type"] == "job":
+            dispatcher = self.dispatchers.get(message["client_id"])
+            if dispatcher:
+                dispatcher.wakeup.set()
+        elif message["type"] == "default":
+            self.default_printer = message["client_id"]
 
-        # Генерируем QR код
-        qr_image_data = QRService.get_qr_code_base64(print_cmd.qr_data)
+    def acknowledge(
+        self, client_id: str, job_id: int, status: str, error: Optional[str] = None
+    ):
+        """Подтверждение от клиента печати; некорректный job_id игнорируется"""
+        dispatcher = self.dispatchers.get(client_id)
+        job_id = parse_job_id(job_id)
+        if dispatcher and job_id is not None:
+            dispatcher.acknowledge(job_id, status, str(error) if error else None)
 
-        # Создаем команду для печати
-        print_data = {
+    def message(self, job: PrintJob) -> dict:
+        """Команда печати для клиента"""
+        return {
             "type": "print",
-            "qr_data": print_cmd.qr_data,
-            "qr_image": qr_image_data,
-            "printer_id": print_cmd.printer_id,
+            "job_id": job.id,
+            "qr_data": job.qr_data,
+            "qr_image": QRService.get_qr_code_base64(job.qr_data),
+            "printer_id": job.printer_id,
         }
 
-        try:
-            await websocket.send_text(json.dumps(print_data))
-            print(f"Команда печати отправлена клиенту {client_id}")
-            return True
-        except Exception as e:
-            print(f"Ошибка при отправке команды печати: {e}")
-            return False
+    def encode_messages(self, jobs: List[PrintJob]) -> List[str]:
+        """Команды печати в JSON для пачки заданий"""
+        return [json.dumps(self.message(job)) for job in jobs]
+
+    def next_attempt_at(self, attempts: int, retry: bool) -> Optional[datetime]:
+        """Время следующей попытки с экспоненциальной задержкой, None - в dead"""
+        if not retry or attempts >= settings.PRINT_MAX_ATTEMPTS:
+            return None
+        delay = min(
+            settings.PRINT_RETRY_BASE * 2 ** (attempts - 1), settings.PRINT_RETRY_MAX
+        )
+        return datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+    async def start(self):
+        """Подписка на брокер, heartbeat клиентов и возврат в очередь
+        заданий, зависших в sent после перезапуска"""
+        broker.add_handler(PRINTERS_TOPIC, self._on_printers_message)
+
+        sent_before = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.PRINT_ACK_TIMEOUT
+        )
+        async with AsyncSessionLocal() as db:
+            requeued = await crud_print_job.requeue_stale_print_jobs(db, sent_before)
+            self.default_printer = (
+                await crud_printer.get_default_printer(db) or self.default_printer
+            )
+        if requeued:
+            logger.info("Возвращено в очередь заданий печати: %d", requeued)
+
+        self.heartbeat = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        broker.remove_handler(PRINTERS_TOPIC, self._on_printers_message)
+        if self.heartbeat:
+            self.heartbeat.cancel()
+            self.heartbeat = None
+
+        dispatchers = list(self.dispatchers.values())
+        for connection in list(self.print_clients.values()):
+            await connection.close("остановка сервера", code=1001)
+        for client_id in list(self.dispatchers):
+            await self.unregister_client(client_id)
+        await asyncio.gather(
+            *[d.task for d in dispatchers if d.task], return_exceptions=True
+        )
+
+    async def _heartbeat(self):
+        interval = settings.PRINT_HEARTBEAT_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with AsyncSessionLocal() as db:
+                    if self.print_clients:
+                        await crud_printer.touch_printers(
+                            db, list(self.print_clients), self.worker_id
+                        )
+                    # Клиенты упавших воркеров: heartbeat пропущен трижды
+                    seen_before = datetime.now(timezone.utc) - timedelta(
+                        seconds=interval * 3
+                    )
+                    await crud_printer.deactivate_stale_printers(db, seen_before)
+            except Exception as e:
+                logger.error("Ошибка heartbeat клиентов печати: %s", e)
+
+    async def get_stats(self) -> dict:
+        async with AsyncSessionLocal() as db:
+            jobs = await crud_print_job.count_print_jobs(db)
+        return {
+            "jobs": jobs,
+            "worker_id": self.worker_id,
+            "clients": [d.get_stats() for d in self.dispatchers.values()],
+        }
 
 
 # Глобальный экземпляр сервиса печати
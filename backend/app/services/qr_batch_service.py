@@ -0,0 +1,126 @@
+import math
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import List, Optional
+import cv2
+import numpy as np
+import qrcode
+from PIL import Image
+from app.config import settings
+
+_executor: Optional[ProcessPoolExecutor] = None
+# render_many вызывается из пула потоков: пул процессов создается один раз
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+def _render_chunk(
+    payloads: List[str], box_size: int, version: int, border: int
+) -> List[np.ndarray]:
+    """Выполняется в воркере: рисует часть пакета"""
+    return [
+        QRBatchService.render_matrix(data, box_size, version, border)
+        for data in payloads
+    ]
+
+
+class QRBatchService:
+    """Пакетная генерация QR кодов через матрицы модулей и NumPy"""
+
+    @staticmethod
+    def render_matrix(
+        data: str, box_size: int, version: int = None, border: int = None
+    ) -> np.ndarray:
+        """Рисует QR код в grayscale массив без PIL"""
+        qr = qrcode.QRCode(
+            version=version or settings.QR_CODE_VERSION,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            border=settings.QR_CODE_BORDER if border is None else border,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+
+        # True - темный модуль; каждый модуль растягиваем в квадрат box_size
+        modules = np.asarray(qr.get_matrix(), dtype=bool)
+        pixels = np.where(modules, 0, 255).astype(np.uint8)
+        return np.kron(pixels, np.ones((box_size, box_size), dtype=np.uint8))
+
+    @staticmethod
+    def render_many(payloads: List[str], box_size: int) -> List[np.ndarray]:
+        """Рисует пакет QR кодов, крупные пакеты - параллельно на всех ядрах"""
+        args = (box_size, settings.QR_CODE_VERSION, settings.QR_CODE_BORDER)
+        workers = os.cpu_count() or 1
+
+        if len(payloads) < settings.QR_BATCH_PARALLEL_MIN or workers == 1:
+            return _render_chunk(payloads, *args)
+
+        executor = _get_executor(workers)
+        chunk_size = math.ceil(len(payloads) / workers)
+        chunks = [
+            payloads[i : i + chunk_size] for i in range(0, len(payloads), chunk_size)
+        ]
+        futures = [executor.submit(_render_chunk, chunk, *args) for chunk in chunks]
+        return [image for future in futures for image in future.result()]
+
+    @staticmethod
+    def encode_png(image: np.ndarray) -> bytes:
+        ok, encoded = cv2.imencode(".png", image)
+        if not ok:
+            raise ValueError("Не удалось закодировать PNG")
+        return encoded.tobytes()
+
+    @staticmethod
+    def to_zip(payloads: List[str], images: List[np.ndarray]) -> bytes:
+        """ZIP архив с отдельным PNG на каждый код"""
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            for index, (data, image) in enumerate(zip(payloads, images), 1):
+                name = re.sub(r"[^\w.-]+", "_", data)[:50]
+                archive.writestr(
+                    f"{index:04d}_{name}.png", QRBatchService.encode_png(image)
+                )
+        return buffer.getvalue()
+
+    @staticmethod
+    def to_pdf(images: List[np.ndarray]) -> bytes:
+        """Многостраничный PDF, по одному коду на страницу"""
+        pages = [Image.fromarray(image) for image in images]
+        buffer = BytesIO()
+        pages[0].save(buffer, format="PDF", save_all=True, append_images=pages[1:])
+        return buffer.getvalue()
+
+    @staticmethod
+    def to_sheet(images: List[np.ndarray], columns: Optional[int] = None) -> bytes:
+        """Один PNG-лист этикеток с кодами в сетке"""
+        columns = columns or math.ceil(math.sqrt(len(images)))
+        rows = math.ceil(len(images) / columns)
+        cell = max(max(image.shape) for image in images)
+
+        sheet = np.full((rows * cell, columns * cell), 255, dtype=np.uint8)
+        for index, image in enumerate(images):
+            top = index // columns * cell
+            left = index % columns * cell
+            height, width = image.shape
+            sheet[top : top + height, left : left + width] = image
+
+        return QRBatchService.encode_png(sheet)
+
+    @staticmethod
+    def shutdown():
+        """Останавливает пул воркеров"""
+        global _executor
+        with _executor_lock:
+            executor, _executor = _executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
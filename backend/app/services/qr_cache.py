@@ -0,0 +1,155 @@
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QRCodeKey(NamedTuple):
+    """Параметры, однозначно определяющие картинку QR кода"""
+
+    data: str
+    box_size: int
+    version: int
+    error_correction: int
+    border: int
+
+    def digest(self) -> str:
+        return hashlib.sha1(repr(tuple(self)).encode("utf-8")).hexdigest()
+
+
+class CachedQRCode:
+    """Сгенерированный QR код: PNG и его base64"""
+
+    __slots__ = ("png", "base64", "etag")
+
+    def __init__(self, png: bytes):
+        self.png = png
+        self.base64 = base64.b64encode(png).decode("utf-8")
+        self.etag = hashlib.sha1(png).hexdigest()
+
+    @property
+    def size(self) -> int:
+        return len(self.png) + len(self.base64)
+
+
+class RedisQRBackend:
+    """Общий для всех воркеров uvicorn кэш PNG в Redis"""
+
+    def __init__(self, url: str, ttl: int):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.ttl = ttl
+
+    def get(self, key: QRCodeKey) -> Optional[bytes]:
+        try:
+            return self.client.get(f"qr:{key.digest()}")
+        except Exception as e:
+            logger.warning("Ошибка чтения кэша QR из Redis: %s", e)
+            return None
+
+    def set(self, key: QRCodeKey, png: bytes):
+        try:
+            self.client.set(f"qr:{key.digest()}", png, ex=self.ttl)
+        except Exception as e:
+            logger.warning("Ошибка записи кэша QR в Redis: %s", e)
+
+
+class QRCodeCache:
+    """LRU кэш сгенерированных QR кодов с ограничением по байтам"""
+
+    def __init__(self, max_bytes: int, shared: Optional[RedisQRBackend] = None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.entries: "OrderedDict[QRCodeKey, CachedQRCode]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: QRCodeKey) -> Optional[CachedQRCode]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def put(self, key: QRCodeKey, entry: CachedQRCode):
+        # Слишком большие картинки не кэшируем, чтобы не вытеснять весь кэш
+        if entry.size > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.size
+
+            self.entries[key] = entry
+            self.current_bytes += entry.size
+
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.current_bytes -= evicted.size
+                self.evictions += 1
+
+    def get_or_create(
+        self, key: QRCodeKey, render: Callable[[], bytes]
+    ) -> CachedQRCode:
+        """Возвращает QR код из кэша или генерирует его"""
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        png = self.shared.get(key) if self.shared else None
+        with self.lock:
+            if png is not None:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+
+        if png is None:
+            png = render()
+            if self.shared:
+                self.shared.set(key, png)
+
+        entry = CachedQRCode(png)
+        self.put(key, entry)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self) -> dict:
+        """Возвращает метрики кэша"""
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "shared": self.shared is not None,
+            }
+
+
+def create_qr_cache() -> QRCodeCache:
+    shared = None
+    if settings.QR_CACHE_REDIS_URL:
+        shared = RedisQRBackend(settings.QR_CACHE_REDIS_URL, settings.QR_CACHE_TTL)
+    return QRCodeCache(settings.QR_CACHE_MAX_BYTES, shared)
+
+
+# Глобальный кэш QR кодов
+qr_cache = create_qr_cache()
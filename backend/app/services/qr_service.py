@@ -4,27 +4,48 @@ import base64
 from PIL import Image
 import cv2
 import numpy as np
-from pyzbar.pyzbar import decode
+from pyzbar.pyzbar import decode, ZBarSymbol
 import os
-from pathlib import Path
-from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Tuple
 from app.config import settings
+from app.metrics import QR_GENERATE_DURATION
+from app.services.qr_cache import CachedQRCode, QRCodeKey, qr_cache
+from app.services.upload_storage import upload_storage
 
 
 class QRService:
     @staticmethod
     def generate_qr_code(data: str, size: int = None) -> bytes:
         """Генерирует QR код из данных"""
+        return QRService.get_qr_code(data, size).png
+
+    @staticmethod
+    def get_qr_code(data: str, size: int = None) -> CachedQRCode:
+        """Возвращает QR код (PNG и base64) из кэша или генерирует его"""
         if size is None:
             size = settings.QR_CODE_SIZE
 
-        qr = qrcode.QRCode(
+        key = QRCodeKey(
+            data=data,
+            box_size=size,
             version=settings.QR_CODE_VERSION,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=size,
-            border=4,
+            border=settings.QR_CODE_BORDER,
         )
-        qr.add_data(data)
+        return qr_cache.get_or_create(key, lambda: QRService.render_qr_code(key))
+
+    @staticmethod
+    @QR_GENERATE_DURATION.time()
+    def render_qr_code(key: QRCodeKey) -> bytes:
+        """Рисует PNG QR кода без кэша"""
+        qr = qrcode.QRCode(
+            version=key.version,
+            error_correction=key.error_correction,
+            box_size=key.box_size,
+            border=key.border,
+        )
+        qr.add_data(key.data)
         qr.make(fit=True)
 
         img = qr.make_image(fill_color="black", back_color="white")
@@ -33,44 +54,132 @@ class QRService:
         return img_byte_arr.getvalue()
 
     @staticmethod
-    def decode_qr_from_image(image_data: bytes) -> str:
+    def get_qr_matrix(data: str) -> Tuple[int, bytes]:
+        """Матрица модулей QR кода без рамки: (сторона, биты по строкам).
+
+        Биты упакованы от старшего, 1 - черный модуль. По ней клиент
+        рисует этикетку сам, без PNG.
+        """
+        return QRService._qr_matrix(data, settings.QR_CODE_VERSION)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _qr_matrix(data: str, version: int) -> Tuple[int, bytes]:
+        qr = qrcode.QRCode(
+            version=version,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            border=0,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        matrix = np.array(qr.get_matrix(), dtype=bool)
+        return matrix.shape[0], np.packbits(matrix).tobytes()
+
+    @staticmethod
+    def decode_qr_from_image(
+        image_data: bytes, roi: Optional[Tuple[int, int, int, int]] = None
+    ) -> str:
         """Декодирует QR код из изображения"""
+        return QRService.decode_qr_codes(image_data, roi)[0]
+
+    @staticmethod
+    def decode_qr_codes(
+        image_data: bytes, roi: Optional[Tuple[int, int, int, int]] = None
+    ) -> List[str]:
+        """Декодирует все QR коды на изображении.
+
+        Проходы идут от дешевых к дорогим, следующий запускается только
+        если предыдущий ничего не нашел.
+        """
+        if not image_data:
+            raise ValueError("Пустое изображение")
+
         # Преобразуем bytes в numpy array
         nparr = np.frombuffer(image_data, np.uint8)
         img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError("Не удалось прочитать изображение")
 
-        # Декодируем QR код
-        decoded_objects = decode(img)
+        for _, stage in QRService.decode_stages(img, roi):
+            found = stage()
+            if found:
+                return found
 
-        if decoded_objects:
-            return decoded_objects[0].data.decode("utf-8")
         raise ValueError("QR код не найден на изображении")
 
     @staticmethod
-    def save_uploaded_image(image_data: str) -> str:
-        """Сохраняет загруженное изображение (base64) на диск"""
-        # Создаем директорию если не существует
-        upload_dir = Path(settings.UPLOAD_DIR)
-        upload_dir.mkdir(parents=True, exist_ok=True)
+    def decode_stages(
+        img: np.ndarray, roi: Optional[Tuple[int, int, int, int]] = None
+    ) -> Iterator[Tuple[str, Callable[[], List[str]]]]:
+        """Каскад проходов декодирования: (название, функция)"""
+        if roi:
+            x, y, width, height = roi
+            crop = img[max(y, 0) : y + height, max(x, 0) : x + width]
+            if crop.size:
+                yield "roi", lambda: QRService._zbar(QRService._downscale(crop))
 
-        # Генерируем имя файла
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        filename = f"qr_scan_{timestamp}.png"
-        filepath = upload_dir / filename
+        yield "downscaled", lambda: QRService._zbar(QRService._downscale(img))
+        if max(img.shape[:2]) > settings.DECODE_FAST_MAX_SIDE:
+            # Небольшой кадр не уменьшается - полный проход его бы повторил
+            yield "full", lambda: QRService._zbar(img)
+        yield "threshold", lambda: QRService._zbar(QRService._enhance(img))
+        yield "opencv", lambda: QRService._opencv(img)
 
-        # Декодируем base64 и сохраняем
-        if "," in image_data:
-            image_data = image_data.split(",")[1]
+    @staticmethod
+    def _downscale(img: np.ndarray) -> np.ndarray:
+        """Уменьшает изображение до DECODE_FAST_MAX_SIDE по большей стороне"""
+        scale = settings.DECODE_FAST_MAX_SIDE / max(img.shape[:2])
+        if scale >= 1:
+            return img
+        return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
 
-        img_data = base64.b64decode(image_data)
+    @staticmethod
+    def _enhance(img: np.ndarray) -> np.ndarray:
+        """Повышает резкость и бинаризует изображение"""
+        blurred = cv2.GaussianBlur(img, (0, 0), 3)
+        sharpened = cv2.addWeighted(img, 1.5, blurred, -0.5, 0)
+        return cv2.adaptiveThreshold(
+            sharpened,
+            255,
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY,
+            31,
+            10,
+        )
+
+    @staticmethod
+    def _zbar(img: np.ndarray) -> List[str]:
+        """Декодирует только QR символы через pyzbar"""
+        decoded_objects = decode(img, symbols=[ZBarSymbol.QRCODE])
+        return QRService._unique(obj.data.decode("utf-8") for obj in decoded_objects)
 
-        with open(filepath, "wb") as f:
-            f.write(img_data)
+    @staticmethod
+    def _opencv(img: np.ndarray) -> List[str]:
+        """Последний шанс: детектор QR из OpenCV"""
+        ok, decoded, _, _ = cv2.QRCodeDetector().detectAndDecodeMulti(img)
+        if not ok:
+            return []
+        return QRService._unique(data for data in decoded if data)
+
+    @staticmethod
+    def _unique(values) -> List[str]:
+        """Убирает повторы, сохраняя порядок"""
+        return list(dict.fromkeys(values))
+
+    @staticmethod
+    def save_uploaded_image(image_data: str) -> str:
+        """Сохраняет загруженное изображение (base64), возвращает его ключ"""
+        return upload_storage.save(QRService.decode_base64_image(image_data))
+
+    @staticmethod
+    def decode_base64_image(image_data: str) -> bytes:
+        """Декодирует base64 (в т.ч. data URL) в байты изображения"""
+        if "," in image_data:
+            image_data = image_data.split(",")[1]
 
-        return str(filepath)
+        return base64.b64decode(image_data)
 
     @staticmethod
     def get_qr_code_base64(data: str) -> str:
         """Возвращает QR код в формате base64"""
-        qr_image = QRService.generate_qr_code(data)
-        return base64.b64encode(qr_image).decode("utf-8")
+        return QRService.get_qr_code(data).base64
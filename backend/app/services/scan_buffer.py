@@ -0,0 +1,520 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.scan import Scan
+from app.schemas.scan import ScanCreate
+
+logger = logging.getLogger(__name__)
+
+
+class ScanBufferFull(Exception):
+    """Буфер заполнен, а сброс в базу не проходит"""
+
+
+class ScanBufferStats:
+    """Метрики буфера отложенной записи"""
+
+    def __init__(self):
+        self.acknowledged = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.recovered = 0
+        self.wal_syncs = 0
+        self.reassigned = 0
+        self.rejected = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.flush_ms_total = 0.0
+
+    def observe_flush(self, batch_size: int, elapsed: float):
+        self.flushes += 1
+        self.flushed += batch_size
+        self.last_batch_size = batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.last_flush_ms = elapsed * 1000
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        self.flush_ms_total += self.last_flush_ms
+
+    def as_dict(self) -> dict:
+        flushes = self.flushes or 1
+        return {
+            "acknowledged": self.acknowledged,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "recovered": self.recovered,
+            "wal_syncs": self.wal_syncs,
+            "reassigned": self.reassigned,
+            "rejected": self.rejected,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(self.flushed / flushes, 1),
+            "max_batch_size": self.max_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.flush_ms_total / flushes, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+class ScanWriteBuffer:
+    """Буфер отложенной записи сканов с групповым коммитом.
+
+    Скан подтверждается, как только попал в буфер (и в WAL на диске, если
+    он включен: сканы, пришедшие за время одного fsync, пишутся следующим
+    общим fsync в потоке); в базу буфер сбрасывается пачкой раз в
+    SCAN_BUFFER_FLUSH_MS или при накоплении SCAN_BUFFER_MAX_ROWS строк.
+    id выдаются заранее из последовательности scans, поэтому ответ
+    сразу содержит id.
+    """
+
+    def __init__(self):
+        self.pending: List[dict] = []
+        self.flushing: List[dict] = []  # пачка, которая сейчас пишется
+        self.ids: Deque[int] = deque()
+        self.next_local_id: Optional[int] = None
+        self.wal_dir: Optional[Path] = None
+        self.wal_lock = None
+        self.wal_file = None
+        self.wal_segment = 0
+        # Записи, ждущие общего fsync: (строка WAL, скан для pending, ожидание)
+        self.wal_group: List[Tuple[dict, Optional[dict], asyncio.Future]] = []
+        self.wal_writer: Optional[asyncio.Task] = None
+        # Запись в сегмент и смена сегмента при сбросе не пересекаются
+        self.wal_io_lock = asyncio.Lock()
+        self.flush_lock = asyncio.Lock()
+        self.id_lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.stats = ScanBufferStats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.task is not None
+
+    async def start(self):
+        """Восстанавливает неподтвержденные в базе сканы из WAL и запускает сброс"""
+        if settings.SCAN_BUFFER_WAL_DIR:
+            # У каждого процесса свой каталог WAL под файловой блокировкой,
+            # чтобы воркеры uvicorn не подбирали сегменты друг друга
+            wal_root = Path(settings.SCAN_BUFFER_WAL_DIR)
+            self.wal_dir = wal_root / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self.wal_dir.mkdir(parents=True)
+            self.wal_lock = open(self.wal_dir / "lock", "w")
+            fcntl.flock(self.wal_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            await self.recover(wal_root)
+            self._open_segment(1)
+
+        self.task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Сбрасывает остаток буфера и останавливает фоновую задачу"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+        await self.flush()
+        if self.wal_writer:
+            await self.wal_writer
+            self.wal_writer = None
+        if self.wal_file:
+            self.wal_file.close()
+            self.wal_file = None
+        if self.wal_dir and not self.pending:
+            # Все записано в базу, каталог WAL больше не нужен
+            shutil.rmtree(self.wal_dir, ignore_errors=True)
+            self.wal_lock.close()
+            self.wal_dir = None
+
+    async def add(self, scan: ScanCreate, file_path: Optional[str] = None) -> Scan:
+        """Принимает скан в буфер и возвращает его с уже назначенным id"""
+        if self.depth >= settings.SCAN_BUFFER_MAX_DEPTH:
+            # Обратное давление: база не успевает, пишем синхронно с запросом
+            await self.flush()
+            if self.depth >= settings.SCAN_BUFFER_MAX_DEPTH:
+                raise ScanBufferFull("Буфер сканов переполнен: база недоступна")
+
+        record = {
+            "id": await self._next_id(),
+            "qr_data": scan.qr_data,
+            "scan_type": scan.scan_type,
+            "printer_id": scan.printer_id,
+            "file_path": file_path,
+            "scanned_at": datetime.now(timezone.utc).isoformat(),
+            "printed": False,
+        }
+
+        if self.wal_file:
+            # В pending скан попадает вместе с записью на диск
+            await self._write_ahead(record, record)
+        else:
+            self.pending.append(record)
+        self.stats.acknowledged += 1
+        if len(self.pending) >= settings.SCAN_BUFFER_MAX_ROWS:
+            self.wakeup.set()
+
+        return Scan(**self._row(record))
+
+    async def flush(self):
+        """Записывает накопленные сканы одной транзакцией"""
+        async with self.flush_lock:
+            if not self.pending:
+                return
+
+            async with self.wal_io_lock:
+                batch, self.pending = self.pending, []
+                self.flushing = batch
+                # Новые сканы пишутся в новый сегмент, старые удалим после коммита
+                flushed_segment = self.wal_segment
+                if self.wal_dir:
+                    self._open_segment(self.wal_segment + 1)
+
+            started = time.perf_counter()
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                self.pending = batch + self.pending
+                self.stats.failed_flushes += 1
+                logger.error("Ошибка при сбросе буфера сканов: %s", e)
+                return
+            finally:
+                self.flushing = []
+
+            self.stats.observe_flush(len(batch), time.perf_counter() - started)
+            self._remove_segments(up_to=flushed_segment)
+
+    def find_latest(
+        self,
+        qr_data: str,
+        scan_type: str,
+        printer_id: Optional[str],
+        since: datetime,
+    ) -> Optional[Scan]:
+        """Последний еще не записанный в базу скан кода с того же источника"""
+        for record in reversed(self.flushing + self.pending):
+            scanned_at = datetime.fromisoformat(record["scanned_at"])
+            if scanned_at < since:
+                # Записи идут по времени приема - дальше только старше
+                break
+            if (record["qr_data"], record["scan_type"], record["printer_id"]) == (
+                qr_data,
+                scan_type,
+                printer_id,
+            ):
+                return Scan(**self._row(record))
+        return None
+
+    async def recover(self, wal_root: Path):
+        """Досылает в базу сканы из WAL процессов, упавших до сброса буфера"""
+        for wal_dir in sorted(wal_root.iterdir()):
+            if wal_dir == self.wal_dir or not wal_dir.is_dir():
+                continue
+
+            with open(wal_dir / "lock", "a") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Каталог живого воркера
+                    continue
+
+                records = []
+                reassigned = {}
+                for path in sorted(wal_dir.glob("scans-*.wal")):
+                    with open(path, encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                entry = json.loads(line)
+                            except json.JSONDecodeError:
+                                # Недописанная строка: скан не был подтвержден
+                                break
+                            if "reassigned" in entry:
+                                reassigned[entry["reassigned"]] = entry["id"]
+                            else:
+                                records.append(entry)
+                for record in records:
+                    # Скан, записанный при сбросе под другим id
+                    record["id"] = reassigned.get(record["id"], record["id"])
+
+                if records:
+                    try:
+                        await self._insert(records, replay=True)
+                    except Exception as e:
+                        # Каталог остается до следующего запуска
+                        logger.error(
+                            "Ошибка при восстановлении из WAL %s: %s", wal_dir, e
+                        )
+                        continue
+                    self.stats.recovered += len(records)
+                    logger.info("Восстановлено сканов из WAL: %d", len(records))
+
+                shutil.rmtree(wal_dir, ignore_errors=True)
+
+    @property
+    def depth(self) -> int:
+        """Сканы, принятые в буфер или ждущие записи в WAL"""
+        return len(self.pending) + len(self.wal_group)
+
+    def get_stats(self) -> dict:
+        """Возвращает метрики буфера"""
+        return {
+            "enabled": self.enabled,
+            "depth": self.depth,
+            "preallocated_ids": len(self.ids),
+            "wal": str(self.wal_dir) if self.wal_dir else None,
+            **self.stats.as_dict(),
+        }
+
+    async def _flush_loop(self):
+        interval = settings.SCAN_BUFFER_FLUSH_MS / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def _write_ahead(self, entry: dict, record: Optional[dict] = None):
+        """Пишет строку в WAL и ждет fsync, общего для всех ожидающих"""
+        future = asyncio.get_running_loop().create_future()
+        self.wal_group.append((entry, record, future))
+        if self.wal_writer is None or self.wal_writer.done():
+            self.wal_writer = asyncio.create_task(self._write_groups())
+        await future
+
+    async def _write_groups(self):
+        while self.wal_group:
+            group, self.wal_group = self.wal_group, []
+            data = "".join(
+                json.dumps(entry, ensure_ascii=False) + "\n" for entry, _, _ in group
+            )
+            try:
+                async with self.wal_io_lock:
+                    await asyncio.to_thread(self._write_wal, self.wal_file, data)
+                    # До снятия блокировки: сброс не сменит сегмент, не
+                    # забрав эти сканы в пачку
+                    self.pending.extend(
+                        record for _, record, _ in group if record is not None
+                    )
+            except Exception as e:
+                for _, _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats.wal_syncs += 1
+            for _, _, future in group:
+                if not future.done():
+                    future.set_result(None)
+
+    @staticmethod
+    def _write_wal(wal_file, data: str):
+        wal_file.write(data)
+        wal_file.flush()
+        if settings.SCAN_BUFFER_WAL_FSYNC:
+            os.fsync(wal_file.fileno())
+
+    async def _insert(self, records: List[dict], replay: bool = False):
+        rows = [self._row(record) for record in records]
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(self._statement(db, replay), rows)
+                await db.commit()
+                return
+            except DBAPIError as e:
+                if self._is_transient(e):
+                    # База недоступна: пачка останется в буфере до следующего сброса
+                    raise
+                await db.rollback()
+            # Подтвержденные сканы не теряются: пачка пишется построчно
+            await self._insert_each(db, rows, replay)
+
+    async def _insert_each(self, db, rows: List[dict], replay: bool = False):
+        """Пачка, которую база не приняла целиком.
+
+        В SQLite id считаются в процессе, и /scans/bulk/ или другой воркер
+        может занять выданный буфером id. Такой скан получает новый id
+        (с ошибкой в логе), счетчик id сдвигается за занятые. Замена id
+        пишется в WAL, чтобы повтор из WAL не вставил скан второй раз со
+        старым id. Строки, которые база не принимает совсем, уходят в
+        SCAN_BUFFER_DEAD_LETTER.
+        """
+        statement = self._statement(db, replay)
+        rejected = []
+        reassigned = []
+        for row in rows:
+            try:
+                async with db.begin_nested():
+                    await db.execute(statement, [row])
+                continue
+            except IntegrityError as e:
+                error = e
+            except DBAPIError as e:
+                if self._is_transient(e):
+                    raise
+                rejected.append((row, e))
+                continue
+
+            existing = await db.scalar(select(Scan).where(Scan.id == row["id"]))
+            if existing is not None and (
+                existing.qr_data,
+                existing.scan_type,
+                existing.printer_id,
+            ) == (row["qr_data"], row["scan_type"], row["printer_id"]):
+                # Та же строка уже записана прошлым сбросом
+                continue
+            if existing is None:
+                # Нарушено не уникальное ограничение id
+                rejected.append((row, error))
+                continue
+
+            await self._skip_taken_ids(db)
+            new_id = await self._next_id()
+            logger.error(
+                "id %d скана занят записью в обход буфера, скан записан с id %d",
+                row["id"],
+                new_id,
+            )
+            try:
+                async with db.begin_nested():
+                    await db.execute(statement, [{**row, "id": new_id}])
+            except DBAPIError as e:
+                if self._is_transient(e):
+                    raise
+                rejected.append((row, e))
+                continue
+            reassigned.append({"reassigned": row["id"], "id": new_id})
+            self.stats.reassigned += 1
+
+        if reassigned and self.wal_file:
+            # Замена id на диске раньше коммита строки с новым id
+            await asyncio.gather(*(self._write_ahead(entry) for entry in reassigned))
+        if rejected:
+            await asyncio.to_thread(self._write_rejected, rejected)
+            self.stats.rejected += len(rejected)
+        await db.commit()
+
+    @staticmethod
+    def _statement(db, replay: bool):
+        if not replay:
+            return insert(Scan)
+        dialect_insert = (
+            postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+        )
+        # При повторе из WAL уже записанные строки пропускаются. Без
+        # списка колонок: ключ секционированной scans - (id, scanned_at)
+        return dialect_insert(Scan).on_conflict_do_nothing()
+
+    @staticmethod
+    def _is_transient(error: DBAPIError) -> bool:
+        """Ошибка соединения с базой, а не отказ принять строку"""
+        return error.connection_invalidated or isinstance(
+            error, (OperationalError, InterfaceError)
+        )
+
+    @staticmethod
+    def _write_rejected(rejected: List[tuple]):
+        path = Path(settings.SCAN_BUFFER_DEAD_LETTER)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for row, error in rejected:
+                logger.error("Скан %d отвергнут базой: %s", row["id"], error.orig)
+                record = {**row, "scanned_at": row["scanned_at"].isoformat()}
+                f.write(
+                    json.dumps(
+                        {"scan": record, "error": str(error.orig)}, ensure_ascii=False
+                    )
+                    + "\n"
+                )
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _skip_taken_ids(self, db):
+        """Локальный счетчик id (SQLite) - за максимальный id в базе"""
+        async with self.id_lock:
+            if self.next_local_id is None:
+                return
+            max_id = await db.scalar(select(func.max(Scan.id))) or 0
+            # Зарезервированные id идут по возрастанию
+            while self.ids and self.ids[0] <= max_id:
+                self.ids.popleft()
+            self.next_local_id = max(self.next_local_id, max_id + 1)
+
+    @staticmethod
+    def _row(record: dict) -> dict:
+        return {**record, "scanned_at": datetime.fromisoformat(record["scanned_at"])}
+
+    async def _next_id(self) -> int:
+        async with self.id_lock:
+            if not self.ids:
+                await self._allocate_ids(settings.SCAN_BUFFER_ID_BATCH)
+            return self.ids.popleft()
+
+    async def _allocate_ids(self, count: int):
+        """Резервирует пачку id из последовательности таблицы scans"""
+        async with AsyncSessionLocal() as db:
+            if db.bind.dialect.name == "postgresql":
+                result = await db.execute(
+                    text(
+                        "SELECT nextval(pg_get_serial_sequence('scans', 'id')) "
+                        "FROM generate_series(1, :count)"
+                    ),
+                    {"count": count},
+                )
+                self.ids.extend(result.scalars().all())
+                return
+
+            # В SQLite последовательности нет: считаем id в процессе
+            # (подходит только для одного воркера)
+            if self.next_local_id is None:
+                max_id = await db.scalar(select(func.max(Scan.id)))
+                self.next_local_id = (max_id or 0) + 1
+                for record in self.pending:
+                    self.next_local_id = max(self.next_local_id, record["id"] + 1)
+            self.ids.extend(range(self.next_local_id, self.next_local_id + count))
+            self.next_local_id += count
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.wal_dir / f"scans-{segment:012d}.wal"
+
+    def _segments(self) -> List[int]:
+        if not self.wal_dir:
+            return []
+        return sorted(
+            int(path.stem.split("-")[1]) for path in self.wal_dir.glob("scans-*.wal")
+        )
+
+    def _open_segment(self, segment: int):
+        if self.wal_file:
+            self.wal_file.close()
+        self.wal_segment = segment
+        self.wal_file = open(self._segment_path(segment), "a", encoding="utf-8")
+
+    def _remove_segments(self, up_to: int):
+        for segment in self._segments():
+            if segment <= up_to and segment != self.wal_segment:
+                self._segment_path(segment).unlink(missing_ok=True)
+
+
+# Глобальный буфер отложенной записи сканов
+scan_buffer = ScanWriteBuffer()
@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple, Union
+from app.config import settings
+from app.metrics import SCAN_DEDUP_LOOKUPS
+from app.models.scan import Scan
+
+# Ключ индекса: (qr_data, источник - тип скана и устройство)
+DedupKey = Tuple[str, str]
+
+
+class BloomFilter:
+    """Битовый фильтр Блума: "точно не было" или "возможно было" """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: bytes):
+        # Двойное хеширование: k позиций из двух 64-битных половин blake2b
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: bytes):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: bytes) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RotatingBloomFilter:
+    """Два поколения фильтра Блума, сменяющиеся раз в window секунд.
+
+    Ключ, добавленный не раньше чем window секунд назад, всегда находится;
+    более старые могут находиться еще до window секунд - это отсекает
+    проверка по базе.
+    """
+
+    def __init__(self, window: float, capacity: int, error_rate: float):
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous: Optional[BloomFilter] = None
+        self.rotated_at = time.monotonic()
+        self.rotations = 0
+
+    def _rotate(self, now: float):
+        if now - self.rotated_at < self.window:
+            return
+        # Простой дольше двух окон - оба поколения уже неактуальны
+        self.previous = (
+            self.current if now - self.rotated_at < 2 * self.window else None
+        )
+        self.current = BloomFilter(self.capacity, self.error_rate)
+        self.rotated_at = now
+        self.rotations += 1
+
+    def add(self, item: bytes, now: float):
+        self._rotate(now)
+        self.current.add(item)
+
+    def contains(self, item: bytes, now: float) -> bool:
+        self._rotate(now)
+        return item in self.current or (
+            self.previous is not None and item in self.previous
+        )
+
+    @property
+    def nbytes(self) -> int:
+        total = len(self.current.bits)
+        if self.previous is not None:
+            total += len(self.previous.bits)
+        return total
+
+
+class DedupEntry:
+    """Последний скан ключа (или его создание, еще не завершенное)"""
+
+    __slots__ = ("scan", "last_seen")
+
+    def __init__(self, scan: Union[Scan, "asyncio.Future[Scan]"], last_seen: float):
+        self.scan = scan
+        self.last_seen = last_seen
+
+
+class ScanDeduplicator:
+    """Подавление повторных сканов одного кода с одного источника.
+
+    Хеш-индекс в памяти процесса: ключ (qr_data, источник) -> последний
+    скан. Окно скользящее - каждый повтор продлевает его, поэтому код,
+    который держат перед камерой, не создает новых записей, пока не
+    пропадет из кадра хотя бы на window секунд. Просроченные ключи
+    вытесняются при обращениях, размер индекса ограничен max_keys.
+
+    Для длинных окон (часы) держать все сканы в памяти дорого, поэтому
+    дальше короткого окна работает фильтр Блума: ключи, которых точно не
+    было, пишутся без запроса к базе, а "возможно были" проверяются
+    поиском последнего скана в базе.
+
+    Индекс у каждого воркера uvicorn свой: повторы, попавшие в разные
+    воркеры, не подавляются.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        max_keys: int,
+        bloom: Optional[RotatingBloomFilter] = None,
+    ):
+        self.window = window
+        self.max_keys = max_keys
+        self.bloom = bloom
+        self.entries: "OrderedDict[DedupKey, DedupEntry]" = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self.bloom_hits = 0
+        self.bloom_false_positives = 0
+        self.db_lookups = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    @staticmethod
+    def _bloom_item(key: DedupKey) -> bytes:
+        return f"{key[1]}\x00{key[0]}".encode("utf-8")
+
+    def _evict(self, now: float):
+        # Записи упорядочены по last_seen: просроченные всегда в начале
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if now - entry.last_seen <= self.window and len(self.entries) <= (
+                self.max_keys
+            ):
+                break
+            if isinstance(entry.scan, asyncio.Future) and not entry.scan.done():
+                # Создание еще идет - не теряем ожидающих его повторов
+                self.entries.move_to_end(key)
+                break
+            del self.entries[key]
+            self.evictions += 1
+
+    def _remember(self, key: DedupKey, scan, now: float):
+        self.entries[key] = DedupEntry(scan, now)
+        self.entries.move_to_end(key)
+
+    async def get_or_create(
+        self,
+        key: DedupKey,
+        create: Callable[[], Awaitable[Scan]],
+        find: Optional[Callable[[float], Awaitable[Optional[Scan]]]] = None,
+    ) -> Tuple[Scan, bool]:
+        """Возвращает (скан, создан ли он сейчас).
+
+        find(seconds) ищет последний скан ключа в базе не старше seconds и
+        нужен только при включенном фильтре Блума.
+        """
+        now = time.monotonic()
+        self._evict(now)
+        self.lookups += 1
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.last_seen = now
+            self.entries.move_to_end(key)
+            self.hits += 1
+            SCAN_DEDUP_LOOKUPS.labels("hit").inc()
+            if isinstance(entry.scan, asyncio.Future):
+                # Первый скан этого кода еще пишется - ждем его же
+                return await asyncio.shield(entry.scan), False
+            return entry.scan, False
+
+        # Повторы, пришедшие пока идет проверка и запись, дождутся ее
+        future = asyncio.get_running_loop().create_future()
+        self._remember(key, future, now)
+        try:
+            scan, created = await self._find_or_create(key, create, find, now)
+        except BaseException as e:
+            entry = self.entries.get(key)
+            if entry is not None and entry.scan is future:
+                del self.entries[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Исключение уже передано ожидающим; без них не логируется
+                future.exception()
+            raise
+
+        future.set_result(scan)
+        entry = self.entries.get(key)
+        if entry is not None and entry.scan is future:
+            entry.scan = scan
+        return scan, created
+
+    async def _find_or_create(
+        self,
+        key: DedupKey,
+        create: Callable[[], Awaitable[Scan]],
+        find: Optional[Callable[[float], Awaitable[Optional[Scan]]]],
+        now: float,
+    ) -> Tuple[Scan, bool]:
+        item = self._bloom_item(key) if self.bloom else None
+        if item is not None and find is not None and self.bloom.contains(item, now):
+            self.db_lookups += 1
+            existing = await find(self.bloom.window)
+            if existing is not None:
+                self.bloom_hits += 1
+                SCAN_DEDUP_LOOKUPS.labels("bloom_hit").inc()
+                return existing, False
+            self.bloom_false_positives += 1
+
+        SCAN_DEDUP_LOOKUPS.labels("miss").inc()
+        scan = await create()
+        if item is not None:
+            self.bloom.add(item, time.monotonic())
+        return scan, True
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self) -> dict:
+        """Возвращает метрики индекса повторов"""
+        stats = {
+            "enabled": self.enabled,
+            "window": self.window,
+            "keys": len(self.entries),
+            "max_keys": self.max_keys,
+            "lookups": self.lookups,
+            "hits": self.hits + self.bloom_hits,
+            "hit_ratio": (
+                round((self.hits + self.bloom_hits) / self.lookups, 4)
+                if self.lookups
+                else 0.0
+            ),
+            "evictions": self.evictions,
+            "bloom": None,
+        }
+        if self.bloom:
+            stats["bloom"] = {
+                "window": self.bloom.window,
+                "hits": self.bloom_hits,
+                "false_positives": self.bloom_false_positives,
+                "db_lookups": self.db_lookups,
+                "rotations": self.bloom.rotations,
+                "bytes": self.bloom.nbytes,
+            }
+        return stats
+
+
+def create_scan_dedup() -> ScanDeduplicator:
+    bloom = None
+    if settings.SCAN_DEDUP_BLOOM_WINDOW > settings.SCAN_DEDUP_WINDOW > 0:
+        bloom = RotatingBloomFilter(
+            settings.SCAN_DEDUP_BLOOM_WINDOW,
+            settings.SCAN_DEDUP_BLOOM_CAPACITY,
+            settings.SCAN_DEDUP_BLOOM_ERROR_RATE,
+        )
+    return ScanDeduplicator(
+        settings.SCAN_DEDUP_WINDOW, settings.SCAN_DEDUP_MAX_KEYS, bloom
+    )
+
+
+# Глобальный индекс повторных сканов
+scan_dedup = create_scan_dedup()
@@ -0,0 +1,216 @@
+import asyncio
+import csv
+import gzip
+import logging
+import os
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+from app.metrics import SCAN_ARCHIVED_ROWS
+from app.models.scan import (
+    add_months,
+    create_scan_partitions,
+    get_scan_partitions,
+    month_start,
+    scans_partitioned,
+)
+
+logger = logging.getLogger(__name__)
+
+# Полная строка scans, в отличие от выгрузки для пользователя
+ARCHIVE_COLUMNS = [
+    "id",
+    "qr_data",
+    "file_path",
+    "scan_type",
+    "scanned_at",
+    "printed",
+    "printed_at",
+    "printer_id",
+]
+ARCHIVE_SUFFIXES = {"parquet": ".parquet", "csv": ".csv.gz"}
+ARCHIVE_BATCH = 10000
+
+
+def write_parquet(rows: Iterable, path: Path) -> int:
+    """Пишет строки в Parquet (zstd), возвращает их число"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("qr_data", pa.string()),
+            ("file_path", pa.string()),
+            ("scan_type", pa.string()),
+            ("scanned_at", pa.timestamp("us", tz="UTC")),
+            ("printed", pa.bool_()),
+            ("printed_at", pa.timestamp("us", tz="UTC")),
+            ("printer_id", pa.string()),
+        ]
+    )
+    count = 0
+    rows = iter(rows)
+    with pq.ParquetWriter(str(path), schema, compression="zstd") as writer:
+        while batch := list(islice(rows, ARCHIVE_BATCH)):
+            columns = {
+                name: [getattr(row, name) for row in batch] for name in ARCHIVE_COLUMNS
+            }
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(batch)
+    return count
+
+
+def write_csv(rows: Iterable, path: Path) -> int:
+    """Пишет строки в CSV, сжатый gzip; время - ISO 8601"""
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(ARCHIVE_COLUMNS)
+        for row in rows:
+            writer.writerow(
+                [
+                    value.isoformat() if isinstance(value, datetime) else value
+                    for value in (getattr(row, name) for name in ARCHIVE_COLUMNS)
+                ]
+            )
+            count += 1
+    return count
+
+
+ARCHIVE_WRITERS = {"parquet": write_parquet, "csv": write_csv}
+
+
+def now_stamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+
+
+class ScanRetentionService:
+    """Обслуживание секций scans: новые месяцы наперед и архив старых.
+
+    Секция старше SCAN_RETENTION_MONTHS отсоединяется от scans, ее строки
+    пишутся в файл SCAN_ARCHIVE_DIR, и только после сверки числа строк
+    таблица удаляется. Прерванное архивирование продолжается при
+    следующем проходе. Счетчики scan_rollups при этом не меняются:
+    статистика за архивные месяцы остается на дашбордах.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.warned = False
+
+    async def start(self):
+        if engine.dialect.name != "postgresql":
+            return
+        self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error("Ошибка обслуживания секций scans: %s", e)
+            await asyncio.sleep(settings.SCAN_MAINTENANCE_INTERVAL)
+
+    def run_once(self, now: Optional[datetime] = None) -> dict:
+        """Один проход; воркеры выполняют его по очереди"""
+        now = now or datetime.now(timezone.utc)
+        result = {"created": [], "archived": []}
+        with engine.connect() as lock:
+            if not lock.scalar(text("SELECT pg_try_advisory_lock(hashtext('scans'))")):
+                return result
+            try:
+                if not scans_partitioned(lock):
+                    if not self.warned:
+                        logger.warning(
+                            "Таблица scans не секционирована, "
+                            "нужна миграция 0008 (alembic upgrade head)"
+                        )
+                        self.warned = True
+                    return result
+                result["created"] = self.create_partitions(now)
+                result["archived"] = self.archive_expired(now)
+            finally:
+                lock.execute(text("SELECT pg_advisory_unlock(hashtext('scans'))"))
+                lock.commit()
+        return result
+
+    def create_partitions(self, now: datetime) -> list:
+        month = month_start(now)
+        with engine.begin() as conn:
+            created = create_scan_partitions(
+                conn, month, add_months(month, settings.SCAN_PARTITION_MONTHS_AHEAD)
+            )
+        for name in created:
+            logger.info("Создана секция %s", name)
+        return created
+
+    def archive_expired(self, now: datetime) -> list:
+        """Отсоединяет секции старше срока хранения и архивирует их"""
+        if settings.SCAN_RETENTION_MONTHS > 0:
+            cutoff = add_months(month_start(now), -settings.SCAN_RETENTION_MONTHS)
+            with engine.begin() as conn:
+                expired = [
+                    name for name, month in get_scan_partitions(conn) if month < cutoff
+                ]
+                for name in expired:
+                    # Обычный DETACH: CONCURRENTLY нельзя при scans_default
+                    conn.execute(text(f"ALTER TABLE scans DETACH PARTITION {name}"))
+
+        # Вместе с только что отсоединенными - оставшиеся от прерванных проходов
+        with engine.connect() as conn:
+            detached = [name for name, _ in get_scan_partitions(conn, attached=False)]
+        return [str(self.archive_partition(name)) for name in detached]
+
+    def archive_partition(self, name: str) -> Path:
+        """Пишет отсоединенную секцию в файл и удаляет ее таблицу"""
+        fmt = settings.SCAN_ARCHIVE_FORMAT
+        if fmt not in ARCHIVE_WRITERS:
+            raise ValueError(f"Неизвестный формат архива: {fmt}")
+        archive_dir = Path(settings.SCAN_ARCHIVE_DIR)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        path = archive_dir / f"{name}{ARCHIVE_SUFFIXES[fmt]}"
+        if path.exists():
+            # Месяц уже архивировался (строки пришли задним числом) - не
+            # затираем прежний файл
+            path = path.with_name(f"{name}-{now_stamp()}{ARCHIVE_SUFFIXES[fmt]}")
+        partial = path.with_name(path.name + ".tmp")
+
+        columns = ", ".join(ARCHIVE_COLUMNS)
+        with engine.connect() as conn:
+            expected = conn.scalar(text(f"SELECT count(*) FROM {name}"))
+            rows = conn.execution_options(
+                stream_results=True, yield_per=ARCHIVE_BATCH
+            ).execute(text(f"SELECT {columns} FROM {name} ORDER BY scanned_at, id"))
+            written = ARCHIVE_WRITERS[fmt](rows, partial)
+
+        if written != expected:
+            partial.unlink(missing_ok=True)
+            raise RuntimeError(
+                f"Архив {name}: записано {written} строк из {expected}, "
+                "секция не удалена"
+            )
+        with open(partial, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(partial, path)
+
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE {name}"))
+        SCAN_ARCHIVED_ROWS.inc(written)
+        logger.info("Секция %s (%d строк) перенесена в %s", name, written, path)
+        return path
+
+
+# Глобальный экземпляр обслуживания секций
+scan_retention = ScanRetentionService()
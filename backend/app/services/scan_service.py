@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.crud import scan_async as crud_scan
+from app.models.scan import Scan
+from app.schemas.scan import BulkScanItem, BulkScanResult, ScanCreate, ScanResponse
+from app.services.broker import Subscription, broker
+from app.services.scan_buffer import scan_buffer
+from app.services.scan_dedup import scan_dedup
+
+# Тема брокера для ленты новых сканов
+SCAN_FEED_TOPIC = "scans"
+# Типы сканов, повторы которых подавляются
+DEDUP_SCAN_TYPES = {
+    scan_type.strip()
+    for scan_type in settings.SCAN_DEDUP_TYPES.split(",")
+    if scan_type.strip()
+}
+
+
+class ScanService:
+    """Создание сканов: сразу в базу или через буфер отложенной записи.
+
+    Каждый созданный скан публикуется в ленту для подписанных дашбордов,
+    повторы одного кода подавляются индексом scan_dedup.
+    """
+
+    @staticmethod
+    async def create_scan(
+        db: AsyncSession,
+        scan: ScanCreate,
+        file_path: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> Tuple[Scan, bool]:
+        """Возвращает (скан, создан ли он).
+
+        Повтор того же кода с того же источника в окне SCAN_DEDUP_WINDOW
+        не пишется: возвращается ранее созданный скан и False, печатать
+        его повторно не нужно. Источник по умолчанию - тип скана и
+        принтер (клиент камеры).
+        """
+
+        async def create() -> Scan:
+            if scan_buffer.enabled:
+                db_scan = await scan_buffer.add(scan, file_path)
+            else:
+                db_scan = await crud_scan.create_scan(
+                    db=db, scan=scan, file_path=file_path
+                )
+            ScanService.publish(db_scan)
+            return db_scan
+
+        if not scan_dedup.enabled or scan.scan_type not in DEDUP_SCAN_TYPES:
+            return await create(), True
+
+        async def find(seconds: float) -> Optional[Scan]:
+            since = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+            if scan_buffer.enabled:
+                # Повтор мог еще не дойти до базы из буфера
+                pending = scan_buffer.find_latest(
+                    scan.qr_data, scan.scan_type, scan.printer_id, since
+                )
+                if pending is not None:
+                    return pending
+            return await crud_scan.get_latest_scan(
+                db,
+                scan.qr_data,
+                scan.scan_type,
+                printer_id=scan.printer_id,
+                since=since,
+            )
+
+        if source is None:
+            source = f"{scan.scan_type}:{scan.printer_id or ''}"
+        return await scan_dedup.get_or_create((scan.qr_data, source), create, find)
+
+    @staticmethod
+    async def bulk_create_scans(
+        db: AsyncSession, items: List[BulkScanItem]
+    ) -> List[BulkScanResult]:
+        results = await crud_scan.bulk_create_scans(db, items)
+
+        if broker.has_subscribers(SCAN_FEED_TOPIC):
+            now = datetime.now(timezone.utc)
+            scans = [
+                ScanResponse(
+                    id=result.id,
+                    qr_data=items[result.index].qr_data,
+                    scan_type=items[result.index].scan_type,
+                    printer_id=items[result.index].printer_id,
+                    scanned_at=items[result.index].scanned_at or now,
+                ).model_dump(mode="json")
+                for result in results
+                if result.status == "created"
+            ]
+            # Пачка уходит несколькими сообщениями, а не тысячами по одному,
+            # чтобы не переполнить очереди подписчиков
+            broker.publish_batch(
+                SCAN_FEED_TOPIC,
+                scans,
+                lambda chunk: {"type": "scans", "scans": chunk},
+                settings.FEED_BATCH_SIZE,
+            )
+        return results
+
+    @staticmethod
+    def publish(scan):
+        """Публикует скан (модель или ScanResponse) в ленту"""
+        if broker.has_subscribers(SCAN_FEED_TOPIC):
+            scan = ScanResponse.model_validate(scan).model_dump(mode="json")
+            broker.publish(SCAN_FEED_TOPIC, {"type": "scan", "scan": scan})
+
+    @staticmethod
+    def subscribe(
+        scan_type: Optional[str] = None, printer_id: Optional[str] = None
+    ) -> Subscription:
+        """Подписка на ленту с фильтром по типу скана и принтеру"""
+        if scan_type is None and printer_id is None:
+            return broker.subscribe(SCAN_FEED_TOPIC)
+
+        def matches(scan: dict) -> bool:
+            return (scan_type is None or scan["scan_type"] == scan_type) and (
+                printer_id is None or scan["printer_id"] == printer_id
+            )
+
+        def select(message: dict) -> Optional[dict]:
+            if message["type"] == "scan":
+                return message if matches(message["scan"]) else None
+            scans = [scan for scan in message["scans"] if matches(scan)]
+            return {"type": "scans", "scans": scans} if scans else None
+
+        return broker.subscribe(SCAN_FEED_TOPIC, select=select)
@@ -1,7 +1,15 @@
-import serial
-import serial.tools.list_ports
-from typing import Optional, List
+import asyncio
+import logging
+import threading
 import time
+import serial
+from typing import Callable, Dict, Optional, List, Set
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.schemas.scan import ScanCreate, PrintCommand
+from app.services.device_registry import DeviceInfo, device_registry
+
+logger = logging.getLogger(__name__)
 
 
 class ScannerService:
@@ -10,14 +18,7 @@ class ScannerService:
     @staticmethod
     def find_scanner() -> Optional[str]:
         """Находит подключенный сканер"""
-        ports = serial.tools.list_ports.comports()
-
-        for port in ports:
-            # Ищем сканер Bestson S20-B по VID/PID или описанию
-            if "Bestson" in port.description or "S20" in port.description:
-                return port.device
-
-        return None
+        return device_registry.find_scanner()
 
     @staticmethod
     def read_from_scanner(
@@ -33,12 +34,247 @@ class ScannerService:
                         data = ser.readline().decode("utf-8").strip()
                         return data
         except Exception as e:
-            print(f"Ошибка при чтении со сканера: {e}")
+            logger.error("Ошибка при чтении со сканера: %s", e)
 
         return None
 
     @staticmethod
     def get_available_ports() -> List[str]:
         """Возвращает список доступных COM портов"""
-        ports = serial.tools.list_ports.comports()
-        return [port.device for port in ports]
+        return device_registry.ports()
+
+
+class ScannerReader:
+    """Постоянное чтение одного порта сканера в отдельном потоке.
+
+    Порт держится открытым, строки собираются из потока байтов по мере
+    поступления (терминатор CR или LF), при отключении устройства поток
+    переподключается с экспоненциальной задержкой.
+    """
+
+    def __init__(
+        self, port: str, on_scan: Callable[[str, str], None], baudrate: int = None
+    ):
+        self.port = port
+        self.baudrate = baudrate or settings.SCANNER_BAUDRATE
+        self.on_scan = on_scan
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.serial: Optional[serial.Serial] = None
+        self.connected = False
+        self.lines = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self.last_scan_at: Optional[float] = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self._run, name=f"scanner-{self.port}", daemon=True
+        )
+        self.thread.start()
+
+    def wake(self):
+        """Прерывает ожидание переподключения (устройство появилось)"""
+        self.wake_event.set()
+
+    def stop(self, timeout: float = 2.0):
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def _run(self):
+        backoff = settings.SCANNER_RECONNECT_MIN
+        while not self.stop_event.is_set():
+            try:
+                # exclusive: порт читает только один процесс (воркер uvicorn)
+                with serial.Serial(
+                    self.port, self.baudrate, timeout=0.2, exclusive=True
+                ) as ser:
+                    self.serial = ser
+                    self.connected = True
+                    backoff = settings.SCANNER_RECONNECT_MIN
+                    logger.info("Сканер подключен: %s", self.port)
+                    self._read_lines(ser)
+            except (serial.SerialException, OSError) as e:
+                self.last_error = str(e)
+            finally:
+                if self.connected:
+                    logger.warning("Сканер отключен: %s", self.port)
+                self.connected = False
+                self.serial = None
+
+            self.wake_event.wait(backoff)
+            self.wake_event.clear()
+            if self.stop_event.is_set():
+                break
+            self.reconnects += 1
+            backoff = min(backoff * 2, settings.SCANNER_RECONNECT_MAX)
+
+    def _read_lines(self, ser: serial.Serial):
+        buffer = b""
+        while not self.stop_event.is_set():
+            chunk = ser.read(ser.in_waiting or 1)
+            if not chunk:
+                continue
+
+            buffer += chunk.replace(b"\r", b"\n")
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                data = line.decode("utf-8", errors="replace").strip()
+                if data:
+                    self.lines += 1
+                    self.last_scan_at = time.time()
+                    self.on_scan(self.port, data)
+
+    def get_stats(self) -> dict:
+        return {
+            "port": self.port,
+            "connected": self.connected,
+            "lines": self.lines,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            "last_scan_at": self.last_scan_at,
+        }
+
+
+class ScannerManager:
+    """Держит читателей портов и передает сканы в базу и на печать"""
+
+    def __init__(self):
+        self.readers: Dict[str, ScannerReader] = {}
+        self.auto = False
+        self.auto_ports: Set[str] = set()
+        self.queue: Optional[asyncio.Queue] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.consumer: Optional[asyncio.Task] = None
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    async def start(self):
+        """Запускает обработку очереди и читателей портов из настроек"""
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.SCANNER_QUEUE_SIZE)
+        self.consumer = asyncio.create_task(self._consume())
+
+        for port in self._configured_ports():
+            self.add_reader(port)
+
+        if self.auto:
+            for device in device_registry.scanners():
+                self._add_auto_reader(device.device)
+        device_registry.subscribe(self._on_devices)
+
+    async def stop(self):
+        device_registry.unsubscribe(self._on_devices)
+        for port in list(self.readers):
+            await asyncio.to_thread(self.remove_reader, port)
+
+        if self.consumer:
+            self.consumer.cancel()
+            try:
+                await self.consumer
+            except asyncio.CancelledError:
+                pass
+            self.consumer = None
+
+    def add_reader(self, port: str) -> ScannerReader:
+        """Начинает постоянное чтение порта"""
+        if port not in self.readers:
+            reader = ScannerReader(port, self._on_scan)
+            self.readers[port] = reader
+            reader.start()
+        return self.readers[port]
+
+    def remove_reader(self, port: str) -> bool:
+        """Останавливает чтение порта"""
+        reader = self.readers.pop(port, None)
+        self.auto_ports.discard(port)
+        if reader is None:
+            return False
+        reader.stop()
+        return True
+
+    def get_stats(self) -> dict:
+        return {
+            "readers": [
+                {**reader.get_stats(), "auto": port in self.auto_ports}
+                for port, reader in self.readers.items()
+            ],
+            "queued": self.queue.qsize() if self.queue else 0,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _configured_ports(self) -> List[str]:
+        ports = [port.strip() for port in settings.SCANNER_PORTS.split(",")]
+        # "auto" - читать все найденные сканеры, следить за подключением
+        self.auto = "auto" in ports
+        return [port for port in ports if port and port != "auto"]
+
+    def _add_auto_reader(self, port: str):
+        if port not in self.readers:
+            self.auto_ports.add(port)
+            self.add_reader(port)
+
+    def _on_devices(self, added: List[DeviceInfo], removed: List[DeviceInfo]):
+        # Вызывается из потока, обновившего реестр устройств
+        self.loop.call_soon_threadsafe(self._apply_devices, added, removed)
+
+    def _apply_devices(self, added: List[DeviceInfo], removed: List[DeviceInfo]):
+        for device in added:
+            reader = self.readers.get(device.device)
+            if reader:
+                # Порт читается, но устройство было отключено - не ждать backoff
+                reader.wake()
+            elif self.auto and device_registry.is_scanner(device):
+                self._add_auto_reader(device.device)
+
+        for device in removed:
+            if device.device in self.auto_ports:
+                self.auto_ports.discard(device.device)
+                reader = self.readers.pop(device.device, None)
+                if reader:
+                    asyncio.create_task(asyncio.to_thread(reader.stop))
+
+    def _on_scan(self, port: str, data: str):
+        # Вызывается из потока читателя
+        self.loop.call_soon_threadsafe(self._enqueue, port, data)
+
+    def _enqueue(self, port: str, data: str):
+        try:
+            self.queue.put_nowait((port, data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _consume(self):
+        # Импорт здесь, чтобы не было цикла: scan_service -> scan_buffer -> ...
+        from app.services.scan_service import ScanService
+        from app.services.print_service import print_service
+
+        while True:
+            port, data = await self.queue.get()
+            try:
+                async with AsyncSessionLocal() as db:
+                    db_scan, created = await ScanService.create_scan(
+                        db,
+                        ScanCreate(qr_data=data, scan_type="scanner"),
+                        source=f"scanner:{port}",
+                    )
+                self.processed += 1
+
+                if created and settings.SCANNER_AUTO_PRINT:
+                    await print_service.send_print_command(
+                        PrintCommand(qr_data=data, printer_id="default"),
+                        scan_id=db_scan.id,
+                    )
+            except Exception as e:
+                self.failed += 1
+                logger.error("Ошибка при обработке скана с %s: %s", port, e)
+
+
+# Глобальный менеджер сканеров
+scanner_manager = ScannerManager()
@@ -0,0 +1,281 @@
+import hashlib
+import logging
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path, PurePosixPath
+from typing import Optional
+from urllib.parse import quote, urlsplit
+
+from fastapi.responses import FileResponse, Response
+
+from app.config import settings
+from app.metrics import UPLOAD_STORE_WRITES
+
+logger = logging.getLogger(__name__)
+
+# Сигнатуры форматов: файл хранится в исходной кодировке, расширение -
+# по содержимому, а не по тому, что прислал клиент
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tif"),
+    (b"MM\x00*", "tif"),
+]
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+    "bmp": "image/bmp",
+    "tif": "image/tiff",
+    "webp": "image/webp",
+    "bin": "application/octet-stream",
+}
+THUMBNAIL_FORMATS = {"webp": ("WEBP", "webp"), "jpeg": ("JPEG", "jpg")}
+THUMBNAILS_DIR = "thumbs"
+# Ключ - хеш содержимого, файл по нему никогда не меняется
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def image_extension(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return "bin"
+
+
+def content_key(data: bytes) -> str:
+    """ab/cd/abcd...ef.png: SHA-256 содержимого, два уровня каталогов"""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{image_extension(data)}"
+
+
+def thumbnail_key(key: str) -> str:
+    extension = THUMBNAIL_FORMATS[settings.UPLOAD_THUMBNAIL_FORMAT][1]
+    return f"{THUMBNAILS_DIR}/{key.rsplit('.', 1)[0]}.{extension}"
+
+
+def content_type(key: str) -> str:
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], CONTENT_TYPES["bin"])
+
+
+def storage_key(file_path: str) -> str:
+    """file_path скана -> ключ хранилища.
+
+    Старые сканы хранят путь вида static/uploads/qr_scan_....png - ключом
+    служит путь внутри UPLOAD_DIR. Выход за корень хранилища запрещен.
+    """
+    prefix = settings.UPLOAD_DIR.rstrip("/") + "/"
+    if file_path.startswith(prefix):
+        file_path = file_path[len(prefix) :]
+    path = PurePosixPath(file_path)
+    if path.is_absolute() or ".." in path.parts:
+        raise ValueError(f"Недопустимый путь к изображению: {file_path}")
+    return str(path)
+
+
+def make_thumbnail(data: bytes) -> bytes:
+    """Уменьшенная копия для истории сканов (WebP или JPEG)"""
+    from PIL import Image, ImageOps
+
+    pil_format, _ = THUMBNAIL_FORMATS[settings.UPLOAD_THUMBNAIL_FORMAT]
+    size = settings.UPLOAD_THUMBNAIL_SIZE
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = BytesIO()
+        image.save(buffer, pil_format, quality=settings.UPLOAD_THUMBNAIL_QUALITY)
+    return buffer.getvalue()
+
+
+class UploadStorage:
+    """Хранилище кадров по хешу содержимого: одинаковые кадры - один файл.
+
+    Наследники реализуют exists/put/get и ответ с X-Accel-Redirect.
+    """
+
+    def save(self, data: bytes, key: Optional[str] = None) -> str:
+        """Сохраняет кадр и миниатюру, возвращает ключ"""
+        key = key or content_key(data)
+        if self.put(key, data):
+            UPLOAD_STORE_WRITES.labels(result="stored").inc()
+            self.save_thumbnail(key, data)
+        else:
+            UPLOAD_STORE_WRITES.labels(result="duplicate").inc()
+        return key
+
+    def save_thumbnail(self, key: str, data: bytes) -> Optional[str]:
+        try:
+            thumbnail = make_thumbnail(data)
+        except Exception as e:
+            logger.warning("Не удалось сделать миниатюру %s: %s", key, e)
+            return None
+        thumb_key = thumbnail_key(key)
+        self.put(thumb_key, thumbnail)
+        return thumb_key
+
+    def ensure_thumbnail(self, key: str) -> Optional[str]:
+        """Ключ миниатюры; для старых кадров она создается при первом запросе"""
+        thumb_key = thumbnail_key(key)
+        if self.exists(thumb_key):
+            return thumb_key
+        data = self.get(key)
+        if data is None:
+            return None
+        return self.save_thumbnail(key, data)
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes) -> bool:
+        """Записывает объект; False - он уже был"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def response(self, key: str) -> Response:
+        raise NotImplementedError
+
+
+class LocalUploadStorage(UploadStorage):
+    """Каталог UPLOAD_DIR; nginx отдает файлы сам из internal location"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def put(self, key: str, data: bytes) -> bool:
+        path = self.path(key)
+        try:
+            # Повтор продлевает жизнь файла для очистки старых загрузок
+            os.utime(path)
+            return False
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Через временный файл: читатель не увидит недописанный кадр
+        fd, partial = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                # mkstemp создает файл 0600: nginx не смог бы его отдать
+                os.fchmod(f.fileno(), 0o644)
+            os.replace(partial, path)
+        except BaseException:
+            os.unlink(partial)
+            raise
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def response(self, key: str) -> Response:
+        headers = {"Cache-Control": IMMUTABLE}
+        if settings.UPLOAD_ACCEL_PREFIX:
+            headers["X-Accel-Redirect"] = settings.UPLOAD_ACCEL_PREFIX + quote(key)
+            return Response(headers=headers, media_type=content_type(key))
+        # Без nginx (локальный запуск) файл отдает сам бэкенд
+        if not self.exists(key):
+            return Response(status_code=404)
+        return FileResponse(
+            self.path(key), media_type=content_type(key), headers=headers
+        )
+
+
+class S3UploadStorage(UploadStorage):
+    """S3-совместимое хранилище (MinIO, Ceph, AWS).
+
+    nginx забирает объект по подписанной ссылке из internal location,
+    проксирующей на UPLOAD_S3_ENDPOINT_URL; бакет может быть закрытым.
+    """
+
+    def __init__(self):
+        import boto3
+        from botocore.config import Config
+
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.UPLOAD_S3_ENDPOINT_URL,
+            region_name=settings.UPLOAD_S3_REGION,
+            aws_access_key_id=settings.UPLOAD_S3_ACCESS_KEY,
+            aws_secret_access_key=settings.UPLOAD_S3_SECRET_KEY,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        )
+        self.bucket = settings.UPLOAD_S3_BUCKET
+        self.prefix = settings.UPLOAD_S3_PREFIX
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+
+    def put(self, key: str, data: bytes) -> bool:
+        if self.exists(key):
+            return False
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.prefix + key,
+            Body=data,
+            ContentType=content_type(key),
+            CacheControl=IMMUTABLE,
+        )
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            result = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return result["Body"].read()
+
+    def response(self, key: str) -> Response:
+        headers = {"Cache-Control": IMMUTABLE}
+        if settings.UPLOAD_ACCEL_PREFIX:
+            url = urlsplit(
+                self.client.generate_presigned_url(
+                    "get_object",
+                    Params={"Bucket": self.bucket, "Key": self.prefix + key},
+                    ExpiresIn=settings.UPLOAD_S3_URL_TTL,
+                )
+            )
+            # /internal/s3/<bucket>/<key>?<подпись> -> proxy_pass на S3
+            headers["X-Accel-Redirect"] = (
+                f"{settings.UPLOAD_S3_ACCEL_PREFIX}{url.path.lstrip('/')}?{url.query}"
+            )
+            return Response(headers=headers, media_type=content_type(key))
+        data = self.get(key)
+        if data is None:
+            return Response(status_code=404)
+        return Response(data, media_type=content_type(key), headers=headers)
+
+
+def create_upload_storage() -> UploadStorage:
+    if settings.UPLOAD_STORAGE == "s3":
+        return S3UploadStorage()
+    return LocalUploadStorage(settings.UPLOAD_DIR)
+
+
+# Глобальное хранилище загруженных кадров
+upload_storage = create_upload_storage()
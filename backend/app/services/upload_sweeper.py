@@ -0,0 +1,131 @@
+import asyncio
+import fcntl
+import logging
+import os
+import time
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.metrics import UPLOADS_SWEPT
+
+logger = logging.getLogger(__name__)
+
+SWEEP_MODES = ("delete", "compact")
+
+
+class UploadSweeper:
+    """Очистка UPLOAD_DIR от кадров старше UPLOAD_RETENTION_DAYS.
+
+    delete удаляет файлы, compact складывает их в UPLOAD_ARCHIVE_DIR по
+    одному zip на день (без сжатия: PNG уже сжат) и удаляет оригиналы -
+    тысячи мелких файлов превращаются в один. file_path у старых сканов
+    после этого указывает на отсутствующий файл. Повторно загруженный
+    кадр хранилище "трогает", и он живет срок от последней загрузки.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if settings.UPLOAD_RETENTION_DAYS <= 0:
+            return
+        if settings.UPLOAD_STORAGE != "local":
+            logger.info("Старые кадры в S3 удаляют правила жизненного цикла бакета")
+            return
+        if settings.UPLOAD_SWEEP_MODE not in SWEEP_MODES:
+            raise ValueError(
+                f"Неизвестный режим очистки загрузок: {settings.UPLOAD_SWEEP_MODE}"
+            )
+        self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error("Ошибка очистки загрузок: %s", e)
+            await asyncio.sleep(settings.UPLOAD_SWEEP_INTERVAL)
+
+    def run_once(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Один проход; воркеры выполняют его по очереди (flock)"""
+        cutoff = (now or time.time()) - settings.UPLOAD_RETENTION_DAYS * 86400
+        result = {"deleted": 0, "compacted": 0, "bytes": 0}
+
+        archive_dir = Path(settings.UPLOAD_ARCHIVE_DIR)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        with open(archive_dir / ".sweep.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return result
+
+            # Кадры и миниатюры старше срока по всему дереву, по дню изменения
+            aged: Dict[str, List[Path]] = defaultdict(list)
+            for directory, _, names in os.walk(settings.UPLOAD_DIR):
+                for name in names:
+                    path = Path(directory) / name
+                    try:
+                        mtime = path.stat().st_mtime
+                    except FileNotFoundError:
+                        continue
+                    if mtime < cutoff:
+                        day = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d")
+                        aged[day].append(path)
+
+            for day, files in sorted(aged.items()):
+                if settings.UPLOAD_SWEEP_MODE == "compact":
+                    self._compact(archive_dir / f"uploads-{day}.zip", files)
+                    action = "compacted"
+                else:
+                    action = "deleted"
+                removed = 0
+                for path in files:
+                    # Кадр мог быть загружен повторно после обхода: хранилище
+                    # его только "тронуло", и новый скан ссылается на него
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_mtime >= cutoff:
+                        continue
+                    path.unlink()
+                    result["bytes"] += stat.st_size
+                    removed += 1
+                result[action] += removed
+                UPLOADS_SWEPT.labels(action=action).inc(removed)
+
+        if result["deleted"] or result["compacted"]:
+            logger.info(
+                "Очистка загрузок: удалено %d, в архив %d, освобождено %d байт",
+                result["deleted"],
+                result["compacted"],
+                result["bytes"],
+            )
+        return result
+
+    @staticmethod
+    def _compact(path: Path, files: List[Path]):
+        """Дописывает файлы в zip дня; уже записанные (проход прервался) пропускает"""
+        root = Path(settings.UPLOAD_DIR)
+        with zipfile.ZipFile(path, "a", compression=zipfile.ZIP_STORED) as archive:
+            stored = set(archive.namelist())
+            for file in files:
+                # Имя в архиве - ключ хранилища (ab/cd/<хеш>.png)
+                name = file.relative_to(root).as_posix()
+                if name not in stored:
+                    archive.write(file, arcname=name)
+        with open(path, "rb") as f:
+            os.fsync(f.fileno())
+
+
+# Глобальный экземпляр очистки загрузок
+upload_sweeper = UploadSweeper()
@@ -0,0 +1,20 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(scanned_at: datetime, scan_id: int) -> str:
+    """Упаковывает позицию (scanned_at, id) в непрозрачную строку"""
+    raw = json.dumps([scanned_at.isoformat(), scan_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Распаковывает курсор; ValueError если он поврежден"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        scanned_at, scan_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(scanned_at), int(scan_id)
+    except Exception:
+        raise ValueError("Некорректный курсор")
@@ -1,71 +1,73 @@
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter
 from datetime import datetime
-from typing import List
+from itertools import chain, islice
+from typing import BinaryIO, Iterable, List
 from io import BytesIO
 from app.models.scan import Scan
 
 
 class ExcelExporter:
+    HEADERS = [
+        "ID",
+        "Данные QR",
+        "Тип сканирования",
+        "Время сканирования",
+        "Напечатано",
+        "Время печати",
+        "Принтер",
+    ]
+
+    # По скольким первым строкам считать ширину колонок
+    WIDTH_SAMPLE_ROWS = 500
+
+    @staticmethod
+    def scan_to_row(scan: Scan) -> list:
+        """Строка отчета для одного скана"""
+        return [
+            scan.id,
+            scan.qr_data,
+            scan.scan_type,
+            scan.scanned_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "Да" if scan.printed else "Нет",
+            scan.printed_at.strftime("%Y-%m-%d %H:%M:%S") if scan.printed_at else "",
+            scan.printer_id or "",
+        ]
+
     @staticmethod
     def export_scans_to_excel(scans: List[Scan]) -> bytes:
         """Экспортирует сканы в Excel файл"""
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "История сканирований"
+        buffer = BytesIO()
+        ExcelExporter.write_scans(scans, buffer)
+        return buffer.getvalue()
 
-        # Заголовки
-        headers = [
-            "ID",
-            "Данные QR",
-            "Тип сканирования",
-            "Время сканирования",
-            "Напечатано",
-            "Время печати",
-            "Принтер",
-        ]
+    @staticmethod
+    def write_scans(scans: Iterable[Scan], fileobj: BinaryIO):
+        """Пишет сканы в Excel в режиме write-only (память не растет со строками)"""
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("История сканирований")
+
+        rows = (ExcelExporter.scan_to_row(scan) for scan in scans)
+        sample = list(islice(rows, ExcelExporter.WIDTH_SAMPLE_ROWS))
 
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
+        # Автоширина колонок по выборке строк (задается до записи данных)
+        for col, header in enumerate(ExcelExporter.HEADERS, 1):
+            max_length = max([len(header)] + [len(str(row[col - 1])) for row in sample])
+            ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 50)
+
+        # Заголовки
+        header_cells = []
+        for header in ExcelExporter.HEADERS:
+            cell = WriteOnlyCell(ws, value=header)
             cell.font = Font(bold=True)
             cell.alignment = Alignment(horizontal="center")
+            header_cells.append(cell)
+        ws.append(header_cells)
 
         # Данные
-        for row, scan in enumerate(scans, 2):
-            ws.cell(row=row, column=1, value=scan.id)
-            ws.cell(row=row, column=2, value=scan.qr_data)
-            ws.cell(row=row, column=3, value=scan.scan_type)
-            ws.cell(
-                row=row, column=4, value=scan.scanned_at.strftime("%Y-%m-%d %H:%M:%S")
-            )
-            ws.cell(row=row, column=5, value="Да" if scan.printed else "Нет")
-            ws.cell(
-                row=row,
-                column=6,
-                value=(
-                    scan.printed_at.strftime("%Y-%m-%d %H:%M:%S")
-                    if scan.printed_at
-                    else ""
-                ),
-            )
-            ws.cell(row=row, column=7, value=scan.printer_id or "")
+        for row in chain(sample, rows):
+            ws.append(row)
 
-        # Автоширина колонок
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Сохраняем в bytes
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        return buffer.getvalue()
+        wb.save(fileobj)
@@ -0,0 +1,69 @@
+import csv
+import io
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator
+from app.models.scan import Scan
+from app.utils.excel_export import ExcelExporter
+
+
+class CsvExporter:
+    @staticmethod
+    def iter_scans(
+        scans: Iterable[Scan], rows_per_chunk: int = 1000
+    ) -> Iterator[bytes]:
+        """Отдает CSV по частям, не собирая файл целиком"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        # BOM, чтобы Excel правильно открыл кириллицу
+        buffer.write("﻿")
+        writer.writerow(ExcelExporter.HEADERS)
+
+        rows = (ExcelExporter.scan_to_row(scan) for scan in scans)
+        while True:
+            writer.writerows(islice(rows, rows_per_chunk))
+            chunk = buffer.getvalue()
+            if not chunk:
+                break
+            yield chunk.encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+
+class ParquetExporter:
+    COLUMNS = [
+        "id",
+        "qr_data",
+        "scan_type",
+        "scanned_at",
+        "printed",
+        "printed_at",
+        "printer_id",
+    ]
+
+    @staticmethod
+    def write_scans(scans: Iterable[Scan], fileobj: BinaryIO, batch_size: int = 10000):
+        """Пишет сканы в Parquet группами строк"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema(
+            [
+                ("id", pa.int64()),
+                ("qr_data", pa.string()),
+                ("scan_type", pa.string()),
+                ("scanned_at", pa.timestamp("us", tz="UTC")),
+                ("printed", pa.bool_()),
+                ("printed_at", pa.timestamp("us", tz="UTC")),
+                ("printer_id", pa.string()),
+            ]
+        )
+
+        scans = iter(scans)
+        with pq.ParquetWriter(fileobj, schema, compression="zstd") as writer:
+            while batch := list(islice(scans, batch_size)):
+                columns = {
+                    name: [getattr(scan, name) for scan in batch]
+                    for name in ParquetExporter.COLUMNS
+                }
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
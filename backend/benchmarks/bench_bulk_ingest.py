@@ -0,0 +1,57 @@
+"""Пропускная способность загрузки: по одному скану против пакета.
+
+Одиночный путь - crud.create_scan (INSERT + COMMIT + REFRESH на скан),
+пакетный - crud.bulk_create_scans (многострочный INSERT в одной транзакции
+с ключами идемпотентности).
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_bulk_ingest \\
+        --count 20000 --batch 1000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from app.crud import scan_async as crud_scan
+from app.database import AsyncSessionLocal, Base, engine
+from app.schemas.scan import BulkScanItem, ScanCreate
+
+
+async def single(count: int):
+    async with AsyncSessionLocal() as db:
+        for i in range(count):
+            await crud_scan.create_scan(db, ScanCreate(qr_data=f"SINGLE-{i}"))
+
+
+async def bulk(count: int, batch: int):
+    run = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        for start in range(0, count, batch):
+            items = [
+                BulkScanItem(qr_data=f"BULK-{i}", idempotency_key=f"{run}-{i}")
+                for i in range(start, min(start + batch, count))
+            ]
+            await crud_scan.bulk_create_scans(db, items)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    runs = (
+        ("одиночные INSERT", single(args.count)),
+        (f"пакеты по {args.batch}", bulk(args.count, args.batch)),
+    )
+    for name, run in runs:
+        started = time.perf_counter()
+        await run
+        elapsed = time.perf_counter() - started
+        print(f"{name:<20} {args.count / elapsed:>10.0f} сканов/сек")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
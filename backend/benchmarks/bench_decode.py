@@ -0,0 +1,111 @@
+"""Бенчмарк каскадного декодера QR на синтетических кадрах.
+
+Кадры строятся из QRService.generate_qr_code: код разного размера
+вклеивается в шумный кадр 1920x1080, затем размывается и поворачивается.
+Для каждой группы выводится доля распознанных кадров и время на кадр
+для однопроходного декодера (полное разрешение, как было раньше) и для
+каскада, а также на каком проходе каскад нашел код.
+
+    python -m benchmarks.bench_decode --repeat 3
+"""
+
+import argparse
+import itertools
+import time
+from collections import Counter, defaultdict
+
+import cv2
+import numpy as np
+from pyzbar.pyzbar import decode
+
+from app.services.qr_service import QRService
+
+FRAME_SIZE = (1080, 1920)
+BOX_SIZES = [2, 4, 8]
+BLURS = [0, 5, 9]
+ROTATIONS = [0, 20, 45]
+
+
+def make_frame(data: str, box_size: int, blur: int, angle: int, seed: int):
+    """Строит кадр с QR кодом, возвращает (jpeg, roi)"""
+    rng = np.random.default_rng(seed)
+    png = QRService.generate_qr_code(data, box_size)
+    code = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+    frame = rng.integers(90, 170, FRAME_SIZE, dtype=np.uint8)
+    h, w = code.shape
+    y = int(rng.integers(0, FRAME_SIZE[0] - h))
+    x = int(rng.integers(0, FRAME_SIZE[1] - w))
+    frame[y : y + h, x : x + w] = code
+
+    if angle:
+        center = (x + w / 2, y + h / 2)
+        matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+        frame = cv2.warpAffine(frame, matrix, frame.shape[::-1], borderValue=128)
+    if blur:
+        frame = cv2.GaussianBlur(frame, (blur, blur), 0)
+
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    margin = max(h, w) // 2
+    roi = (max(x - margin, 0), max(y - margin, 0), w + 2 * margin, h + 2 * margin)
+    return encoded.tobytes(), roi
+
+
+def legacy_decode(image_data: bytes):
+    """Прежний декодер: один проход pyzbar по полному кадру"""
+    img = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    return [obj.data.decode("utf-8") for obj in decode(img)]
+
+
+def cascade_stage(image_data: bytes, roi=None):
+    """Каскад: возвращает (символы, название прохода)"""
+    img = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    for name, stage in QRService.decode_stages(img, roi):
+        found = stage()
+        if found:
+            return found, name
+    return [], "miss"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="кадров на группу")
+    args = parser.parse_args()
+
+    totals = defaultdict(lambda: {"hits": 0, "frames": 0, "seconds": 0.0})
+    stages = Counter()
+
+    for box_size, blur, angle in itertools.product(BOX_SIZES, BLURS, ROTATIONS):
+        group = f"box={box_size} blur={blur} rot={angle}"
+        for seed in range(args.repeat):
+            data = f"PARCEL-{box_size}-{blur}-{angle}-{seed:04d}"
+            frame, roi = make_frame(data, box_size, blur, angle, seed)
+
+            runs = {
+                "legacy": lambda: legacy_decode(frame),
+                "cascade": lambda: cascade_stage(frame)[0],
+                "cascade+roi": lambda: cascade_stage(frame, roi)[0],
+            }
+            for name, run in runs.items():
+                started = time.perf_counter()
+                found = run()
+                elapsed = time.perf_counter() - started
+                for key in (name, f"{name} | {group}"):
+                    totals[key]["frames"] += 1
+                    totals[key]["hits"] += data in found
+                    totals[key]["seconds"] += elapsed
+
+            stages[cascade_stage(frame)[1]] += 1
+
+    print(f"{'decoder':<45} {'hit rate':>9} {'ms/frame':>9}")
+    for key in sorted(totals, key=lambda k: ("|" in k, k)):
+        result = totals[key]
+        hit_rate = result["hits"] / result["frames"]
+        ms = result["seconds"] / result["frames"] * 1000
+        print(f"{key:<45} {hit_rate:>9.0%} {ms:>9.1f}")
+
+    print("\nпроход каскада, нашедший код:", dict(stages))
+
+
+if __name__ == "__main__":
+    main()
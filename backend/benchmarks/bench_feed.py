@@ -0,0 +1,72 @@
+"""Рассылка ленты сканов: сравнение опроса и push через брокер.
+
+Опрос - каждый дашборд раз в интервал запрашивает последние сканы
+(ORDER BY по всей таблице); push - скан публикуется один раз и
+раздается подписчикам брокера.
+
+    python -m benchmarks.bench_feed --clients 100 --scans 2000
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.crud import scan_async as crud_scan
+from app.database import AsyncSessionLocal
+from app.services.broker import LocalBroker
+
+
+async def bench_polling(clients: int, polls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(polls):
+        async with AsyncSessionLocal() as db:
+            await crud_scan.get_scans(db, skip=0, limit=5)
+    per_poll = (time.perf_counter() - started) / polls
+    return per_poll * clients
+
+
+async def bench_push(clients: int, scans: int) -> float:
+    broker = LocalBroker()
+    subscriptions = [
+        broker.subscribe("scans", maxsize=scans + 1) for _ in range(clients)
+    ]
+
+    async def consume(subscription):
+        for _ in range(scans):
+            await subscription.get()
+
+    consumers = [asyncio.create_task(consume(s)) for s in subscriptions]
+    message = {"type": "scan", "scan": {"id": 1, "qr_data": "PARCEL-00000001"}}
+
+    started = time.perf_counter()
+    for _ in range(scans):
+        broker.publish("scans", message)
+        await asyncio.sleep(0)
+    await asyncio.gather(*consumers)
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--scans", type=int, default=2000)
+    parser.add_argument("--polls", type=int, default=50)
+    args = parser.parse_args()
+
+    poll_cost = await bench_polling(args.clients, args.polls)
+    print(
+        f"опрос: {poll_cost * 1000:.1f} мс работы базы на один цикл опроса "
+        f"{args.clients} дашбордов"
+    )
+
+    elapsed = await bench_push(args.clients, args.scans)
+    deliveries = args.clients * args.scans
+    print(
+        f"push: {args.scans} сканов x {args.clients} подписчиков за {elapsed:.2f} с "
+        f"({deliveries / elapsed:.0f} доставок/с, "
+        f"{elapsed / args.scans * 1e6:.0f} мкс на скан)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
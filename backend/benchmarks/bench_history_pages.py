@@ -0,0 +1,100 @@
+"""Задержка страниц истории: OFFSET против keyset-курсора.
+
+Засевает таблицу scans до --rows строк (generate_series, только PostgreSQL)
+и замеряет время страницы на разной глубине для crud.get_scans (OFFSET)
+и crud.get_scans_page (keyset по scanned_at, id).
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_history_pages \\
+        --rows 10000000 --depths 0 1000 100000 1000000 5000000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import desc, func, select, text
+
+from app.crud import scan_async as crud_scan
+from app.database import AsyncSessionLocal, Base, engine
+from app.models.scan import Scan
+
+SEED_SQL = text("""
+    INSERT INTO scans (qr_data, scan_type, scanned_at, printed, printer_id)
+    SELECT
+        'BENCH-' || g,
+        CASE WHEN g % 3 = 0 THEN 'scanner' ELSE 'camera' END,
+        now() - (g || ' seconds')::interval,
+        g % 2 = 0,
+        'printer-' || (g % 10)
+    FROM generate_series(:start, :stop) AS g
+    """)
+
+
+def seed(rows: int, batch: int = 1_000_000):
+    """Дозаполняет таблицу до нужного числа строк"""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(Scan)).scalar()
+    for start in range(existing + 1, rows + 1, batch):
+        with engine.begin() as conn:
+            conn.execute(
+                SEED_SQL, {"start": start, "stop": min(start + batch - 1, rows)}
+            )
+        print(f"засеяно {min(start + batch - 1, rows)} строк")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE scans"))
+
+
+async def timed(coro_factory, repeat: int) -> float:
+    """Медиана времени выполнения в мс"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def run(depths, limit: int, repeat: int):
+    async with AsyncSessionLocal() as db:
+        for depth in depths:
+            # Позиция курсора на нужной глубине (не входит в замер)
+            row = (
+                await db.execute(
+                    select(Scan.scanned_at, Scan.id)
+                    .order_by(desc(Scan.scanned_at), desc(Scan.id))
+                    .offset(depth)
+                    .limit(1)
+                )
+            ).first()
+            after = tuple(row) if depth and row else None
+
+            offset_ms = await timed(
+                lambda: crud_scan.get_scans(db, skip=depth, limit=limit), repeat
+            )
+            keyset_ms = await timed(
+                lambda: crud_scan.get_scans_page(db, limit=limit, after=after), repeat
+            )
+            print(
+                f"глубина {depth:>10}: OFFSET {offset_ms:>9.2f} мс, "
+                f"keyset {keyset_ms:>7.2f} мс"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument(
+        "--depths", type=int, nargs="+", default=[0, 1000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    asyncio.run(run(args.depths, args.limit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Байты и сообщения на этикетку: JSON с base64 PNG против бинарных кадров.
+
+Поднимает бэкенд в этом процессе, для каждого варианта протокола ставит
+--jobs заданий отдельному клиенту, подключает его и подтверждает пачки,
+пока не получит все. Размер после permessage-deflate считается тем же
+zlib-потоком с общим контекстом, что использует расширение, и видно,
+договорились ли о нем клиент и сервер.
+
+    python -m benchmarks.bench_print_protocol --jobs 500
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+import zlib
+
+import httpx
+import uvicorn
+import websockets
+
+from app.main import app
+from app.services.print_protocol import decode_frame
+
+PORT = 8798
+BASE = f"http://127.0.0.1:{PORT}/api/v1"
+VARIANTS = [
+    ("json", {}),
+    ("binary png", {"protocol": "binary", "format": "png"}),
+    ("binary matrix", {"protocol": "binary", "format": "matrix"}),
+    ("binary data", {"protocol": "binary", "format": "data"}),
+]
+
+
+async def receive_jobs(client_id: str, params: dict, jobs: int) -> dict:
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+    uri = f"ws://127.0.0.1:{PORT}/api/v1/printers/ws/print/{client_id}?{query}"
+    # Тот же поток, что у permessage-deflate с переиспользованием контекста
+    deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    stats = {"messages": 0, "bytes": 0, "deflated": 0, "received": 0}
+
+    async with websockets.connect(uri, max_size=None) as ws:
+        extensions = [ext.name for ext in ws.protocol.extensions]
+        started = time.perf_counter()
+        while stats["received"] < jobs:
+            raw = await ws.recv()
+            data = raw if isinstance(raw, bytes) else raw.encode("utf-8")
+            if isinstance(raw, str) and json.loads(raw).get("type") != "print":
+                continue
+            stats["messages"] += 1
+            stats["bytes"] += len(data)
+            stats["deflated"] += (
+                len(deflate.compress(data)) + len(deflate.flush(zlib.Z_SYNC_FLUSH)) - 4
+            )
+
+            if isinstance(raw, bytes):
+                job_ids = [job["job_id"] for job in decode_frame(raw)]
+            else:
+                job_ids = [json.loads(raw)["job_id"]]
+            stats["received"] += len(job_ids)
+            await ws.send(json.dumps({"type": "ack", "job_ids": job_ids}))
+        stats["elapsed"] = time.perf_counter() - started
+
+    stats["extensions"] = extensions
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=500)
+    args = parser.parse_args()
+
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(base_url=BASE, timeout=30) as http:
+        for name, params in VARIANTS:
+            client_id = f"bench-{name.replace(' ', '-')}-{uuid.uuid4().hex[:8]}"
+            semaphore = asyncio.Semaphore(32)
+
+            async def enqueue(i: int):
+                async with semaphore:
+                    response = await http.post(
+                        "/printers/print/",
+                        json={
+                            "qr_data": f"PARCEL-{uuid.uuid4().hex[:12]}-{i:06d}",
+                            "printer_id": "label",
+                            "client_id": client_id,
+                        },
+                    )
+                    response.raise_for_status()
+
+            # Очередь копится до подключения - как после простоя принтера
+            await asyncio.gather(*[enqueue(i) for i in range(args.jobs)])
+            stats = await receive_jobs(client_id, params, args.jobs)
+
+            jobs = stats["received"]
+            print(
+                f"{name:14} сообщений/этикетку {stats['messages'] / jobs:.3f}, "
+                f"байт/этикетку {stats['bytes'] / jobs:7.1f}, "
+                f"после deflate {stats['deflated'] / jobs:6.1f}, "
+                f"{jobs / stats['elapsed']:.0f} этикеток/с, "
+                f"расширения: {', '.join(stats['extensions']) or 'нет'}"
+            )
+
+    server.should_exit = True
+    thread.join()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Пропускная способность очереди печати с множеством клиентов.
+
+Поднимает бэкенд в этом процессе, подключает поддельных клиентов печати
+по /printers/ws/print/{client_id}, ставит задания через /printers/print/
+и ждет, пока все они будут подтверждены. Часть подтверждений - failed,
+чтобы проверить повторы.
+
+    python -m benchmarks.bench_print_queue --clients 50 --jobs 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+# Короткие задержки повтора, чтобы замер не ждал backoff
+os.environ.setdefault("PRINT_RETRY_BASE", "0.05")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+PORT = 8799
+BASE = f"http://127.0.0.1:{PORT}/api/v1"
+
+
+async def fake_printer(client_id: str, fail_rate: float, received: list):
+    uri = f"ws://127.0.0.1:{PORT}/api/v1/printers/ws/print/{client_id}"
+    async with websockets.connect(uri) as ws:
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") != "print":
+                    continue
+                received.append(message["job_id"])
+                status = "failed" if random.random() < fail_rate else "done"
+                await ws.send(
+                    json.dumps(
+                        {"type": "ack", "job_id": message["job_id"], "status": status}
+                    )
+                )
+        except asyncio.CancelledError:
+            pass
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--fail-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    clients = [f"bench-printer-{i}" for i in range(args.clients)]
+    received = []
+    printers = [
+        asyncio.create_task(fake_printer(client_id, args.fail_rate, received))
+        for client_id in clients
+    ]
+
+    async with httpx.AsyncClient(base_url=BASE, timeout=30) as http:
+        before = (await http.get("/printers/jobs/stats")).json()["jobs"].get("done", 0)
+
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(64)
+
+        async def enqueue(i: int):
+            async with semaphore:
+                response = await http.post(
+                    "/printers/print/",
+                    json={
+                        "qr_data": f"PARCEL-{i:08d}",
+                        "printer_id": "label",
+                        "client_id": clients[i % len(clients)],
+                    },
+                )
+                response.raise_for_status()
+
+        await asyncio.gather(*[enqueue(i) for i in range(args.jobs)])
+        enqueued = time.perf_counter() - started
+
+        while True:
+            stats = (await http.get("/printers/jobs/stats")).json()
+            done = stats["jobs"].get("done", 0) - before
+            if done >= args.jobs or time.perf_counter() - started > 300:
+                break
+            await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+
+    for printer in printers:
+        printer.cancel()
+    await asyncio.gather(*printers, return_exceptions=True)
+    server.should_exit = True
+    thread.join()
+
+    print(
+        f"{args.clients} клиентов: {args.jobs} заданий поставлено за {enqueued:.2f} с, "
+        f"подтверждено {done} за {elapsed:.2f} с ({done / elapsed:.0f} заданий/с), "
+        f"доставок с повторами: {len(received)}, статусы: {stats['jobs']}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
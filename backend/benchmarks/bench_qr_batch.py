@@ -0,0 +1,46 @@
+"""Скорость генерации QR: по одному через PIL против пакетного NumPy.
+
+python -m benchmarks.bench_qr_batch --count 1000 --size 10
+"""
+
+import argparse
+import time
+
+from app.services.qr_batch_service import QRBatchService
+from app.services.qr_cache import QRCodeKey
+from app.services.qr_service import QRService
+from app.config import settings
+
+
+def per_call(payloads, size):
+    """Прежний путь: отдельная PIL-картинка и PNG на каждый код, без кэша"""
+    for data in payloads:
+        QRService.render_qr_code(
+            QRCodeKey(data, size, settings.QR_CODE_VERSION, 1, settings.QR_CODE_BORDER)
+        )
+
+
+def batch(payloads, size):
+    """Пакетный путь: матрицы модулей, NumPy и PNG через OpenCV"""
+    for image in QRBatchService.render_many(payloads, size):
+        QRBatchService.encode_png(image)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=10)
+    args = parser.parse_args()
+
+    payloads = [f"SKU-{i:08d}" for i in range(args.count)]
+    for name, run in (("per-call PIL", per_call), ("batch NumPy", batch)):
+        started = time.perf_counter()
+        run(payloads, args.size)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<14} {args.count / elapsed:>10.0f} кодов/сек")
+
+    QRBatchService.shutdown()
+
+
+if __name__ == "__main__":
+    main()
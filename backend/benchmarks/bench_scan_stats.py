@@ -0,0 +1,166 @@
+"""Статистика для дашбордов: счетчики scan_rollups против подсчета по scans.
+
+Дозасевает таблицу scans до --rows строк, равномерно за последние
+--days дней (PostgreSQL - generate_series, SQLite - рекурсивный CTE;
+счетчики при этом ведут триггеры), и для типовых запросов дашборда
+сравнивает crud.get_scan_stats с GROUP BY по самим сканам.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_scan_stats --rows 10000000
+    DATABASE_URL=sqlite:///./stats.sqlite python -m benchmarks.bench_scan_stats \\
+        --rows 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, text
+
+from app.crud import scan_rollup as crud_scan_rollup
+from app.database import AsyncSessionLocal, Base, engine
+from app.models.scan import Scan
+from benchmarks.results import write_results
+
+SEED_SQL = {
+    "postgresql": text("""
+        INSERT INTO scans (qr_data, scan_type, scanned_at, printed, printer_id)
+        SELECT
+            'STATS-' || g,
+            CASE WHEN g % 3 = 0 THEN 'scanner' ELSE 'camera' END,
+            now() - (g * :step) * interval '1 second',
+            g % 2 = 0,
+            'printer-' || (g % 10)
+        FROM generate_series(:start, :stop) AS g
+        """),
+    "sqlite": text("""
+        WITH RECURSIVE g(n) AS (
+            SELECT :start UNION ALL SELECT n + 1 FROM g WHERE n < :stop
+        )
+        INSERT INTO scans (qr_data, scan_type, scanned_at, printed, printer_id)
+        SELECT
+            'STATS-' || n,
+            CASE WHEN n % 3 = 0 THEN 'scanner' ELSE 'camera' END,
+            strftime('%Y-%m-%d %H:%M:%f000', 'now', '-' || (n * :step) || ' seconds'),
+            n % 2 = 0,
+            'printer-' || (n % 10)
+        FROM g
+        """),
+}
+
+# Тот же результат, посчитанный по строкам scans
+RAW_BUCKETS = {
+    "postgresql": "date_trunc('{granularity}', scanned_at, 'UTC')",
+    "sqlite": "substr(scanned_at, 1, {length})",
+}
+SQLITE_BUCKET_LENGTHS = {"minute": 16, "hour": 13, "day": 10}
+
+# (название, интервал, период, группировка)
+QUERIES = [
+    ("minute_1h", "minute", timedelta(hours=1), ()),
+    ("hour_24h", "hour", timedelta(days=1), ()),
+    ("hour_7d_printer", "hour", timedelta(days=7), ("printer_id",)),
+    ("day_30d_type", "day", timedelta(days=30), ("scan_type",)),
+]
+
+
+def seed(rows: int, days: float, batch: int = 1_000_000):
+    """Дозаполняет таблицу до нужного числа строк"""
+    Base.metadata.create_all(bind=engine)
+    seed_sql = SEED_SQL[engine.dialect.name]
+    step = days * 86400 / rows
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(Scan)).scalar()
+    for start in range(existing + 1, rows + 1, batch):
+        stop = min(start + batch - 1, rows)
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(seed_sql, {"start": start, "stop": stop, "step": step})
+        print(
+            f"засеяно {stop} строк "
+            f"({(stop - start + 1) / (time.perf_counter() - started):.0f} строк/с)"
+        )
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def raw_query(granularity: str, group_by) -> str:
+    dialect = engine.dialect.name
+    bucket = RAW_BUCKETS[dialect].format(
+        granularity=granularity, length=SQLITE_BUCKET_LENGTHS[granularity]
+    )
+    columns = "".join(f", {name}" for name in group_by)
+    return (
+        f"SELECT {bucket} AS bucket{columns}, count(*), "
+        "sum(CASE WHEN printed THEN 1 ELSE 0 END) FROM scans "
+        "WHERE scanned_at >= :start AND scanned_at < :end "
+        f"GROUP BY bucket{columns}"
+    )
+
+
+async def timed(coro_factory, repeat: int) -> float:
+    """Медиана времени выполнения в мс"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def run(repeat: int) -> dict:
+    metrics = {}
+    end = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        for name, granularity, period, group_by in QUERIES:
+            start = end - period
+            params = {"start": start, "end": end}
+            if engine.dialect.name == "sqlite":
+                # Строки в формате хранения SQLite
+                params = {
+                    key: value.strftime("%Y-%m-%d %H:%M:%S")
+                    for key, value in params.items()
+                }
+            raw = text(raw_query(granularity, group_by))
+
+            buckets = await crud_scan_rollup.get_scan_stats(
+                db, granularity, start, end, group_by=group_by
+            )
+            rollup_ms = await timed(
+                lambda: crud_scan_rollup.get_scan_stats(
+                    db, granularity, start, end, group_by=group_by
+                ),
+                repeat,
+            )
+            raw_ms = await timed(lambda: db.execute(raw, params), repeat)
+
+            metrics[f"{name}.rollup_ms"] = round(rollup_ms, 3)
+            metrics[f"{name}.raw_ms"] = round(raw_ms, 3)
+            metrics[f"{name}.buckets"] = len(buckets)
+            print(
+                f"{name:>16}: {len(buckets):>5} интервалов, "
+                f"scan_rollups {rollup_ms:8.2f} мс, по scans {raw_ms:9.2f} мс"
+            )
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="файл результатов (по умолчанию results/)")
+    args = parser.parse_args()
+
+    seed(args.rows, args.days)
+    metrics = asyncio.run(run(args.repeat))
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    path = write_results("scan_stats", metrics, params=params, path=args.output)
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+    print(f"Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
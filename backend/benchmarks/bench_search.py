@@ -0,0 +1,132 @@
+"""Задержка поиска по qr_data: exact, prefix и substring.
+
+Дозасевает таблицу scans до --rows кодов посылок вида
+PKG0001234567-9e3779b1 (PostgreSQL - generate_series, SQLite -
+рекурсивный CTE) и замеряет crud.search_scans на случайных кодах:
+точное совпадение, префикс на 10 кодов и подстрока из хеш-части.
+Цель - единицы миллисекунд на 10M строк; индексы создаются моделью
+(pg_trgm - если расширение доступно, в SQLite - FTS5).
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_search --rows 10000000
+    DATABASE_URL=sqlite:///./search.sqlite python -m benchmarks.bench_search \\
+        --rows 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import func, select, text
+
+from app.crud import scan_async as crud_scan
+from app.database import AsyncSessionLocal, Base, engine
+from app.models.scan import Scan
+from benchmarks.load_scans import percentile
+from benchmarks.results import write_results
+
+# Хеш-часть кода (мультипликативный хеш Кнута) считается одинаково
+# в SQL обеих баз и в Python
+HASH_MULTIPLIER = 2654435761
+SEED_SQL = {
+    "postgresql": text("""
+        INSERT INTO scans (qr_data, scan_type, scanned_at, printed)
+        SELECT
+            'PKG' || lpad(g::text, 10, '0') || '-'
+                || lpad(to_hex((g * 2654435761) % 4294967296), 8, '0'),
+            'scanner',
+            now() - (g || ' seconds')::interval,
+            false
+        FROM generate_series(:start, :stop) AS g
+        """),
+    "sqlite": text("""
+        WITH RECURSIVE g(n) AS (
+            SELECT :start UNION ALL SELECT n + 1 FROM g WHERE n < :stop
+        )
+        INSERT INTO scans (qr_data, scan_type, scanned_at, printed)
+        SELECT
+            printf('PKG%010d-%08x', n, (n * 2654435761) % 4294967296),
+            'scanner',
+            strftime('%Y-%m-%d %H:%M:%f000', 'now', '-' || n || ' seconds'),
+            0
+        FROM g
+        """),
+}
+
+
+def code(n: int) -> str:
+    return f"PKG{n:010d}-{n * HASH_MULTIPLIER % 2**32:08x}"
+
+
+def seed(rows: int, batch: int = 1_000_000) -> int:
+    """Дозаполняет таблицу кодами посылок, возвращает их число"""
+    Base.metadata.create_all(bind=engine)
+    seed_sql = SEED_SQL[engine.dialect.name]
+    with engine.begin() as conn:
+        existing = conn.execute(
+            select(func.count()).select_from(Scan).where(Scan.qr_data.like("PKG%"))
+        ).scalar()
+    for start in range(existing + 1, rows + 1, batch):
+        stop = min(start + batch - 1, rows)
+        with engine.begin() as conn:
+            conn.execute(seed_sql, {"start": start, "stop": stop})
+        print(f"засеяно {stop} кодов")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return max(existing, rows)
+
+
+def queries(mode: str, total: int, count: int):
+    for _ in range(count):
+        n = random.randint(1, total)
+        if mode == "exact":
+            yield code(n)
+        elif mode == "prefix":
+            yield code(n)[:12]  # без последней цифры номера: до 10 кодов
+        else:
+            yield code(n)[-8:]
+
+
+async def run(total: int, count: int, limit: int) -> dict:
+    metrics = {}
+    async with AsyncSessionLocal() as db:
+        for mode in ("exact", "prefix", "substring"):
+            samples, found = [], 0
+            for query in queries(mode, total, count):
+                started = time.perf_counter()
+                scans, _ = await crud_scan.search_scans(
+                    db, query, mode=mode, limit=limit
+                )
+                samples.append(time.perf_counter() - started)
+                found += len(scans)
+            samples.sort()
+            for pct in (50, 95, 99):
+                metrics[f"{mode}.p{pct}_ms"] = round(percentile(samples, pct) * 1000, 3)
+            metrics[f"{mode}.rows_per_query"] = round(found / count, 2)
+            print(
+                f"{mode:>9}: p50 {metrics[f'{mode}.p50_ms']:7.3f} мс, "
+                f"p99 {metrics[f'{mode}.p99_ms']:7.3f} мс, "
+                f"найдено в среднем {metrics[f'{mode}.rows_per_query']}"
+            )
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--output", help="файл результатов (по умолчанию results/)")
+    args = parser.parse_args()
+
+    total = seed(args.rows)
+    metrics = asyncio.run(run(total, args.queries, args.limit))
+    params = {"rows": total, "queries": args.queries, "limit": args.limit}
+    path = write_results("search", metrics, params=params, path=args.output)
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+    print(f"Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Сравнение загрузки кадров: JSON/base64 против бинарного тела.
+
+Отправляет одни и те же кадры на /scans/scan-from-image/ (JSON с base64)
+и /scans/scan-from-image/raw/ (application/octet-stream) и выводит
+размер тела запроса и процессорное время сервера на кадр. CPU сервера
+берется из /proc/<pid>/stat, поэтому бенчмарк запускается на той же
+машине, что и uvicorn (лучше с UPLOAD_STORE_POLICY=never).
+
+    python -m benchmarks.bench_upload --server-pid $(pgrep -f uvicorn) --frames 200
+
+Требует httpx.
+"""
+
+import argparse
+import base64
+import os
+import time
+
+import httpx
+
+from benchmarks.bench_decode import make_frame
+
+
+def server_cpu_seconds(pid: int) -> float:
+    """utime + stime процесса в секундах"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def run(client: httpx.Client, name: str, frames, send, pid: int) -> dict:
+    """Прогоняет кадры одним способом"""
+    payload_bytes = 0
+    cpu_before = server_cpu_seconds(pid)
+    started = time.perf_counter()
+
+    for frame in frames:
+        request = send(frame)
+        payload_bytes += len(request.content)
+        response = client.send(request)
+        response.raise_for_status()
+
+    elapsed = time.perf_counter() - started
+    cpu = server_cpu_seconds(pid) - cpu_before
+    return {
+        "mode": name,
+        "payload_kb_per_frame": round(payload_bytes / len(frames) / 1024, 1),
+        "server_cpu_ms_per_frame": round(cpu / len(frames) * 1000, 2),
+        "wall_ms_per_frame": round(elapsed / len(frames) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--server-pid", type=int, required=True)
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    frames = [make_frame(f"UPLOAD-{i:05d}", 6, 0, 0, i)[0] for i in range(args.frames)]
+    url = f"{args.base_url}/api/v1/scans"
+
+    with httpx.Client(timeout=60) as client:
+        modes = {
+            "json/base64": lambda frame: client.build_request(
+                "POST",
+                f"{url}/scan-from-image/",
+                json={"image_data": base64.b64encode(frame).decode("ascii")},
+            ),
+            "binary": lambda frame: client.build_request(
+                "POST",
+                f"{url}/scan-from-image/raw/",
+                content=frame,
+                headers={"Content-Type": "application/octet-stream"},
+            ),
+        }
+        for name, send in modes.items():
+            print(run(client, name, frames, send, args.server_pid))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Проверка реестра устройств на поддельном каталоге /dev.
+
+Узлы устройств - символические ссылки на pty, так что читатели сканеров
+открывают их как настоящие порты. Скрипт подключает и отключает
+"сканер", замеряет задержку обнаружения и стоимость запроса списка
+портов до (comports() на каждый вызов) и после (кэш реестра).
+
+    python -m benchmarks.check_device_registry
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from app.config import settings
+from app.services.device_registry import DeviceInfo, device_registry, list_comports
+from app.services.scanner_service import ScannerService, scanner_manager
+from benchmarks.fake_scanner import FakeScanner
+
+SCANNER_VID, SCANNER_PID = 0x1EAB, 0x1A03
+
+
+def fake_enumerate(dev_dir: str):
+    def enumerate():
+        devices = []
+        for name in sorted(os.listdir(dev_dir)):
+            if name.startswith("ttyACM"):
+                devices.append(
+                    DeviceInfo(
+                        device=os.path.join(dev_dir, name),
+                        vid=SCANNER_VID,
+                        pid=SCANNER_PID,
+                        description="USB Barcode Scanner",
+                    )
+                )
+            elif name.startswith("ttyS"):
+                devices.append(
+                    DeviceInfo(device=os.path.join(dev_dir, name), description="n/a")
+                )
+        return devices
+
+    return enumerate
+
+
+async def wait_for(predicate, timeout: float = 5.0) -> float:
+    started = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - started
+
+
+def time_calls(func, count: int = 200) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def main():
+    settings.SCANNER_WATCH_INTERVAL = 0.05
+    settings.SCANNER_PORTS = "auto"
+
+    with tempfile.TemporaryDirectory() as dev_dir:
+        os.symlink("/dev/null", os.path.join(dev_dir, "ttyS0"))
+        device_registry.dev_dir = dev_dir
+        device_registry.enumerate = fake_enumerate(dev_dir)
+        device_registry.usb_ids = {(SCANNER_VID, SCANNER_PID)}
+
+        await device_registry.start()
+        await scanner_manager.start()
+        assert not scanner_manager.readers, "ttyS0 не сканер"
+
+        scanner = FakeScanner()
+        node = os.path.join(dev_dir, "ttyACM0")
+        os.symlink(scanner.port, node)
+        latency = await wait_for(
+            lambda: node in scanner_manager.readers
+            and scanner_manager.readers[node].connected
+        )
+        print(f"подключение обнаружено и порт открыт за {latency * 1000:.0f} мс")
+
+        os.remove(node)
+        latency = await wait_for(lambda: node not in scanner_manager.readers)
+        print(f"отключение обнаружено за {latency * 1000:.0f} мс")
+
+        print(f"find_scanner после отключения: {ScannerService.find_scanner()}")
+        print(
+            f"список портов: comports() {time_calls(list_comports):.0f} мкс, "
+            f"реестр {time_calls(ScannerService.get_available_ports):.1f} мкс"
+        )
+
+        await scanner_manager.stop()
+        await device_registry.stop()
+        scanner.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
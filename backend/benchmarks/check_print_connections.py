@@ -0,0 +1,212 @@
+"""Проверка heartbeat и backpressure клиентов печати на зависших сокетах.
+
+Поднимает бэкенд в этом процессе с короткими таймаутами и подключает
+клиентов:
+
+- живой (heartbeat=1): отвечает на ping и подтверждает задания - должен
+  остаться подключенным, в статистике появляется RTT;
+- старый (без heartbeat): JSON ping не получает и ничего, кроме
+  подтверждений, не шлет - должен остаться подключенным, на ping
+  WebSocket его библиотека отвечает сама;
+- молчащий (как полуоткрытое соединение): после рукопожатия ничего не
+  читает и не пишет - с heartbeat=1 должен быть закрыт по
+  PRINT_IDLE_TIMEOUT, без него - по таймауту ping WebSocket в uvicorn;
+- не читающий: шлет pong, но не забирает данные из сокета - должен быть
+  закрыт по PRINT_SEND_TIMEOUT, когда заполнятся буферы.
+
+Неподтвержденные задания закрытых клиентов должны вернуться в очередь.
+
+    python -m benchmarks.check_print_connections
+"""
+
+import asyncio
+import base64
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+os.environ.setdefault("PRINT_PING_INTERVAL", "0.2")
+os.environ.setdefault("PRINT_IDLE_TIMEOUT", "1.0")
+os.environ.setdefault("PRINT_SEND_TIMEOUT", "1.0")
+os.environ.setdefault("PRINT_SEND_QUEUE_SIZE", "4")
+# Без подтверждений окно не растет: не читающему клиенту данные льются
+# только повторами, поэтому повторы частые, а этикетки крупные
+os.environ.setdefault("PRINT_ACK_TIMEOUT", "0.5")
+os.environ.setdefault("PRINT_RETRY_BASE", "0.01")
+os.environ.setdefault("PRINT_MAX_ATTEMPTS", "1000")
+os.environ.setdefault("QR_CODE_SIZE", "40")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.services.print_service import print_service  # noqa: E402
+
+PORT = 8797
+BASE = f"http://127.0.0.1:{PORT}/api/v1"
+PATH = "/api/v1/printers/ws/print"
+
+
+def raw_connect(client_id: str, query: str = "", rcvbuf: int = 0) -> socket.socket:
+    """Рукопожатие WebSocket на голом сокете, дальше сокет не читается"""
+    sock = socket.socket()
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.connect(("127.0.0.1", PORT))
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall(
+        (
+            f"GET {PATH}/{client_id}?{query} HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{PORT}\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode()
+    )
+    response = b""
+    while b"\r\n\r\n" not in response:
+        response += sock.recv(1)
+    assert b" 101 " in response, response
+    return sock
+
+
+def raw_send_text(sock: socket.socket, text: str):
+    """Маскированный текстовый кадр клиента (до 125 байт)"""
+    payload = text.encode()
+    mask = os.urandom(4)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    sock.sendall(bytes([0x81, 0x80 | len(payload)]) + mask + masked)
+
+
+async def healthy_client(client_id: str, stop: asyncio.Event, query: str = ""):
+    uri = f"ws://127.0.0.1:{PORT}{PATH}/{client_id}?{query}"
+    async with websockets.connect(uri) as ws:
+        while not stop.is_set():
+            try:
+                message = json.loads(await asyncio.wait_for(ws.recv(), 0.1))
+            except asyncio.TimeoutError:
+                continue
+            if message["type"] == "ping":
+                await ws.send(json.dumps({"type": "pong", "ts": message["ts"]}))
+            elif message["type"] == "print":
+                await ws.send(json.dumps({"type": "ack", "job_id": message["job_id"]}))
+
+
+async def wait_unregistered(client_id: str, timeout: float) -> float:
+    started = time.monotonic()
+    while client_id in print_service.print_clients:
+        if time.monotonic() - started > timeout:
+            raise AssertionError(f"{client_id} не закрыт за {timeout} с")
+        await asyncio.sleep(0.05)
+    return time.monotonic() - started
+
+
+async def main():
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            port=PORT,
+            log_level="warning",
+            ws_ping_interval=0.5,
+            ws_ping_timeout=1.0,
+        )
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    suffix = uuid.uuid4().hex[:8]
+    healthy, legacy, silent, legacy_silent, stalled = (
+        f"healthy-{suffix}",
+        f"legacy-{suffix}",
+        f"silent-{suffix}",
+        f"legacy-silent-{suffix}",
+        f"stalled-{suffix}",
+    )
+    # Крупная этикетка, чтобы быстро заполнить буферы не читающего клиента
+    big_label = "LABEL-" + "X" * 2500
+
+    async with httpx.AsyncClient(base_url=BASE, timeout=30) as http:
+
+        async def enqueue(client_id: str, qr_data: str, count: int):
+            for _ in range(count):
+                response = await http.post(
+                    "/printers/print/",
+                    json={
+                        "qr_data": qr_data,
+                        "printer_id": "label",
+                        "client_id": client_id,
+                    },
+                )
+                response.raise_for_status()
+
+        stop = asyncio.Event()
+        healthy_task = asyncio.create_task(healthy_client(healthy, stop, "heartbeat=1"))
+        legacy_task = asyncio.create_task(healthy_client(legacy, stop))
+
+        # Молчащие клиенты получают задание и пропадают
+        silent_sock = await asyncio.to_thread(raw_connect, silent, "heartbeat=1")
+        await enqueue(silent, "SILENT-1", 1)
+        reaped = await wait_unregistered(silent, 5)
+        print(f"молчащий клиент закрыт через {reaped:.2f} с")
+        legacy_sock = await asyncio.to_thread(raw_connect, legacy_silent)
+        await enqueue(legacy_silent, "SILENT-2", 1)
+        reaped = await wait_unregistered(legacy_silent, 10)
+        print(f"молчащий клиент без heartbeat закрыт через {reaped:.2f} с")
+
+        # Не читающий клиент с крошечным буфером приема держится pong'ами
+        await enqueue(stalled, big_label, 64)
+        stalled_sock = await asyncio.to_thread(
+            raw_connect, stalled, "heartbeat=1&protocol=binary&format=png", 4096
+        )
+        while stalled not in print_service.print_clients:
+            await asyncio.sleep(0.01)
+        started = time.monotonic()
+        while stalled in print_service.print_clients:
+            await asyncio.to_thread(raw_send_text, stalled_sock, '{"type":"pong"}')
+            await asyncio.sleep(0.1)
+            if time.monotonic() - started > 30:
+                raise AssertionError("не читающий клиент не закрыт")
+        reaped = time.monotonic() - started
+        print(f"не читающий клиент закрыт через {reaped:.2f} с")
+
+        await enqueue(healthy, "HEALTHY-1", 5)
+        await asyncio.sleep(1.5)
+        stats = (await http.get("/printers/jobs/stats")).json()
+        connection = next(
+            c["connection"] for c in stats["clients"] if c["client_id"] == healthy
+        )
+        assert healthy in print_service.print_clients, "живой клиент отключен"
+        assert legacy in print_service.print_clients, "старый клиент отключен"
+        print(
+            f"живой клиент на связи: RTT {connection['rtt_ms']:.2f} мс, "
+            f"отправка {connection['send_latency_avg_ms']:.3f} мс в среднем, "
+            f"в очереди {connection['queued_bytes']} байт"
+        )
+
+        for client_id in (silent, legacy_silent, stalled):
+            jobs = (
+                await http.get("/printers/jobs/", params={"client_id": client_id})
+            ).json()
+            statuses = {job["status"] for job in jobs}
+            assert "sent" not in statuses, statuses
+            print(f"{client_id}: задания после закрытия {sorted(statuses)}")
+
+        stop.set()
+        await healthy_task
+        await legacy_task
+
+    silent_sock.close()
+    legacy_sock.close()
+    stalled_sock.close()
+    server.should_exit = True
+    thread.join()
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
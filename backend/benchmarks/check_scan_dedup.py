@@ -0,0 +1,121 @@
+"""Проверка подавления повторных сканов (SCAN_DEDUP_*).
+
+Поднимает бэкенд в этом процессе с коротким окном и фильтром Блума и
+имитирует конвейер:
+
+- залп: каждый код приходит много раз параллельно - в базе по одной
+  записи на код, повторам возвращается тот же id с X-Scan-Duplicate;
+- скользящее окно: код повторяется чаще окна дольше нескольких окон -
+  запись одна;
+- длинное окно: повтор после паузы больше короткого окна находится
+  фильтром Блума и проверкой по базе, новый код пишется без проверки.
+
+    python -m benchmarks.check_scan_dedup
+"""
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+
+os.environ.setdefault("SCAN_DEDUP_WINDOW", "0.5")
+os.environ.setdefault("SCAN_DEDUP_BLOOM_WINDOW", "60")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.scan import Scan  # noqa: E402
+
+PORT = 8798
+BASE = f"http://127.0.0.1:{PORT}/api/v1"
+CODES = 20
+REPEATS = 25
+
+
+def count_rows(prefix: str) -> int:
+    with SessionLocal() as db:
+        return db.scalar(
+            select(func.count())
+            .select_from(Scan)
+            .where(Scan.qr_data.like(f"{prefix}%"))
+        )
+
+
+async def main():
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    prefix = f"DEDUP-{uuid.uuid4().hex[:8]}-"
+    async with httpx.AsyncClient(base_url=BASE, timeout=30) as http:
+
+        async def scan(qr_data: str):
+            response = await http.post(
+                "/scans/scan/", json={"qr_data": qr_data, "scan_type": "scanner"}
+            )
+            response.raise_for_status()
+            return response.json()["id"], "x-scan-duplicate" in response.headers
+
+        # Залп: повторы каждого кода идут параллельно с его первой записью
+        codes = [f"{prefix}{code}" for _ in range(REPEATS) for code in range(CODES)]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(scan(qr_data) for qr_data in codes))
+        elapsed = time.perf_counter() - started
+        ids = {}
+        for qr_data, (scan_id, _) in zip(codes, results):
+            ids.setdefault(qr_data, set()).add(scan_id)
+        duplicates = sum(duplicate for _, duplicate in results)
+        assert all(len(value) == 1 for value in ids.values()), ids
+        assert duplicates == CODES * (REPEATS - 1), duplicates
+        assert count_rows(prefix) == CODES, count_rows(prefix)
+        print(
+            f"залп: {len(results)} сканов за {elapsed:.2f} с, "
+            f"записей {CODES}, повторов {duplicates}"
+        )
+
+        # Скользящее окно: повтор каждые полокна в течение трех окон
+        window = settings.SCAN_DEDUP_WINDOW
+        held = f"{prefix}held"
+        first, _ = await scan(held)
+        deadline = time.monotonic() + 3 * window
+        while time.monotonic() < deadline:
+            await asyncio.sleep(window / 2)
+            scan_id, duplicate = await scan(held)
+            assert duplicate and scan_id == first, (scan_id, first)
+        assert count_rows(held) == 1
+        print(f"скользящее окно: код держался {3 * window:.1f} с, запись одна")
+
+        # Длинное окно: пауза дольше короткого окна, повтор находится в базе
+        await asyncio.sleep(window * 2)
+        before = (await http.get("/scans/dedup-stats/")).json()["bloom"]
+        scan_id, duplicate = await scan(held)
+        assert duplicate and scan_id == first, (scan_id, first)
+        await scan(f"{prefix}fresh")
+        after = (await http.get("/scans/dedup-stats/")).json()
+        bloom = after["bloom"]
+        assert bloom["hits"] == before["hits"] + 1, bloom
+        assert bloom["db_lookups"] == before["db_lookups"] + 1, bloom
+        assert count_rows(prefix) == CODES + 2
+        print(
+            f"длинное окно: повтор найден фильтром Блума и базой, "
+            f"фильтр {bloom['bytes'] // 1024} КБ"
+        )
+        print(
+            f"доля повторов {after['hit_ratio']:.1%} "
+            f"({after['hits']} из {after['lookups']})"
+        )
+
+    server.should_exit = True
+    thread.join()
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
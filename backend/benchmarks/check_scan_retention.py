@@ -0,0 +1,162 @@
+"""Проверка секций scans, архива старых месяцев и очистки загрузок.
+
+Только на отдельной базе PostgreSQL: засевает сканы за --months месяцев
+назад и прогоняет один проход scan_retention со сроком хранения
+--retention месяцев:
+
+- секции созданы на каждый месяц и наперед, запрос за месяц читает
+  одну секцию (EXPLAIN);
+- старые секции отсоединены, в архиве столько же строк, сколько ушло
+  из scans, счетчики scan_rollups не изменились.
+
+Затем очистка UPLOAD_DIR во временном каталоге: кадры старше срока
+уходят в zip по дням, свежие остаются (в SQLite проверяется только она).
+
+    DATABASE_URL=postgresql://.../retention_check \\
+        python -m benchmarks.check_scan_retention --months 18 --retention 6
+"""
+
+import argparse
+import gzip
+import os
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import Base, engine
+from app.models import scan_rollup  # noqa: F401 - таблица счетчиков
+from app.models.scan import add_months, create_scan_partitions, month_start
+from app.services.scan_retention import scan_retention
+from app.services.upload_sweeper import upload_sweeper
+
+SEED_SQL = text("""
+    INSERT INTO scans (qr_data, scan_type, scanned_at, printed)
+    SELECT 'RETENTION-' || g, 'scanner',
+           now() - (g * :step) * interval '1 second', g % 2 = 0
+    FROM generate_series(1, :rows) AS g
+    """)
+
+
+def count(conn, query: str) -> int:
+    return conn.execute(text(query)).scalar() or 0
+
+
+def check_partitions(months: int, retention: int, rows_per_month: int):
+    Base.metadata.create_all(bind=engine)
+    rows = months * rows_per_month
+    with engine.begin() as conn:
+        first = conn.execute(text("SELECT min(scanned_at) FROM scans")).scalar()
+        if first is None:
+            conn.execute(
+                SEED_SQL, {"rows": rows, "step": 30.4 * 86400 / rows_per_month}
+            )
+    # Секции под засеянные месяцы (иначе строки лежат в scans_default)
+    now = datetime.now(timezone.utc)
+    settings.SCAN_RETENTION_MONTHS = 0
+    with engine.begin() as conn:
+        first = conn.execute(text("SELECT min(scanned_at) FROM scans")).scalar()
+        create_scan_partitions(conn, first, now)
+        conn.execute(text("ANALYZE scans"))
+        total = count(conn, "SELECT count(*) FROM scans")
+        rollups = count(
+            conn, "SELECT sum(scans) FROM scan_rollups WHERE granularity = 'day'"
+        )
+        in_default = count(conn, "SELECT count(*) FROM scans_default")
+        start = add_months(month_start(now), -2)
+        plan = (
+            conn.execute(
+                text(
+                    "EXPLAIN SELECT * FROM scans WHERE scanned_at >= :start "
+                    "AND scanned_at < :end ORDER BY scanned_at DESC LIMIT 100"
+                ),
+                {"start": start, "end": add_months(start, 1)},
+            )
+            .scalars()
+            .all()
+        )
+    scanned = {
+        line.split(" on ")[1].split()[0] for line in plan if " on scans_" in line
+    }
+    print(
+        f"сканов {total}, в scans_default {in_default}; "
+        f"запрос за месяц читает {sorted(scanned)}"
+    )
+    assert in_default == 0 and len(scanned) == 1, (in_default, scanned)
+
+    settings.SCAN_RETENTION_MONTHS = retention
+    started = time.perf_counter()
+    result = scan_retention.run_once()
+    elapsed = time.perf_counter() - started
+    archived_rows = 0
+    for path in result["archived"]:
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            archived_rows += pq.ParquetFile(path).metadata.num_rows
+        else:
+            with gzip.open(path, "rt") as f:
+                archived_rows += sum(1 for _ in f) - 1
+    with engine.connect() as conn:
+        left = count(conn, "SELECT count(*) FROM scans")
+        rollups_after = count(
+            conn, "SELECT sum(scans) FROM scan_rollups WHERE granularity = 'day'"
+        )
+        oldest = conn.execute(text("SELECT min(scanned_at) FROM scans")).scalar()
+    print(
+        f"архив: {len(result['archived'])} секций, {archived_rows} строк "
+        f"за {elapsed:.2f} с; "
+        f"в scans осталось {left} (старейший {oldest:%Y-%m-%d}), "
+        f"новые секции: {result['created']}"
+    )
+    assert archived_rows + left == total, (archived_rows, left, total)
+    assert oldest >= add_months(month_start(now), -retention), oldest
+    assert rollups_after == rollups, (rollups, rollups_after)
+
+
+def check_uploads(files: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.UPLOAD_DIR = os.path.join(tmp, "uploads")
+        settings.UPLOAD_ARCHIVE_DIR = os.path.join(tmp, "archive")
+        settings.UPLOAD_RETENTION_DAYS = 7
+        settings.UPLOAD_SWEEP_MODE = "compact"
+        os.makedirs(settings.UPLOAD_DIR)
+        now = time.time()
+        for index in range(files):
+            path = Path(settings.UPLOAD_DIR) / f"qr_scan_{index}.png"
+            path.write_bytes(os.urandom(2048))
+            age_days = index % 14  # половина старше недели
+            os.utime(path, (now - age_days * 86400, now - age_days * 86400))
+
+        result = upload_sweeper.run_once()
+        left = len(os.listdir(settings.UPLOAD_DIR))
+        zipped = 0
+        for path in Path(settings.UPLOAD_ARCHIVE_DIR).glob("*.zip"):
+            with zipfile.ZipFile(path) as archive:
+                zipped += len(archive.namelist())
+        print(f"загрузки: {result}, осталось файлов {left}, в zip {zipped}")
+        assert zipped == result["compacted"] and left + zipped == files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months", type=int, default=18)
+    parser.add_argument("--retention", type=int, default=6)
+    parser.add_argument("--rows-per-month", type=int, default=20000)
+    parser.add_argument("--files", type=int, default=1000)
+    args = parser.parse_args()
+
+    if engine.dialect.name == "postgresql":
+        check_partitions(args.months, args.retention, args.rows_per_month)
+    else:
+        print("секции scans есть только в PostgreSQL, проверяется очистка загрузок")
+    check_uploads(args.files)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Проверка хранилища кадров по хешу содержимого.
+
+Во временном каталоге (или в бакете S3-совместимого сервера, если задан
+--s3-endpoint, например MinIO или moto_server):
+
+- одинаковые кадры хранятся один раз, ключ ab/cd/<sha256>.<расширение>;
+- кадр хранится в исходной кодировке (JPEG остается JPEG);
+- миниатюра создана и не больше UPLOAD_THUMBNAIL_SIZE;
+- ответ хранилища - X-Accel-Redirect на internal location nginx.
+
+    python -m benchmarks.check_upload_storage --frames 200
+    moto_server -p 5005 &
+    python -m benchmarks.check_upload_storage --s3-endpoint http://127.0.0.1:5005
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from app.config import settings
+from app.services.upload_storage import (
+    LocalUploadStorage,
+    S3UploadStorage,
+    content_key,
+    thumbnail_key,
+)
+
+
+def make_frame(seed: int, fmt: str) -> bytes:
+    """Кадр 1280x720 со случайным шумом в углу: у каждого seed свой хеш"""
+    rnd = random.Random(seed)
+    image = Image.new("RGB", (1280, 720), (255, 255, 255))
+    image.putdata(
+        [(rnd.randrange(256),) * 3 for _ in range(64 * 64)]
+        + [(255, 255, 255)] * (1280 * 720 - 64 * 64)
+    )
+    buffer = BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def create_storage(args):
+    if not args.s3_endpoint:
+        return LocalUploadStorage(tempfile.mkdtemp(prefix="upload-check-"))
+    settings.UPLOAD_S3_ENDPOINT_URL = args.s3_endpoint
+    settings.UPLOAD_S3_ACCESS_KEY = settings.UPLOAD_S3_ACCESS_KEY or "testing"
+    settings.UPLOAD_S3_SECRET_KEY = settings.UPLOAD_S3_SECRET_KEY or "testing"
+    settings.UPLOAD_S3_PREFIX = f"check-{int(time.time())}/"
+    storage = S3UploadStorage()
+    try:
+        storage.client.create_bucket(Bucket=storage.bucket)
+    except storage.client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+    return storage
+
+
+def count_objects(storage) -> int:
+    if isinstance(storage, LocalUploadStorage):
+        return sum(len(names) for _, _, names in os.walk(storage.root))
+    pages = storage.client.get_paginator("list_objects_v2").paginate(
+        Bucket=storage.bucket, Prefix=storage.prefix
+    )
+    return sum(page.get("KeyCount", 0) for page in pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="загрузок каждого кадра")
+    parser.add_argument("--s3-endpoint", help="S3-совместимый сервер вместо каталога")
+    args = parser.parse_args()
+
+    storage = create_storage(args)
+    frames = [make_frame(seed, "PNG") for seed in range(args.frames)]
+    jpeg = make_frame(args.frames, "JPEG")
+
+    started = time.perf_counter()
+    keys = [storage.save(data) for data in frames for _ in range(args.repeat)]
+    elapsed = time.perf_counter() - started
+    unique = set(keys)
+    assert len(unique) == args.frames, "повторы кадра получили разные ключи"
+    assert all(
+        key == content_key(data) for key, data in zip(keys[:: args.repeat], frames)
+    )
+    # Кадр и миниатюра на каждый уникальный кадр
+    stored = count_objects(storage)
+    assert stored == 2 * args.frames, f"объектов {stored}, ожидалось {2 * args.frames}"
+    print(
+        f"{len(keys)} загрузок, {len(unique)} уникальных, {stored} объектов, "
+        f"{len(keys) / elapsed:.0f} кадров/с"
+    )
+
+    key = storage.save(jpeg)
+    assert key.endswith(".jpg") and storage.get(key) == jpeg, "JPEG перекодирован"
+
+    with Image.open(BytesIO(storage.get(thumbnail_key(key)))) as thumbnail:
+        assert max(thumbnail.size) <= settings.UPLOAD_THUMBNAIL_SIZE
+        print(
+            f"миниатюра {thumbnail.format} {thumbnail.size}: "
+            f"{len(storage.get(thumbnail_key(key)))} байт из {len(jpeg)}"
+        )
+
+    settings.UPLOAD_ACCEL_PREFIX = "/internal/uploads/"
+    response = storage.response(key)
+    accel = response.headers["x-accel-redirect"]
+    assert not response.body and accel.startswith(
+        settings.UPLOAD_S3_ACCEL_PREFIX if args.s3_endpoint else "/internal/uploads/"
+    )
+    print(f"X-Accel-Redirect: {accel[:96]}")
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Сравнение двух файлов результатов бенчмарков (до и после изменения).
+
+Выводит метрики, изменившиеся больше чем на --threshold процентов, и
+завершается с кодом 1, если есть ухудшения - так сравнение можно
+запускать в CI между коммитами.
+
+    python -m benchmarks.compare results/load-e4d03f6.json results/load-60c16f8.json
+    python -m benchmarks.compare base-micro.json micro.json --threshold 5
+"""
+
+import argparse
+import sys
+
+from benchmarks.results import higher_is_better, load_metrics
+
+
+def compare(base: dict, current: dict, threshold: float):
+    """Строки (метрика, было, стало, изменение %, ухудшение ли)"""
+    rows = []
+    for name in sorted(base.keys() & current.keys()):
+        before, after = base[name], current[name]
+        if not before:
+            continue
+        change = (after - before) / abs(before) * 100
+        worse = -change if higher_is_better(name) else change
+        rows.append((name, before, after, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--all", action="store_true", help="показать все метрики")
+    args = parser.parse_args()
+
+    base, current = load_metrics(args.base), load_metrics(args.current)
+    rows = compare(base, current, args.threshold)
+
+    regressions = 0
+    for name, before, after, change, regression in rows:
+        if not args.all and abs(change) <= args.threshold:
+            continue
+        mark = "ХУЖЕ" if regression else "лучше" if abs(change) > args.threshold else ""
+        regressions += regression
+        print(f"{name:50} {before:12.3f} {after:12.3f} {change:+8.1f}%  {mark}")
+
+    missing = sorted(base.keys() ^ current.keys())
+    if missing:
+        print(f"Метрики только в одном из файлов: {', '.join(missing)}")
+    print(
+        f"Сравнено метрик: {len(rows)}, ухудшений больше {args.threshold}%: {regressions}"
+    )
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Эмулятор сканера Bestson S20-B на псевдотерминале (pty).
+
+Режим по умолчанию - замер устойчивой скорости: эмулятор пишет строки
+в pty с заданной частотой, ScannerReader читает их с другого конца, и
+выводится, сколько сканов в секунду дошло без потерь.
+
+    python -m benchmarks.fake_scanner --rate 2000 --duration 10
+
+С --serve эмулятор только печатает путь к pty и пишет строки, а бэкенд
+читает его как настоящий сканер (SCANNER_PORTS=<путь>).
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from app.services.scanner_service import ScannerReader
+
+
+class FakeScanner:
+    """Пишет строки сканов в master-конец pty"""
+
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        self.port = os.ttyname(self.slave)
+        self.sent = 0
+
+    def emit(self, rate: float, duration: float, terminator: bytes = b"\r\n"):
+        interval = 1 / rate if rate else 0
+        deadline = time.perf_counter() + duration
+        next_at = time.perf_counter()
+        while time.perf_counter() < deadline:
+            os.write(self.master, f"PARCEL-{self.sent:08d}".encode() + terminator)
+            self.sent += 1
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=1000, help="сканов в секунду")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--serve", action="store_true")
+    args = parser.parse_args()
+
+    scanner = FakeScanner()
+
+    if args.serve:
+        print(f"pty: {scanner.port}", flush=True)
+        scanner.emit(args.rate, args.duration)
+        scanner.close()
+        return
+
+    received = []
+    lock = threading.Lock()
+
+    def on_scan(port, data):
+        with lock:
+            received.append(data)
+
+    reader = ScannerReader(scanner.port, on_scan)
+    reader.start()
+    while not reader.connected:
+        time.sleep(0.01)
+
+    started = time.perf_counter()
+    scanner.emit(args.rate, args.duration)
+    time.sleep(0.5)  # даем дочитать хвост
+    elapsed = time.perf_counter() - started
+    reader.stop()
+    scanner.close()
+
+    expected = [f"PARCEL-{i:08d}" for i in range(scanner.sent)]
+    print(
+        f"отправлено {scanner.sent}, получено {len(received)}, "
+        f"без потерь и по порядку: {received == expected}, "
+        f"{len(received) / elapsed:.0f} сканов/сек"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Нагрузочный сценарий: сканы, распознавание изображений, история и печать.
+
+Виртуальные пользователи в цикле выбирают операцию по весам:
+
+- scan: POST /scans/scan/ (часть - с printer_id, то есть с печатью);
+- image: POST /scans/scan-from-image/ с PNG готового QR кода;
+- list: GET /scans/scans/?limit=50.
+
+Параллельно подключены клиенты печати по WebSocket: первый назначается
+принтером по умолчанию, отвечает на ping и подтверждает задания. Для
+печати замеряется путь от отправки скана до получения команды клиентом.
+
+Без --base-url бэкенд поднимается в этом процессе на --database-url
+(SQLite по умолчанию или локальный Postgres). Результат пишется в общем
+JSON формате (benchmarks/results.py), сравнение - benchmarks.compare.
+
+    python -m benchmarks.load --users 50 --duration 30
+    python -m benchmarks.load --database-url postgresql://postgres@localhost/qr \\
+        --print-protocol binary --output results/load-pg.json
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import qrcode
+import websockets
+
+from benchmarks.load_scans import percentile
+from benchmarks.results import write_results
+
+PORT = 8796
+WEIGHTS = {"scan": 6, "image": 1, "list": 3}
+
+
+def qr_images(count: int) -> List[str]:
+    """PNG QR кодов в base64 для распознавания"""
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        qrcode.make(f"IMAGE-{i:04d}").save(buffer, format="PNG")
+        images.append(base64.b64encode(buffer.getvalue()).decode())
+    return images
+
+
+class LoadRun:
+    def __init__(self, base_url: str, args):
+        self.api = f"{base_url}/api/v1"
+        self.ws_url = base_url.replace("http", "ws", 1) + "/api/v1/printers/ws/print"
+        self.args = args
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.images = qr_images(16)
+        # qr_data -> время отправки скана с печатью
+        self.print_sent: Dict[str, float] = {}
+        self.print_latencies: List[float] = []
+
+    async def user(self, client: httpx.AsyncClient, deadline: float):
+        operations, weights = zip(*WEIGHTS.items())
+        while time.perf_counter() < deadline:
+            operation = random.choices(operations, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await getattr(self, operation)(client, started)
+                if response.status_code != 200:
+                    self.errors[operation] += 1
+            except httpx.HTTPError:
+                self.errors[operation] += 1
+            self.latencies[operation].append(time.perf_counter() - started)
+
+    async def scan(self, client: httpx.AsyncClient, started: float):
+        payload = {"qr_data": f"LOAD-{uuid.uuid4().hex}", "scan_type": "scanner"}
+        if self.args.printers and random.random() < self.args.print_ratio:
+            payload["printer_id"] = "label"
+            self.print_sent[payload["qr_data"]] = started
+        return await client.post(f"{self.api}/scans/scan/", json=payload)
+
+    async def image(self, client: httpx.AsyncClient, started: float):
+        return await client.post(
+            f"{self.api}/scans/scan-from-image/",
+            json={"image_data": random.choice(self.images)},
+        )
+
+    async def list(self, client: httpx.AsyncClient, started: float):
+        return await client.get(f"{self.api}/scans/scans/", params={"limit": 50})
+
+    async def printer(self, client_id: str, default: bool, ready: asyncio.Event):
+        # Импорт после start_server: настройки читают DATABASE_URL при импорте
+        from app.services.print_protocol import decode_frame
+
+        query = "?heartbeat=1"
+        if self.args.print_protocol == "binary":
+            query += "&protocol=binary&format=data"
+        async with websockets.connect(f"{self.ws_url}/{client_id}{query}") as ws:
+            if default:
+                await ws.send(json.dumps({"type": "set_default"}))
+            ready.set()
+            async for raw in ws:
+                if isinstance(raw, bytes):
+                    jobs = decode_frame(raw)
+                else:
+                    message = json.loads(raw)
+                    if message["type"] == "ping":
+                        await ws.send(json.dumps({"type": "pong", "ts": message["ts"]}))
+                    if message["type"] != "print":
+                        continue
+                    jobs = [message]
+
+                received = time.perf_counter()
+                for job in jobs:
+                    sent = self.print_sent.pop(job["qr_data"], None)
+                    if sent is not None:
+                        self.print_latencies.append(received - sent)
+                await ws.send(
+                    json.dumps(
+                        {"type": "ack", "job_ids": [job["job_id"] for job in jobs]}
+                    )
+                )
+
+    async def run(self) -> dict:
+        printers = []
+        for i in range(self.args.printers):
+            ready = asyncio.Event()
+            client_id = f"load-printer-{i}-{uuid.uuid4().hex[:6]}"
+            printers.append(asyncio.create_task(self.printer(client_id, i == 0, ready)))
+            await ready.wait()
+        # Пусть set_default дойдет до сервера раньше первых сканов
+        await asyncio.sleep(0.2)
+
+        limits = httpx.Limits(max_connections=self.args.users)
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            started = time.perf_counter()
+            deadline = started + self.args.duration
+            await asyncio.gather(
+                *(self.user(client, deadline) for _ in range(self.args.users))
+            )
+            elapsed = time.perf_counter() - started
+
+        # Команды печати, отправленные в конце, успевают дойти
+        await asyncio.sleep(min(2.0, self.args.duration))
+        for task in printers:
+            task.cancel()
+        await asyncio.gather(*printers, return_exceptions=True)
+        return self.metrics(elapsed)
+
+    def metrics(self, elapsed: float) -> dict:
+        metrics = {}
+        total = 0
+        for operation, values in sorted(self.latencies.items()):
+            values.sort()
+            total += len(values)
+            metrics[f"{operation}.rps"] = round(len(values) / elapsed, 1)
+            metrics[f"{operation}.errors"] = self.errors[operation]
+            for pct in (50, 95, 99):
+                metrics[f"{operation}.p{pct}_ms"] = round(
+                    percentile(values, pct) * 1000, 2
+                )
+        metrics["total.rps"] = round(total / elapsed, 1)
+
+        if self.args.printers:
+            self.print_latencies.sort()
+            metrics["print.delivered"] = len(self.print_latencies)
+            metrics["print.undelivered"] = len(self.print_sent)
+            for pct in (50, 95, 99):
+                metrics[f"print.p{pct}_ms"] = round(
+                    percentile(self.print_latencies, pct) * 1000, 2
+                )
+        return metrics
+
+
+def start_server(database_url: str):
+    """Бэкенд в фоновом потоке этого процесса"""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("DB_ECHO", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="уже запущенный бэкенд")
+    parser.add_argument(
+        "--database-url",
+        default="sqlite:///./load.sqlite",
+        help="база для бэкенда в этом процессе",
+    )
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--printers", type=int, default=2)
+    parser.add_argument("--print-ratio", type=float, default=0.2)
+    parser.add_argument("--print-protocol", choices=["json", "binary"], default="json")
+    parser.add_argument("--output", help="файл результатов (по умолчанию results/)")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, thread = start_server(args.database_url)
+        base_url = f"http://127.0.0.1:{PORT}"
+
+    metrics = await LoadRun(base_url, args).run()
+
+    if server:
+        server.should_exit = True
+        thread.join()
+
+    params = {key: value for key, value in vars(args).items() if key != "output"}
+    path = write_results(
+        "load",
+        metrics,
+        params=params,
+        path=args.output,
+        database_url=None if args.base_url else args.database_url,
+    )
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+    print(f"Результаты: {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
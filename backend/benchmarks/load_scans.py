@@ -0,0 +1,90 @@
+"""Нагрузочный тест создания сканов.
+
+Запускает N параллельных "сканеров", каждый из которых в цикле отправляет
+POST /scans/scan/, и выводит запросы/сек и задержки (p50/p99).
+Для сравнения режимов запустите тест против двух экземпляров бэкенда
+(например, старого с NullPool и нового с пулом) с разными --label.
+
+    python -m benchmarks.load_scans --base-url http://localhost:8000 \\
+        --concurrency 50 200 1000 --duration 30 --label pooled
+
+Требует httpx.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import List
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Возвращает перцентиль отсортированного списка"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def scanner(
+    client: httpx.AsyncClient, url: str, deadline: float, latencies: List[float]
+) -> int:
+    """Один сканер: отправляет сканы до истечения времени, возвращает число ошибок"""
+    errors = 0
+    while time.perf_counter() < deadline:
+        payload = {"qr_data": f"bench-{uuid.uuid4().hex}", "scan_type": "scanner"}
+        started = time.perf_counter()
+        try:
+            response = await client.post(url, json=payload)
+            if response.status_code != 200:
+                errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    return errors
+
+
+async def run_level(base_url: str, concurrency: int, duration: float) -> dict:
+    """Прогоняет один уровень параллельности"""
+    url = f"{base_url}/api/v1/scans/scan/"
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        errors = await asyncio.gather(
+            *(scanner(client, url, deadline, latencies) for _ in range(concurrency))
+        )
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--label", default="current")
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        result = await run_level(args.base_url, concurrency, args.duration)
+        result["label"] = args.label
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,7 @@
+"""Микробенчмарки pytest-benchmark: генерация и декодирование QR, экспорт, crud.scan.
+
+Данные генерируются в фикстурах, база - временный файл SQLite.
+
+    python -m pytest benchmarks/micro --benchmark-json benchmarks/results/micro.json
+    python -m benchmarks.compare base-micro.json benchmarks/results/micro.json
+"""
@@ -0,0 +1,40 @@
+import itertools
+
+import pytest
+
+from app.crud import scan as crud_scan
+from app.schemas.scan import ScanCreate
+
+ROWS = 5000
+
+
+@pytest.fixture(scope="module")
+def filled_session(sqlite_session):
+    for i in range(ROWS):
+        sqlite_session.add(crud_scan.Scan(qr_data=f"SEED-{i:06d}", scan_type="scanner"))
+    sqlite_session.commit()
+    return sqlite_session
+
+
+def bench_create_scan(benchmark, sqlite_session):
+    counter = itertools.count()
+    benchmark(
+        lambda: crud_scan.create_scan(
+            sqlite_session,
+            ScanCreate(qr_data=f"BENCH-{next(counter):08d}", scan_type="scanner"),
+        )
+    )
+
+
+def bench_get_scans_page(benchmark, filled_session):
+    benchmark(lambda: crud_scan.get_scans(filled_session, limit=100))
+
+
+def bench_get_scans_deep_offset(benchmark, filled_session):
+    benchmark(lambda: crud_scan.get_scans(filled_session, skip=4000, limit=100))
+
+
+def bench_iter_scans(benchmark, filled_session):
+    benchmark.pedantic(
+        lambda: sum(1 for _ in crud_scan.iter_scans(filled_session)), rounds=5
+    )
@@ -0,0 +1,16 @@
+import io
+
+from app.utils.excel_export import ExcelExporter
+from app.utils.scan_export import CsvExporter, ParquetExporter
+
+
+def bench_export_xlsx(benchmark, scans):
+    benchmark.pedantic(ExcelExporter.write_scans, args=(scans, io.BytesIO()), rounds=3)
+
+
+def bench_export_csv(benchmark, scans):
+    benchmark(lambda: b"".join(CsvExporter.iter_scans(scans)))
+
+
+def bench_export_parquet(benchmark, scans):
+    benchmark(lambda: ParquetExporter.write_scans(scans, io.BytesIO()))
@@ -0,0 +1,78 @@
+import itertools
+
+import pytest
+import qrcode
+
+from app.config import settings
+from app.services.qr_cache import QRCodeKey
+from app.services.qr_service import QRService
+from benchmarks.bench_decode import make_frame
+
+
+def key(data: str) -> QRCodeKey:
+    return QRCodeKey(
+        data=data,
+        box_size=settings.QR_CODE_SIZE,
+        version=settings.QR_CODE_VERSION,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        border=settings.QR_CODE_BORDER,
+    )
+
+
+def bench_generate_png(benchmark, payloads):
+    # Без кэша: каждый раз рисуется PNG
+    cycle = itertools.cycle(payloads)
+    benchmark(lambda: QRService.render_qr_code(key(next(cycle))))
+
+
+def bench_generate_cached(benchmark, payloads):
+    for data in payloads:
+        QRService.get_qr_code(data)
+    cycle = itertools.cycle(payloads)
+    benchmark(lambda: QRService.get_qr_code(next(cycle)))
+
+
+def bench_generate_matrix(benchmark, payloads):
+    # В обход lru_cache - замеряется построение матрицы
+    build = QRService._qr_matrix.__wrapped__
+    cycle = itertools.cycle(payloads)
+    benchmark(lambda: build(next(cycle), settings.QR_CODE_VERSION))
+
+
+@pytest.fixture(scope="module")
+def clean_images(payloads):
+    return [QRService.generate_qr_code(data) for data in payloads[:16]]
+
+
+def readable(image_data: bytes) -> bool:
+    try:
+        return bool(QRService.decode_qr_codes(image_data))
+    except ValueError:
+        return False
+
+
+@pytest.fixture(scope="module")
+def noisy_frames():
+    """Кадры 1920x1080 с кодом, которые декодер читает целиком"""
+    frames = [
+        make_frame(f"FRAME-{i:04d}", box_size, blur, 0, seed=i)
+        for i, (box_size, blur) in enumerate(itertools.product([4, 8], [0, 3, 5]))
+    ]
+    frames = [frame for frame in frames if readable(frame[0])]
+    assert frames, "Ни один кадр не распознан"
+    return frames
+
+
+def bench_decode_clean(benchmark, clean_images):
+    cycle = itertools.cycle(clean_images)
+    benchmark(lambda: QRService.decode_qr_codes(next(cycle)))
+
+
+def bench_decode_frame(benchmark, noisy_frames):
+    cycle = itertools.cycle(noisy_frames)
+    benchmark(lambda: QRService.decode_qr_codes(next(cycle)[0]))
+
+
+def bench_decode_frame_roi(benchmark, noisy_frames):
+    cycle = itertools.cycle(noisy_frames)
+    benchmark(lambda: QRService.decode_qr_codes(*next(cycle)))
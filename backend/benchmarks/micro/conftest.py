@@ -0,0 +1,53 @@
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.scan import Scan
+
+EXPORT_ROWS = 10000
+
+
+@pytest.fixture(scope="session")
+def payloads():
+    """Содержимое этикеток разной длины"""
+    return [
+        f"PARCEL-{uuid.UUID(int=i).hex[:12]}-{i:06d}" * (1 + i % 3) for i in range(256)
+    ]
+
+
+@pytest.fixture(scope="session")
+def scans():
+    """Сканы в памяти для экспорта, без базы"""
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        Scan(
+            id=i,
+            qr_data=f"PARCEL-{i:08d}",
+            scan_type=("scanner", "camera", "manual")[i % 3],
+            scanned_at=started + timedelta(seconds=i),
+            printed=i % 2 == 0,
+            printed_at=started + timedelta(seconds=i + 1) if i % 2 == 0 else None,
+            printer_id="label" if i % 2 == 0 else None,
+        )
+        for i in range(EXPORT_ROWS)
+    ]
+
+
+@pytest.fixture(scope="session")
+def sqlite_session():
+    """Сессия на временном файле SQLite со всеми таблицами"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.database import Base
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
@@ -0,0 +1,109 @@
+"""Общий JSON формат результатов бенчмарков для сравнения между коммитами.
+
+    {
+      "schema": 1,
+      "benchmark": "load",
+      "commit": "e4d03f6", "dirty": false,
+      "created_at": "2026-01-01T12:00:00+00:00",
+      "env": {"python": "3.11.7", "platform": "...", "cpus": 8, "database": "sqlite"},
+      "params": {...},
+      "metrics": {"scan.rps": 812.4, "scan.p99_ms": 35.1, ...}
+    }
+
+Метрики - плоский словарь чисел. Имена с суффиксами из HIGHER_IS_BETTER
+(пропускная способность) лучше, когда растут, остальные (время,
+задержки, байты) - когда уменьшаются. Отчет pytest-benchmark
+(--benchmark-json) читается тем же load_metrics.
+"""
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+SCHEMA = 1
+HIGHER_IS_BETTER = ("rps", "per_s", "ops", "ratio", "delivered")
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def git_commit() -> Dict[str, object]:
+    """Текущий коммит и есть ли незакоммиченные изменения"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=Path(__file__).parent,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def environment(database_url: Optional[str] = None) -> dict:
+    database_url = database_url or os.environ.get("DATABASE_URL", "")
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "database": database_url.split(":", 1)[0].split("+", 1)[0] or None,
+    }
+
+
+def write_results(
+    benchmark: str,
+    metrics: Dict[str, float],
+    params: Optional[dict] = None,
+    path: Optional[str] = None,
+    database_url: Optional[str] = None,
+) -> Path:
+    """Сохраняет результаты; по умолчанию results/<benchmark>-<commit>.json"""
+    info = git_commit()
+    document = {
+        "schema": SCHEMA,
+        "benchmark": benchmark,
+        **info,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "env": environment(database_url),
+        "params": params or {},
+        "metrics": metrics,
+    }
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{benchmark}-{info['commit'] or 'unknown'}.json"
+    path = Path(path)
+    path.write_text(json.dumps(document, ensure_ascii=False, indent=2))
+    return path
+
+
+def load_metrics(path: str) -> Dict[str, float]:
+    """Плоские метрики из нашего файла или из отчета pytest-benchmark"""
+    document = json.loads(Path(path).read_text())
+    if "metrics" in document:
+        return document["metrics"]
+
+    # pytest-benchmark: время в секундах, переводим в миллисекунды
+    metrics = {}
+    for bench in document.get("benchmarks", []):
+        stats = bench["stats"]
+        metrics[f"{bench['name']}.mean_ms"] = stats["mean"] * 1000
+        metrics[f"{bench['name']}.median_ms"] = stats["median"] * 1000
+        metrics[f"{bench['name']}.ops"] = stats["ops"]
+    return metrics
+
+
+def higher_is_better(name: str) -> bool:
+    return name.rsplit(".", 1)[-1].endswith(HIGHER_IS_BETTER)
@@ -0,0 +1,87 @@
+"""Проверка восстановления буфера отложенной записи после падения.
+
+Дочерний процесс включает буфер с большим интервалом сброса, получает
+подтверждения (id) для --count сканов и падает через os._exit, не успев
+записать их в базу. Затем буфер запускается заново, восстанавливает WAL,
+и проверяется, что в базе есть каждый подтвержденный скан.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.scan_buffer_recovery
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.database import AsyncSessionLocal, Base, engine
+from app.models.scan import Scan
+from app.schemas.scan import ScanCreate
+from app.services.scan_buffer import scan_buffer
+
+
+async def crash(count: int):
+    """Подтверждает сканы и падает до сброса буфера"""
+    settings.SCAN_BUFFER_FLUSH_MS = 60_000
+    settings.SCAN_BUFFER_MAX_ROWS = count + 1
+    await scan_buffer.start()
+
+    ids = []
+    for i in range(count):
+        scan = await scan_buffer.add(ScanCreate(qr_data=f"RECOVERY-{i}"))
+        ids.append(scan.id)
+
+    print(json.dumps(ids), flush=True)
+    os._exit(1)
+
+
+async def verify(ids):
+    """Перезапускает буфер и проверяет, что все подтвержденные сканы в базе"""
+    await scan_buffer.start()
+    await scan_buffer.stop()
+
+    async with AsyncSessionLocal() as db:
+        found = await db.scalar(
+            select(func.count()).select_from(Scan).where(Scan.id.in_(ids))
+        )
+
+    print(f"подтверждено: {len(ids)}, найдено в базе: {found}")
+    return found == len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--crash", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crash:
+        asyncio.run(crash(args.count))
+        return
+
+    Base.metadata.create_all(bind=engine)
+    env = dict(os.environ)
+    env.setdefault("SCAN_BUFFER_WAL_DIR", tempfile.mkdtemp(prefix="scan-wal-"))
+    settings.SCAN_BUFFER_WAL_DIR = env["SCAN_BUFFER_WAL_DIR"]
+
+    child = subprocess.run(
+        [sys.executable, "-m", "benchmarks.scan_buffer_recovery", "--crash"]
+        + ["--count", str(args.count)],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    ids = json.loads(child.stdout.strip().splitlines()[-1])
+
+    ok = asyncio.run(verify(ids))
+    print("OK: подтвержденные сканы не потеряны" if ok else "ОШИБКА: сканы потеряны")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
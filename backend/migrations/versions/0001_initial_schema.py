@@ -0,0 +1,64 @@
+"""Исходная схема (таблицы, созданные Base.metadata.create_all)
+
+Существующие базы отмечаются этой ревизией: alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("qr_data", sa.String(500), nullable=False),
+        sa.Column("file_path", sa.String(500), nullable=True),
+        sa.Column("scan_type", sa.String(50), nullable=False),
+        sa.Column(
+            "scanned_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("printed", sa.Boolean(), nullable=False),
+        sa.Column("printed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("printer_id", sa.String(100), nullable=True),
+    )
+    op.create_index("ix_scans_id", "scans", ["id"])
+
+    op.create_table(
+        "printers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("printer_name", sa.String(200), nullable=False),
+        sa.Column("printer_id", sa.String(100), nullable=False, unique=True),
+        sa.Column("client_id", sa.String(100), nullable=False),
+        sa.Column("is_default", sa.Boolean(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column(
+            "last_seen",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_printers_id", "printers", ["id"])
+
+
+def downgrade():
+    op.drop_table("printers")
+    op.drop_table("scans")
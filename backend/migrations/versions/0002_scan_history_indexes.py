@@ -0,0 +1,39 @@
+"""Индексы для истории сканов: keyset-пагинация и фильтры
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_scans_scanned_at_id", ["scanned_at", "id"]),
+    ("ix_scans_printer_id_scanned_at", ["printer_id", "scanned_at"]),
+    ("ix_scans_printed_scanned_at", ["printed", "scanned_at"]),
+    ("ix_scans_qr_data", ["qr_data"]),
+]
+
+
+def upgrade():
+    # CONCURRENTLY не блокирует запись в scans, но требует работы вне транзакции
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                "scans",
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.drop_index(name, "scans", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,32 @@
+"""Ключи идемпотентности для пакетной загрузки сканов
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scan_ingest_keys",
+        sa.Column("idempotency_key", sa.String(100), primary_key=True),
+        sa.Column("scan_id", sa.Integer(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade():
+    op.drop_table("scan_ingest_keys")
@@ -0,0 +1,54 @@
+"""Очередь заданий печати
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "print_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("scan_id", sa.Integer(), nullable=True),
+        sa.Column("qr_data", sa.String(500), nullable=False),
+        sa.Column("printer_id", sa.String(100), nullable=False),
+        sa.Column("client_id", sa.String(100), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_print_jobs_client_id_status_id",
+        "print_jobs",
+        ["client_id", "status", "id"],
+    )
+    op.create_index("ix_print_jobs_status", "print_jobs", ["status"])
+
+
+def downgrade():
+    op.drop_index("ix_print_jobs_status", table_name="print_jobs")
+    op.drop_index("ix_print_jobs_client_id_status_id", table_name="print_jobs")
+    op.drop_table("print_jobs")
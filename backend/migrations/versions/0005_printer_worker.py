@@ -0,0 +1,22 @@
+"""Воркер, которому принадлежит сокет клиента печати
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("printers", sa.Column("worker_id", sa.String(100), nullable=True))
+
+
+def downgrade():
+    op.drop_column("printers", "worker_id")
@@ -0,0 +1,66 @@
+"""Индексы поиска по qr_data: префикс и подстрока
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.scan import SQLITE_SEARCH_DDL
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO scans_fts(scans_fts) VALUES ('rebuild')")
+        return
+
+    # pg_trgm входит в contrib; без него поиск по подстроке работает
+    # полным проходом, но префикс и точное совпадение - по индексам
+    trgm = bind.scalar(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    )
+    if trgm:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_scans_qr_data_pattern",
+            "scans",
+            ["qr_data"],
+            postgresql_ops={"qr_data": "varchar_pattern_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        if trgm:
+            op.create_index(
+                "ix_scans_qr_data_trgm",
+                "scans",
+                ["qr_data"],
+                postgresql_using="gin",
+                postgresql_ops={"qr_data": "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for name in ("scans_fts_insert", "scans_fts_delete", "scans_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS scans_fts")
+        return
+
+    with op.get_context().autocommit_block():
+        for name in ("ix_scans_qr_data_trgm", "ix_scans_qr_data_pattern"):
+            op.drop_index(name, "scans", postgresql_concurrently=True, if_exists=True)
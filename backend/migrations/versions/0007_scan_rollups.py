@@ -0,0 +1,44 @@
+"""Счетчики сканов по минутам, часам и дням для дашбордов
+
+Триггеры и заполнение по уже записанным сканам - те же, что создает
+create_all (app.models.scan_rollup).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.scan_rollup import install_rollup_triggers
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scan_rollups",
+        sa.Column("granularity", sa.String(10), primary_key=True),
+        sa.Column("bucket", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("scan_type", sa.String(50), primary_key=True),
+        sa.Column("printer_id", sa.String(100), primary_key=True),
+        sa.Column("scans", sa.BigInteger(), nullable=False),
+        sa.Column("printed", sa.BigInteger(), nullable=False),
+    )
+    install_rollup_triggers(op.get_bind())
+
+
+def downgrade():
+    bind = op.get_bind()
+    for name in ("scan_rollups_insert", "scan_rollups_update", "scan_rollups_delete"):
+        if bind.dialect.name == "postgresql":
+            op.execute(f"DROP TRIGGER IF EXISTS {name} ON scans")
+        else:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP FUNCTION IF EXISTS scan_rollups_apply()")
+    op.drop_table("scan_rollups")
@@ -0,0 +1,84 @@
+"""Секционирование scans по месяцам scanned_at (PostgreSQL)
+
+Таблица пересоздается как секционированная (ключ - (id, scanned_at)),
+строки переносятся в месячные секции; последовательность id, индексы
+и триггеры счетчиков сохраняются. Во время переноса запись в scans
+заблокирована. В SQLite ничего не меняется.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.scan import Scan, create_scan_partitions, scans_partitioned
+from app.models.scan_rollup import POSTGRES_ROLLUP_DDL
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, qr_data, file_path, scan_type, scanned_at, printed, printed_at, printer_id"
+)
+SELECT_COLUMNS = COLUMNS.replace("scanned_at", "coalesce(scanned_at, now())")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or scans_partitioned(bind):
+        return
+
+    op.execute("LOCK TABLE scans IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE scans RENAME TO scans_unpartitioned")
+    op.execute("ALTER SEQUENCE scans_id_seq RENAME TO scans_unpartitioned_id_seq")
+    op.execute("ALTER INDEX scans_pkey RENAME TO scans_unpartitioned_pkey")
+    for index in Scan.__table__.indexes:
+        op.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+    # Таблица, индексы, scans_default и секции наперед - как в create_all
+    Scan.__table__.create(bind)
+    first = bind.scalar(sa.text("SELECT min(scanned_at) FROM scans_unpartitioned"))
+    if first:
+        create_scan_partitions(bind, first, datetime.now(timezone.utc))
+
+    op.execute(
+        f"INSERT INTO scans ({COLUMNS}) "
+        f"SELECT {SELECT_COLUMNS} FROM scans_unpartitioned"
+    )
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('scans', 'id'), last_value, is_called) "
+        "FROM scans_unpartitioned_id_seq"
+    )
+    op.execute("DROP TABLE scans_unpartitioned")
+
+    # Триггеры счетчиков ушли вместе со старой таблицей; счетчики уже
+    # верны, перенос строк их не трогал
+    for statement in POSTGRES_ROLLUP_DDL:
+        bind.exec_driver_sql(statement)
+    op.execute("ANALYZE scans")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not scans_partitioned(bind):
+        return
+
+    op.execute("LOCK TABLE scans IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER SEQUENCE scans_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE scans RENAME TO scans_partitioned")
+    op.execute("CREATE TABLE scans (LIKE scans_partitioned INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO scans ({COLUMNS}) SELECT {COLUMNS} FROM scans_partitioned")
+    op.execute("DROP TABLE scans_partitioned CASCADE")
+
+    op.execute("ALTER TABLE scans ADD PRIMARY KEY (id)")
+    op.execute("ALTER SEQUENCE scans_id_seq OWNED BY scans.id")
+    for index in Scan.__table__.indexes:
+        index.create(bind)
+    for statement in POSTGRES_ROLLUP_DDL:
+        bind.exec_driver_sql(statement)
@@ -0,0 +1,72 @@
+"""Общие настройки тестов.
+
+Окружение задается до импорта app: settings читаются один раз. По
+умолчанию база - временный файл SQLite; с DATABASE_URL PostgreSQL
+выполняются и проверки, которые есть только там.
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest
+"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+TMP_DIR = tempfile.mkdtemp(prefix="qr-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TMP_DIR}/tests.sqlite")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(TMP_DIR, "uploads"))
+os.environ.setdefault("DB_ECHO", "false")
+
+import pytest  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app.database import Base, SessionLocal, async_engine, engine  # noqa: E402
+from app.models import (  # noqa: E402, F401 - регистрируем модели
+    ingest_key,
+    print_job,
+    printer,
+    scan,
+    scan_rollup,
+)
+from app.models.scan import Scan  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def run():
+    """Выполняет корутину в новом цикле событий.
+
+    Соединения асинхронного движка привязаны к циклу, поэтому пул
+    закрывается в том же цикле.
+    """
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def prefix() -> str:
+    """Уникальный префикс qr_data: тесты не видят строки друг друга"""
+    return f"T-{uuid.uuid4().hex[:8]}-"
+
+
+def count_scans(prefix: str) -> int:
+    with SessionLocal() as db:
+        return db.scalar(
+            select(func.count())
+            .select_from(Scan)
+            .where(Scan.qr_data.like(f"{prefix}%"))
+        )
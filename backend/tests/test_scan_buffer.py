@@ -0,0 +1,213 @@
+"""Буфер отложенной записи сканов: WAL, восстановление и отказы базы"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+
+from app.config import settings
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models.scan import Scan
+from app.schemas.scan import ScanCreate
+from app.services.scan_buffer import ScanBufferFull, ScanWriteBuffer
+from tests.conftest import count_scans
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Подтверждает сканы и падает до сброса буфера
+CRASH = """
+import asyncio, json, os, sys
+from app.config import settings
+from app.schemas.scan import ScanCreate
+from app.services.scan_buffer import scan_buffer
+
+async def crash(prefix, count):
+    settings.SCAN_BUFFER_MAX_ROWS = count + 1
+    await scan_buffer.start()
+    scans = await asyncio.gather(
+        *(scan_buffer.add(ScanCreate(qr_data=f"{prefix}{i}")) for i in range(count))
+    )
+    print(json.dumps([scan.id for scan in scans]), flush=True)
+    os._exit(1)
+
+asyncio.run(crash(sys.argv[1], int(sys.argv[2])))
+"""
+
+
+@pytest.fixture
+def wal(tmp_path, monkeypatch) -> Path:
+    """Каталог WAL во временном каталоге, сброс только явный"""
+    monkeypatch.setattr(settings, "SCAN_BUFFER_WAL_DIR", str(tmp_path / "wal"))
+    monkeypatch.setattr(
+        settings, "SCAN_BUFFER_DEAD_LETTER", str(tmp_path / "rejected.jsonl")
+    )
+    monkeypatch.setattr(settings, "SCAN_BUFFER_FLUSH_MS", 60_000)
+    return tmp_path / "wal"
+
+
+def test_scan_create_limits_match_columns():
+    with pytest.raises(ValidationError):
+        ScanCreate(qr_data="X" * 501)
+    with pytest.raises(ValidationError):
+        ScanCreate(qr_data="X", printer_id="P" * 101)
+    assert ScanCreate(qr_data="X" * 500).qr_data
+
+
+def test_recovers_acknowledged_scans_after_crash(wal, prefix, run):
+    count = 300
+    child = subprocess.run(
+        [sys.executable, "-c", CRASH, prefix, str(count)],
+        cwd=BACKEND_DIR,
+        env={
+            **os.environ,
+            "SCAN_BUFFER_WAL_DIR": str(wal),
+            "SCAN_BUFFER_FLUSH_MS": "60000",
+        },
+        capture_output=True,
+        text=True,
+    )
+    ids = json.loads(child.stdout.strip().splitlines()[-1])
+    assert len(set(ids)) == count
+    assert count_scans(prefix) == 0
+
+    buffer = ScanWriteBuffer()
+
+    async def restart():
+        await buffer.start()
+        await buffer.stop()
+
+    run(restart())
+    assert buffer.stats.recovered == count
+    with SessionLocal() as db:
+        found = db.scalars(select(Scan.id).where(Scan.id.in_(ids))).all()
+    assert sorted(found) == sorted(ids)
+
+
+def test_concurrent_scans_share_fsync(wal, prefix, run):
+    buffer = ScanWriteBuffer()
+    count = 500
+
+    async def scenario():
+        await buffer.start()
+        scans = await asyncio.gather(
+            *(buffer.add(ScanCreate(qr_data=f"{prefix}{i}")) for i in range(count))
+        )
+        # Подтвержденный скан уже в WAL
+        lines = sum(
+            1 for path in buffer.wal_dir.glob("scans-*.wal") for _ in open(path)
+        )
+        stats = buffer.get_stats()
+        await buffer.stop()
+        return scans, lines, stats
+
+    scans, lines, stats = run(scenario())
+    assert len({scan.id for scan in scans}) == count
+    assert lines == count
+    assert stats["depth"] == count
+    assert stats["wal_syncs"] < count
+    assert count_scans(prefix) == count
+
+
+def test_rejected_scan_goes_to_dead_letter(wal, prefix, run):
+    buffer = ScanWriteBuffer()
+
+    async def scenario():
+        await buffer.start()
+        good = await buffer.add(ScanCreate(qr_data=f"{prefix}good"))
+        # В обход проверки схемы: строку не примет база
+        bad = await buffer.add(ScanCreate.model_construct(qr_data=None))
+        await buffer.flush()
+        stats = buffer.get_stats()
+        await buffer.stop()
+        return good, bad, stats
+
+    good, bad, stats = run(scenario())
+    assert stats["depth"] == 0 and stats["rejected"] == 1
+    assert stats["failed_flushes"] == 0
+    assert count_scans(prefix) == 1
+    with open(settings.SCAN_BUFFER_DEAD_LETTER, encoding="utf-8") as f:
+        rejected = [json.loads(line) for line in f]
+    assert [entry["scan"]["id"] for entry in rejected] == [bad.id]
+    assert good.id != bad.id
+
+
+def test_full_buffer_rejects_scan(wal, prefix, run, monkeypatch):
+    monkeypatch.setattr(settings, "SCAN_BUFFER_MAX_DEPTH", 3)
+    buffer = ScanWriteBuffer()
+
+    async def unavailable(records, replay=False):
+        raise ConnectionError("база недоступна")
+
+    async def scenario():
+        await buffer.start()
+        buffer._insert = unavailable
+        for i in range(3):
+            await buffer.add(ScanCreate(qr_data=f"{prefix}{i}"))
+        with pytest.raises(ScanBufferFull):
+            await buffer.add(ScanCreate(qr_data=f"{prefix}full"))
+        depth = buffer.depth
+
+        # База снова доступна: сброс освобождает место
+        del buffer._insert
+        await buffer.add(ScanCreate(qr_data=f"{prefix}after"))
+        await buffer.stop()
+        return depth
+
+    assert run(scenario()) == 3
+    assert count_scans(prefix) == 4
+
+
+def test_replay_uses_reassigned_ids(wal, prefix, run):
+    buffer = ScanWriteBuffer()
+    crashed = wal / "1-crashed"
+
+    async def scenario():
+        await buffer.start()
+        scans = [
+            await buffer.add(ScanCreate(qr_data=f"{prefix}buffer-{i}"))
+            for i in range(3)
+        ]
+        # Те же id заняты записью в обход буфера (/scans/bulk/ в SQLite)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                insert(Scan),
+                [
+                    {
+                        "id": scan.id,
+                        "qr_data": f"{prefix}bulk-{scan.id}",
+                        "scanned_at": datetime.now(timezone.utc),
+                    }
+                    for scan in scans
+                ],
+            )
+            await db.commit()
+
+        # Копия WAL до сброса и после: как при падении до удаления сегмента
+        crashed.mkdir()
+        (crashed / "lock").touch()
+        segments = lambda: buffer.wal_dir.glob("scans-*.wal")  # noqa: E731
+        for path in segments():
+            (crashed / path.name).write_bytes(path.read_bytes())
+        await buffer.flush()
+        for path in segments():
+            (crashed / path.name).write_bytes(path.read_bytes())
+        await buffer.stop()
+
+        replay = ScanWriteBuffer()
+        await replay.start()
+        await replay.stop()
+        return buffer.stats.reassigned, replay.stats.recovered
+
+    if settings.DATABASE_URL.startswith("postgresql"):
+        pytest.skip("id из последовательности PostgreSQL не пересекаются")
+    reassigned, recovered = run(scenario())
+    assert reassigned == 3 and recovered == 3
+    assert count_scans(f"{prefix}buffer-") == 3
+    assert count_scans(f"{prefix}bulk-") == 3
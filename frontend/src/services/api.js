@@ -10,11 +10,15 @@ const api = axios.create({
 })
 
 export default {
-    // Сканирование из изображения
+    // Сканирование из изображения (кадр уходит бинарным телом, без base64)
     async scanFromImage(imageData, clientId = null) {
-        const response = await api.post('/scans/scan-from-image/', {
-            image_data: imageData,
-            client_id: clientId
+        const blob = await (await fetch(imageData)).blob()
+        const params = {}
+        if (clientId) params.client_id = clientId
+
+        const response = await api.post('/scans/scan-from-image/raw/', blob, {
+            params,
+            headers: { 'Content-Type': blob.type || 'application/octet-stream' }
         })
         return response.data
     },
@@ -43,6 +47,37 @@ export default {
         return response.data
     },
 
+    // Сканы и напечатанные по минутам/часам/дням (granularity, group_by, ...)
+    async getScanStats(params = {}) {
+        const response = await api.get('/scans/stats/', { params })
+        return response.data
+    },
+
+    // Кадр скана и его миниатюра (отдает nginx)
+    scanImageUrl(scanId) {
+        return `${API_BASE_URL}/scans/scans/${scanId}/image/`
+    },
+
+    scanThumbnailUrl(scanId) {
+        return `${API_BASE_URL}/scans/scans/${scanId}/thumbnail/`
+    },
+
+    // Поиск по данным QR: exact, prefix или substring
+    async searchScans(q, mode = 'exact', limit = 100) {
+        const response = await api.get('/scans/search/', { params: { q, mode, limit } })
+        return response.data
+    },
+
+    // Лента новых сканов (Server-Sent Events), возвращает функцию отписки
+    subscribeScans(onScan, filters = {}) {
+        const params = new URLSearchParams(filters)
+        const source = new EventSource(`${API_BASE_URL}/scans/feed/?${params}`)
+        source.addEventListener('scan', event => onScan(JSON.parse(event.data).scan))
+        // Пакетная загрузка приходит пачками
+        source.addEventListener('scans', event => JSON.parse(event.data).scans.forEach(onScan))
+        return () => source.close()
+    },
+
     // Генерация QR кода
     async generateQRCode(data, size = 10) {
         const response = await api.get(`/scans/generate-qr/${data}`, {
@@ -51,20 +86,25 @@ export default {
         return `data:image/png;base64,${response.data.qr_image}`
     },
 
-    // Экспорт в Excel
-    async exportExcel(startDate = null, endDate = null) {
-        const params = {}
+    // Экспорт (xlsx, csv или parquet), файл приходит потоком
+    async exportExcel(startDate = null, endDate = null, format = 'xlsx') {
+        const params = { format }
         if (startDate) params.start_date = startDate
         if (endDate) params.end_date = endDate
 
-        const response = await api.get('/scans/export-excel/', { params })
+        const response = await api.get('/scans/export/', { params, responseType: 'blob' })
+
+        const disposition = response.headers['content-disposition'] || ''
+        const match = disposition.match(/filename="(.+)"/)
+        const filename = match ? match[1] : `qr_scans_export.${format}`
 
         // Скачивание файла
         const link = document.createElement('a')
-        link.href = `data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,${response.data.data}`
-        link.download = response.data.filename
+        link.href = URL.createObjectURL(response.data)
+        link.download = filename
         link.click()
+        URL.revokeObjectURL(link.href)
 
-        return response.data
+        return { filename }
     }
 }
\ No newline at end of file